@@ -5,57 +5,308 @@ Scan balances across 15 chains and aggregate with 5% fee
 
 import os
 import json
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from flask import Flask, render_template, jsonify, request
+import hmac
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed, wait
+from flask import Flask, Response, abort, g, render_template, jsonify, request
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from web3 import Web3
 from eth_account import Account
 
+from fanout import STATUS_ERROR, STATUS_OK, STATUS_THROTTLED, STATUS_TIMEOUT, chain_statuses, ok_results, run_per_chain
+from fee_engine import SWEEP_GAS, TRANSFER_GAS, fee_bounds, sweep_amounts, to_ether
+from fee_oracle import FeeOracle
+from metrics import registry as metrics
+from multicall import MULTICALL3_ADDRESS, get_eth_balances, split_balances
+from nonce_manager import SharedNonceManager
+from price_provider import PriceCache, make_source
+from rate_limiter import PRIORITY_BACKGROUND, RateLimited, rpc_priority
+from balance_cache import BalanceCache, cached_account_state
+from rpc_batch import read_account_state
+from receipt_tracker import ReceiptTracker, SweepStatusStore
+from relayer import LaneBoard, Relayer, sponsor_keys
+from rpc_clients import ChainUnavailable, ClientRegistry
+from scan_sessions import SessionStore, pinned_chain, pinned_prices
+from sweep_batcher import BATCH_WINDOW, SweepBatcher, load_delegates
+from token_scanner import TokenScanner
+from tracing import SamplingProfiler, Trace, activate, deactivate, span
+
+class TracedJSONProvider(DefaultJSONProvider):
+    """Default JSON provider, timed as the "serialize" span"""
+    def dumps(self, obj, **kwargs):
+        with span("serialize"):
+            return super().dumps(obj, **kwargs)
+
 app = Flask(__name__)
-CORS(app)
+app.json = TracedJSONProvider(app)
+CORS(app, expose_headers=["Server-Timing"])
 
 # Configuration
 FEE_WALLET = "0xFc20B3A46aD9DAD7d4656bB52C1B13CA042cd2f1"
-FEE_PERCENT = 0.05  # 5%
 RPC_TIMEOUT = 10
+MIN_DISPLAY_BALANCE = 0.000001
+MIN_SWEEP_WEI = 10**12  # 0.000001 of the native asset
+SCAN_DEADLINE = RPC_TIMEOUT * 1.5  # Streaming scan gives up on chains after this
+CHAIN_DEADLINE = RPC_TIMEOUT      # Estimate/execute: max time per chain
+REQUEST_DEADLINE = RPC_TIMEOUT * 1.5  # Estimate/execute: max time per request
+MULTICALL_CHUNK_SIZE = int(os.environ.get("MULTICALL_CHUNK_SIZE", "500"))
+MAX_BULK_ADDRESSES = int(os.environ.get("MAX_BULK_ADDRESSES", "10000"))
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")  # Enables /api/admin/* (sent as "Authorization: Bearer ...")
 
 # 15 EVM Chains
 CHAINS = {
-    "ethereum": {"name": "Ethereum", "rpc": "https://eth.llamarpc.com", "chain_id": 1, "symbol": "ETH", "color": "#627EEA", "explorer": "https://etherscan.io/tx/"},
-    "polygon": {"name": "Polygon", "rpc": "https://polygon-rpc.com", "chain_id": 137, "symbol": "MATIC", "color": "#8247E5", "explorer": "https://polygonscan.com/tx/"},
-    "bsc": {"name": "BNB Chain", "rpc": "https://bsc-dataseed.binance.org", "chain_id": 56, "symbol": "BNB", "color": "#F3BA2F", "explorer": "https://bscscan.com/tx/"},
-    "arbitrum": {"name": "Arbitrum", "rpc": "https://arb1.arbitrum.io/rpc", "chain_id": 42161, "symbol": "ETH", "color": "#28A0F0", "explorer": "https://arbiscan.io/tx/"},
-    "optimism": {"name": "Optimism", "rpc": "https://mainnet.optimism.io", "chain_id": 10, "symbol": "ETH", "color": "#FF0420", "explorer": "https://optimistic.etherscan.io/tx/"},
-    "avalanche": {"name": "Avalanche", "rpc": "https://api.avax.network/ext/bc/C/rpc", "chain_id": 43114, "symbol": "AVAX", "color": "#E84142", "explorer": "https://snowtrace.io/tx/"},
-    "fantom": {"name": "Fantom", "rpc": "https://rpc.ftm.tools", "chain_id": 250, "symbol": "FTM", "color": "#1969FF", "explorer": "https://ftmscan.com/tx/"},
-    "moonbeam": {"name": "Moonbeam", "rpc": "https://rpc.api.moonbeam.network", "chain_id": 1284, "symbol": "GLMR", "color": "#00D0FF", "explorer": "https://moonscan.io/tx/"},
-    "celo": {"name": "Celo", "rpc": "https://forno.celo.org", "chain_id": 42220, "symbol": "CELO", "color": "#FBCC5C", "explorer": "https://celoscan.io/tx/"},
-    "aurora": {"name": "Aurora", "rpc": "https://mainnet.aurora.dev", "chain_id": 1313161554, "symbol": "ETH", "color": "#00A9FF", "explorer": "https://explorer.mainnet.aurora.dev/tx/"},
-    "polygon_zkevm": {"name": "Polygon zkEVM", "rpc": "https://zkevm-rpc.com", "chain_id": 1101, "symbol": "ETH", "color": "#8247E5", "explorer": "https://zkevm.polygonscan.com/tx/"},
-    "linea": {"name": "Linea", "rpc": "https://rpc.linea.build", "chain_id": 59144, "symbol": "ETH", "color": "#5A9BC4", "explorer": "https://lineascan.build/tx/"},
-    "base": {"name": "Base", "rpc": "https://mainnet.base.org", "chain_id": 8453, "symbol": "ETH", "color": "#0052FF", "explorer": "https://basescan.org/tx/"},
-    "scroll": {"name": "Scroll", "rpc": "https://rpc.scroll.io", "chain_id": 534352, "symbol": "ETH", "color": "#FFD700", "explorer": "https://scrollscan.com/tx/"},
-    "zksync": {"name": "zkSync Era", "rpc": "https://mainnet.era.zksync.io", "chain_id": 324, "symbol": "ETH", "color": "#2E2E2E", "explorer": "https://explorer.zksync.io/tx/"}
+    "ethereum": {"name": "Ethereum", "rpcs": ["https://eth.llamarpc.com", "https://ethereum-rpc.publicnode.com", "https://eth.drpc.org"], "chain_id": 1, "block_time": 12, "symbol": "ETH", "color": "#627EEA", "explorer": "https://etherscan.io/tx/"},
+    "polygon": {"name": "Polygon", "rpcs": ["https://polygon-rpc.com", "https://polygon-bor-rpc.publicnode.com", "https://polygon.drpc.org"], "chain_id": 137, "block_time": 2, "symbol": "MATIC", "color": "#8247E5", "explorer": "https://polygonscan.com/tx/"},
+    "bsc": {"name": "BNB Chain", "rpcs": ["https://bsc-dataseed.binance.org", "https://bsc-dataseed1.defibit.io", "https://bsc-rpc.publicnode.com"], "chain_id": 56, "block_time": 3, "symbol": "BNB", "color": "#F3BA2F", "explorer": "https://bscscan.com/tx/"},
+    "arbitrum": {"name": "Arbitrum", "rpcs": ["https://arb1.arbitrum.io/rpc", "https://arbitrum-one-rpc.publicnode.com", "https://arbitrum.drpc.org"], "chain_id": 42161, "block_time": 0.25, "symbol": "ETH", "color": "#28A0F0", "explorer": "https://arbiscan.io/tx/"},
+    "optimism": {"name": "Optimism", "rpcs": ["https://mainnet.optimism.io", "https://optimism-rpc.publicnode.com", "https://optimism.drpc.org"], "chain_id": 10, "block_time": 2, "symbol": "ETH", "color": "#FF0420", "explorer": "https://optimistic.etherscan.io/tx/"},
+    "avalanche": {"name": "Avalanche", "rpcs": ["https://api.avax.network/ext/bc/C/rpc", "https://avalanche-c-chain-rpc.publicnode.com", "https://avalanche.drpc.org"], "chain_id": 43114, "block_time": 2, "symbol": "AVAX", "color": "#E84142", "explorer": "https://snowtrace.io/tx/"},
+    "fantom": {"name": "Fantom", "rpcs": ["https://rpc.ftm.tools", "https://fantom-rpc.publicnode.com", "https://fantom.drpc.org"], "chain_id": 250, "block_time": 1, "symbol": "FTM", "color": "#1969FF", "explorer": "https://ftmscan.com/tx/"},
+    "moonbeam": {"name": "Moonbeam", "rpcs": ["https://rpc.api.moonbeam.network", "https://moonbeam-rpc.publicnode.com", "https://moonbeam.drpc.org"], "chain_id": 1284, "block_time": 6, "symbol": "GLMR", "color": "#00D0FF", "explorer": "https://moonscan.io/tx/"},
+    "celo": {"name": "Celo", "rpcs": ["https://forno.celo.org", "https://celo.drpc.org"], "chain_id": 42220, "block_time": 5, "symbol": "CELO", "color": "#FBCC5C", "explorer": "https://celoscan.io/tx/"},
+    "aurora": {"name": "Aurora", "rpcs": ["https://mainnet.aurora.dev", "https://aurora.drpc.org"], "chain_id": 1313161554, "block_time": 1, "symbol": "ETH", "color": "#00A9FF", "explorer": "https://explorer.mainnet.aurora.dev/tx/"},
+    "polygon_zkevm": {"name": "Polygon zkEVM", "rpcs": ["https://zkevm-rpc.com", "https://polygon-zkevm.drpc.org"], "chain_id": 1101, "block_time": 3, "symbol": "ETH", "color": "#8247E5", "explorer": "https://zkevm.polygonscan.com/tx/"},
+    "linea": {"name": "Linea", "rpcs": ["https://rpc.linea.build", "https://linea-rpc.publicnode.com", "https://linea.drpc.org"], "chain_id": 59144, "block_time": 2, "symbol": "ETH", "color": "#5A9BC4", "explorer": "https://lineascan.build/tx/"},
+    "base": {"name": "Base", "rpcs": ["https://mainnet.base.org", "https://base-rpc.publicnode.com", "https://base.drpc.org"], "chain_id": 8453, "block_time": 2, "symbol": "ETH", "color": "#0052FF", "explorer": "https://basescan.org/tx/"},
+    "scroll": {"name": "Scroll", "rpcs": ["https://rpc.scroll.io", "https://scroll-rpc.publicnode.com", "https://scroll.drpc.org"], "chain_id": 534352, "block_time": 3, "symbol": "ETH", "color": "#FFD700", "explorer": "https://scrollscan.com/tx/"},
+    "zksync": {"name": "zkSync Era", "rpcs": ["https://mainnet.era.zksync.io", "https://zksync.drpc.org"], "chain_id": 324, "block_time": 1, "symbol": "ETH", "color": "#2E2E2E", "explorer": "https://explorer.zksync.io/tx/", "multicall3": "0xF9cda624FBC7e059355ce98a31693d299FACd963"}
 }
 
-def get_web3(chain_key):
-    """Get Web3 instance for chain"""
+# Long-lived pooled clients, shared by all request threads
+rpc_registry = ClientRegistry(CHAINS, timeout=RPC_TIMEOUT)
+
+# Balance cache shared by all workers (SQLite file, see balance_cache.py)
+balance_cache = BalanceCache()
+
+# ERC-20 dust from the per-chain token index (tokens/<chain>.json)
+token_scanner = TokenScanner(chunk_size=MULTICALL_CHUNK_SIZE)
+
+# Fee quotes kept fresh in the background, off the request path
+fee_oracle = FeeOracle(rpc_registry)
+
+# USD prices for every native symbol, refreshed in the background (see price_provider.py)
+price_cache = PriceCache(make_source())
+price_cache.warm({chain["symbol"] for chain in CHAINS.values()})
+
+# Block-pinned scan snapshots reused by estimate/execute
+scan_sessions = SessionStore()
+
+# Sponsored txs spread over every configured sponsor wallet (disabled without keys).
+# All gunicorn workers relay with the same keys, so nonces and lane load go
+# through one SQLite file (RELAYER_STATE_PATH) instead of per-process memory
+SPONSOR_KEYS = sponsor_keys()
+relayer = Relayer(rpc_registry, SPONSOR_KEYS, fee_oracle, SharedNonceManager(), LaneBoard()) if SPONSOR_KEYS else None
+
+# Users' EIP-7702 authorizations batched into one sponsored type 4 tx per chain
+sweep_batcher = SweepBatcher(relayer, CHAINS, load_delegates()) if relayer else None
+SWEEP_DEADLINE = BATCH_WINDOW + REQUEST_DEADLINE  # Batch window plus signing and broadcast
+
+# Receipts for submitted sweeps, one batched lookup per chain per block
+receipt_tracker = ReceiptTracker(rpc_registry, SweepStatusStore())
+
+# Shared pool for per-chain fan-out in estimate/execute
+chain_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="chain")
+
+# Prometheus metrics, added up across workers on /metrics (see metrics.py)
+HTTP_DURATION = metrics.histogram("dustzip_http_request_duration_seconds", "API latency, to the first byte for streams")
+CHAIN_ERRORS = metrics.counter("dustzip_chain_errors_total", "Per-chain failures handled inside a request")
+POOL_QUEUED = metrics.gauge("dustzip_pool_queued_tasks", "Per-chain tasks waiting for a pool thread")
+PRICE_LOOKUPS = metrics.counter("dustzip_price_cache_lookups_total", "Price cache lookups by result")
+BALANCE_LOOKUPS = metrics.counter("dustzip_balance_cache_lookups_total", "Balance cache lookups by result")
+BALANCE_HIT_RATIO = metrics.gauge("dustzip_balance_cache_hit_ratio", "Balance cache hits over lookups")
+BALANCE_ENTRIES = metrics.gauge("dustzip_balance_cache_entries", "Balances currently cached")
+metrics.collector(rpc_registry.metric_samples)
+
+@metrics.collector
+def process_samples():
+    prices = price_cache.stats()
+    return [
+        (POOL_QUEUED, {"pool": "chain"}, chain_pool._work_queue.qsize()),
+        (PRICE_LOOKUPS, {"result": "hit"}, prices["hits"]),
+        (PRICE_LOOKUPS, {"result": "stale"}, prices["stale_hits"]),
+        (PRICE_LOOKUPS, {"result": "miss"}, prices["misses"]),
+    ]
+
+@metrics.global_collector
+def balance_cache_samples():
+    # Already shared by all workers through the cache file, so not added up per worker
+    stats = balance_cache.stats()
+    return [
+        (BALANCE_LOOKUPS, {"result": "hit"}, stats["hits"]),
+        (BALANCE_LOOKUPS, {"result": "miss"}, stats["misses"]),
+        (BALANCE_HIT_RATIO, {}, stats["hit_ratio"]),
+        (BALANCE_ENTRIES, {}, stats["size"]),
+    ]
+
+def record_chain_error(chain_key, where, error):
+    metrics.inc(CHAIN_ERRORS, {"chain": chain_key, "where": where})
+    app.logger.debug("%s failed on %s: %s", where, chain_key, error)
+
+# Sampling profiler for the next N requests, armed through /api/admin/profile
+profiler = SamplingProfiler()
+
+@app.before_request
+def start_trace():
+    g.started = time.perf_counter()
+    g.trace = Trace(f"{request.method} {request.path}")
+    g.trace_token = activate(g.trace)
+    g.profile = profiler.claim(request.path)
+    if g.profile:
+        profiler.start(g.trace, g.profile)
+
+@app.after_request
+def record_request(response):
+    if "started" in g:
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        labels = {"endpoint": endpoint, "method": request.method, "status": str(response.status_code)}
+        metrics.observe(HTTP_DURATION, time.perf_counter() - g.started, labels)
+    if "trace" in g:
+        response.headers["Server-Timing"] = g.trace.server_timing()
+        if trace_requested() and response.is_json and not response.is_streamed:
+            body = response.get_json(silent=True)
+            if isinstance(body, dict):
+                body["trace"] = g.trace.to_dict()
+                response.set_data(app.json.dumps(body))
+    return response
+
+@app.teardown_request
+def end_trace(error=None):
+    if "trace_token" in g:
+        deactivate(g.trace, g.trace_token)
+    if g.get("profile"):
+        profiler.finish(g.trace)
+
+def trace_requested():
+    """JSON trace in the response body, on ?trace=1 or an X-Trace: 1 header"""
+    return request.args.get("trace") == "1" or request.headers.get("X-Trace") == "1"
+
+def require_admin():
+    header = request.headers.get("Authorization", "")
+    if not ADMIN_TOKEN:
+        abort(404)
+    if not hmac.compare_digest(header.encode(), f"Bearer {ADMIN_TOKEN}".encode()):
+        abort(403)
+
+def get_client(chain_key):
+    """Get pooled RPC client for chain (None if marked unhealthy)"""
     try:
-        w3 = Web3(Web3.HTTPProvider(CHAINS[chain_key]["rpc"], request_kwargs={"timeout": RPC_TIMEOUT}))
-        if w3.is_connected():
-            return w3
-    except:
-        pass
-    return None
+        with span("client", chain=chain_key):
+            client = rpc_registry.get(chain_key)
+    except KeyError:
+        return None
+    return client if client.healthy else None
+
+def get_web3(chain_key):
+    """Get pooled Web3 instance for chain (None if marked unhealthy)"""
+    client = get_client(chain_key)
+    return client.w3 if client else None
+
+def read_balance_state(client, address):
+    """Get balance in wei and the block it was read at, through the shared balance cache"""
+    return cached_account_state(balance_cache, client, Web3.to_checksum_address(address))
+
+def read_balance_wei(client, address):
+    """Get balance in wei, read through the shared balance cache"""
+    return read_balance_state(client, address)["balance"]
 
 def get_balance(w3, address):
     """Get balance in ether"""
     try:
-        balance_wei = w3.eth.get_balance(Web3.to_checksum_address(address))
+        balance_wei = read_balance_wei(w3.provider.client, address)
         return float(w3.from_wei(balance_wei, "ether"))
-    except:
+    except Exception as e:
+        record_chain_error(w3.provider.client.chain_key, "balance", e)
         return 0.0
 
+def get_token_prices(symbols):
+    """USD prices for symbols in one batched lookup; symbols without a price are left out"""
+    return price_cache.get_prices(symbols)
+
+def get_token_price(symbol):
+    """USD price of a token symbol (0.0 if unavailable)"""
+    return get_token_prices([symbol]).get(symbol.upper(), 0.0)
+
+def usd_value(amount, price):
+    return amount * price if price is not None else None
+
+def balance_entry(chain_key, balance):
+    """Balance record in the shape returned by /api/balances"""
+    chain = CHAINS[chain_key]
+    return {
+        "chain": chain_key,
+        "name": chain["name"],
+        "symbol": chain["symbol"],
+        "balance": balance,
+        "color": chain["color"],
+        "chain_id": chain["chain_id"]
+    }
+
+def scan_tokens(client, address):
+    """Non-zero ERC-20 balances; token dust is best-effort and never fails the chain"""
+    try:
+        return token_scanner.scan(client, address)
+    except Exception as e:
+        record_chain_error(client.chain_key, "tokens", e)
+        return []
+
+def has_dust(balance_wei):
+    return to_ether(balance_wei) > MIN_DISPLAY_BALANCE
+
+def scan_entry(chain_key, balance_wei, tokens):
+    """Balance record with its ERC-20 holdings, or None if there is nothing worth showing"""
+    if not has_dust(balance_wei) and not tokens:
+        return None
+    return dict(balance_entry(chain_key, to_ether(balance_wei)), tokens=tokens)
+
+def scan_chain(chain_key, address, snapshot=None, include_tokens=True):
+    """Read one chain's balance; returns a balance record, or None if dust-free
+
+    The record lists ERC-20 holdings under "tokens". When `snapshot` is
+    given, the native balance, its block and (for chains with dust) the
+    current fee quote are pinned into it for the scan session.
+    """
+    client = get_client(chain_key)
+    if not client:
+        raise ChainUnavailable("RPC unavailable")
+    with span("balance", chain=chain_key):
+        state = read_balance_state(client, address)
+    with span("tokens", chain=chain_key):
+        tokens = scan_tokens(client, address) if include_tokens else []
+    
+    entry = scan_entry(chain_key, state["balance"], tokens)
+    pinned = {"balance_wei": state["balance"], "block_number": state["block_number"]}
+    if has_dust(state["balance"]) and snapshot is not None:
+        try:
+            with span("fee_quote", chain=chain_key):
+                pinned["fees"] = fee_oracle.quote(chain_key)
+        except Exception as e:
+            record_chain_error(chain_key, "fee_quote", e)
+    if snapshot is not None:
+        snapshot[chain_key] = pinned
+    return entry
+
+def sweep_inputs(chain_key, address, snapshot=None):
+    """Balance (wei) and a lazy gas price getter, from the scan snapshot when present"""
+    pinned = pinned_chain(snapshot, chain_key)
+    if pinned:
+        balance_wei = int(pinned["balance_wei"])
+    else:
+        client = get_client(chain_key)
+        if not client:
+            raise ChainUnavailable("RPC unavailable")
+        with span("balance", chain=chain_key):
+            balance_wei = read_balance_wei(client, address)
+    
+    def gas_price():
+        fees = (pinned or {}).get("fees")
+        if fees:
+            return fees["gas_price"]
+        with span("gas", chain=chain_key):
+            return fee_oracle.gas_price(chain_key)
+    
+    return balance_wei, gas_price
+
 @app.route("/")
 def index():
     return render_template("index.html")
@@ -65,43 +316,328 @@ def get_chains():
     """Get all supported chains"""
     return jsonify(CHAINS)
 
+@app.route("/api/rpc/status")
+def rpc_status():
+    """Per-chain endpoint latency, error rate and ejection state"""
+    return jsonify(rpc_registry.status())
+
+@app.route("/api/relayer/status")
+def relayer_status():
+    """Sponsor lanes with queue depth and in-flight txs per chain"""
+    if relayer is None:
+        return jsonify({"enabled": False})
+    return jsonify(dict(relayer.status(), enabled=True, batches=sweep_batcher.stats()))
+
+@app.route("/metrics")
+def metrics_endpoint():
+    """Prometheus text exposition, summed over every worker"""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/api/admin/profile", methods=["GET", "POST", "DELETE"])
+def admin_profile():
+    """Arm (POST {"requests": N, "path": prefix}), list or disarm sampling profiler sessions"""
+    require_admin()
+    if request.method == "POST":
+        data = request.json or {}
+        try:
+            requests_to_profile = int(data.get("requests", 10))
+        except (TypeError, ValueError):
+            return jsonify({"error": "Invalid requests"}), 400
+        session = profiler.arm(requests_to_profile, data.get("path"))
+        return jsonify({"session": session, "output": profiler.output(session)})
+    if request.method == "DELETE":
+        return jsonify({"disarmed": profiler.disarm()})
+    return jsonify({"sessions": profiler.status()})
+
+@app.route("/api/admin/profile/<session>")
+def admin_profile_output(session):
+    """Folded stacks of a profiler session, for flamegraph.pl or speedscope"""
+    require_admin()
+    try:
+        with open(profiler.output(session)) as f:
+            return Response(f.read(), mimetype="text/plain")
+    except FileNotFoundError:
+        return jsonify({"error": "No samples for this session yet"}), 404
+
+@app.route("/api/cache/stats")
+def cache_stats():
+    """Balance cache and price cache hit/miss counters"""
+    return jsonify({"balance_cache": balance_cache.stats(), "prices": price_cache.stats()})
+
 @app.route("/api/balances", methods=["POST"])
 def scan_balances():
     """Scan balances across all chains"""
     data = request.json
     address = data.get("address")
     selected_chains = data.get("chains", list(CHAINS.keys()))
+    include_tokens = data.get("tokens", True)
+    
+    if not address:
+        return jsonify({"error": "Address required"}), 400
+    
+    snapshot = {}
+    outcomes = run_per_chain(
+        chain_pool, [key for key in selected_chains if key in CHAINS],
+        lambda key: scan_chain(key, address, snapshot, include_tokens),
+        SCAN_DEADLINE, SCAN_DEADLINE
+    )
+    
+    session, expires = scan_sessions.create(address, dict(snapshot))
+    return jsonify({
+        "balances": ok_results(outcomes),
+        "chains": chain_statuses(outcomes),
+        "session": session,
+        "session_expires": expires
+    })
+
+@app.route("/api/balances/stream", methods=["POST"])
+def scan_balances_stream():
+    """Stream per-chain scan results as NDJSON as soon as each chain finishes"""
+    data = request.json or {}
+    address = data.get("address")
+    selected_chains = [key for key in data.get("chains", list(CHAINS.keys())) if key in CHAINS]
+    include_tokens = data.get("tokens", True)
     
     if not address:
         return jsonify({"error": "Address required"}), 400
     
-    balances = []
+    def generate():
+        snapshot = {}
+        executor = ThreadPoolExecutor(max_workers=10)
+        futures = {executor.submit(scan_chain, key, address, snapshot, include_tokens): key for key in selected_chains}
+        pending = set(selected_chains)
+        try:
+            for future in as_completed(futures, timeout=SCAN_DEADLINE):
+                chain_key = futures[future]
+                pending.discard(chain_key)
+                try:
+                    line = {"chain": chain_key, "status": "ok", "balance": future.result()}
+                except RateLimited as e:
+                    line = {"chain": chain_key, "status": STATUS_THROTTLED, "error": str(e)}
+                except Exception as e:
+                    record_chain_error(chain_key, "stream", e)
+                    line = {"chain": chain_key, "status": "error", "error": str(e)}
+                yield json.dumps(line) + "\n"
+        except TimeoutError:
+            for chain_key in pending:
+                metrics.inc(CHAIN_ERRORS, {"chain": chain_key, "where": "stream_timeout"})
+                yield json.dumps({"chain": chain_key, "status": "timeout"}) + "\n"
+        finally:
+            # Don't hold the response open for stragglers
+            executor.shutdown(wait=False, cancel_futures=True)
+        session, expires = scan_sessions.create(address, dict(snapshot))
+        yield json.dumps({"done": True, "session": session, "session_expires": expires}) + "\n"
+    
+    return Response(generate(), mimetype="application/x-ndjson",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route("/api/balances/bulk", methods=["POST"])
+def scan_balances_bulk():
+    """Scan many addresses across chains with Multicall3"""
+    data = request.json or {}
+    addresses = data.get("addresses") or []
+    selected_chains = data.get("chains", list(CHAINS.keys()))
+    with_estimates = bool(data.get("estimate"))
+    try:
+        chunk_size = int(data.get("chunk_size", MULTICALL_CHUNK_SIZE))
+    except (TypeError, ValueError):
+        chunk_size = 0
+    
+    if not addresses:
+        return jsonify({"error": "Addresses required"}), 400
+    if len(addresses) > MAX_BULK_ADDRESSES:
+        return jsonify({"error": f"At most {MAX_BULK_ADDRESSES} addresses per request"}), 400
+    if chunk_size < 1:
+        return jsonify({"error": "Invalid chunk_size"}), 400
+    
+    try:
+        checksummed = list(dict.fromkeys(Web3.to_checksum_address(a) for a in addresses))
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid address"}), 400
+    
+    results = {address: [] for address in checksummed}
+    errors = {address: [] for address in checksummed}
+    failed_chains = []
+    throttled_chains = []
+    prices = cached_prices(selected_chains) if with_estimates else None
     
     def scan_chain(chain_key):
         try:
-            w3 = get_web3(chain_key)
-            if w3:
-                balance = get_balance(w3, address)
-                if balance > 0.000001:  # Only show meaningful balances
-                    chain = CHAINS[chain_key]
-                    balances.append({
-                        "chain": chain_key,
-                        "name": chain["name"],
-                        "symbol": chain["symbol"],
-                        "balance": balance,
-                        "color": chain["color"],
-                        "chain_id": chain["chain_id"]
-                    })
+            client = get_client(chain_key)
+            if not client:
+                failed_chains.append(chain_key)
+                return
+            multicall_address = CHAINS[chain_key].get("multicall3", MULTICALL3_ADDRESS)
+            # Bulk scans queue behind interactive requests for RPC budget
+            with rpc_priority(PRIORITY_BACKGROUND):
+                balances, failed = split_balances(get_eth_balances(client, checksummed, multicall_address, chunk_size))
+                dusty = {address: wei for address, wei in balances.items() if has_dust(wei)}
+                gas_price = fee_oracle.gas_price(chain_key) if with_estimates and dusty else None
+            for address, error in failed.items():
+                errors[address].append({"chain": chain_key, "error": str(error)})
+            entries = [balance_entry(chain_key, to_ether(wei)) for wei in dusty.values()]
+            if gas_price is not None:
+                # One fee engine pass for every address on the chain
+                for entry, estimate in zip(entries, estimate_entries(chain_key, list(dusty.values()), gas_price, prices)):
+                    entry["estimate"] = estimate
+            for address, entry in zip(dusty, entries):
+                results[address].append(entry)
+        except RateLimited:
+            throttled_chains.append(chain_key)
+            failed_chains.append(chain_key)
         except Exception as e:
-            pass
-        return None
+            record_chain_error(chain_key, "bulk", e)
+            failed_chains.append(chain_key)
     
     with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = {executor.submit(scan_chain, key): key for key in selected_chains if key in CHAINS}
+        futures = [executor.submit(scan_chain, key) for key in selected_chains if key in CHAINS]
         for future in as_completed(futures):
             future.result()
     
-    return jsonify({"balances": balances})
+    return jsonify({
+        "results": [
+            {"address": address, "balances": balances, "errors": errors[address]}
+            for address, balances in results.items()
+        ],
+        "failed_chains": failed_chains,
+        "throttled_chains": throttled_chains
+    })
+
+def estimate_chain(chain_key, from_address, snapshot=None, prices=None):
+    """Fee/gas estimate for one chain, or None if there's nothing to sweep"""
+    balance_wei, pinned_gas_price = sweep_inputs(chain_key, from_address, snapshot)
+    if not sweepable(balance_wei):
+        return None
+    return estimate_entry(chain_key, balance_wei, pinned_gas_price(), prices)
+
+def sweepable(balance_wei):
+    return balance_wei >= MIN_SWEEP_WEI
+
+def cached_prices(chain_keys):
+    """USD prices of the chains' assets from memory only; a cold or stale cache refreshes in the background"""
+    return price_cache.get_prices({CHAINS[key]["symbol"] for key in chain_keys if key in CHAINS}, fetch_missing=False)
+
+def execution_prices(chain_keys, snapshot=None):
+    """USD prices for /api/execute: the ones the session's estimate used, the rest fetched now
+
+    Unlike cached_prices() this waits for the price source, since the
+    price caps the fee in the txs the user signs.
+    """
+    symbols = {CHAINS[key]["symbol"] for key in chain_keys if key in CHAINS}
+    prices = {symbol: price for symbol, price in pinned_prices(snapshot).items() if symbol in symbols}
+    missing = symbols - set(prices)
+    if missing:
+        prices.update(price_cache.get_prices(missing))
+    return prices
+
+def estimate_entries(chain_key, balances_wei, gas_price, prices=None):
+    """Estimate records for /api/estimate, one per balance on the chain, from one fee engine pass"""
+    chain = CHAINS[chain_key]
+    price = (prices or {}).get(chain["symbol"])
+    amounts = sweep_amounts(balances_wei, [gas_price] * len(balances_wei), fee_bounds(price))
+    
+    entries = []
+    for balance_wei, gas_wei, fee_wei, net_wei in zip(
+        balances_wei, amounts["gas_wei"], amounts["fee_wei"], amounts["net_wei"]
+    ):
+        balance, fee, user_amount, gas_cost = (to_ether(wei) for wei in (balance_wei, fee_wei, net_wei, gas_wei))
+        entries.append({
+            "chain": chain_key,
+            "name": chain["name"],
+            "balance": balance,
+            "fee": fee,
+            "user_amount": user_amount,
+            "gas_cost": gas_cost,
+            "balance_wei": balance_wei,
+            "fee_wei": fee_wei,
+            "user_amount_wei": net_wei,
+            "gas_cost_wei": gas_wei,
+            "balance_usd": usd_value(balance, price),
+            "fee_usd": usd_value(fee, price),
+            "user_amount_usd": usd_value(user_amount, price),
+            "gas_cost_usd": usd_value(gas_cost, price)
+        })
+    return entries
+
+def estimate_entry(chain_key, balance_wei, gas_price, prices=None):
+    """Estimate record for /api/estimate"""
+    return estimate_entries(chain_key, [balance_wei], gas_price, prices)[0]
+
+def estimate_summary(estimates):
+    """USD totals over the estimates that have a price"""
+    priced = [e for e in estimates if e["balance_usd"] is not None]
+    gas = sum(e["gas_cost_usd"] for e in priced)
+    fees = sum(e["fee_usd"] for e in priced)
+    return {
+        "total_gas_cost_usd": gas,
+        "total_service_fee_usd": fees,
+        "total_fees_usd": gas + fees,
+        # user_amount is already net of gas and fee
+        "total_transfer_usd": sum(e["user_amount_usd"] for e in priced),
+        "unpriced_chains": [e["chain"] for e in estimates if e["balance_usd"] is None]
+    }
+
+def prepare_chain_transactions(chain_key, from_address, to_address, snapshot=None, prices=None):
+    """Unsigned fee + user transactions for one chain, or None if nothing to sweep"""
+    balance_wei, pinned_gas_price = sweep_inputs(chain_key, from_address, snapshot)
+    if not sweepable(balance_wei):
+        return None
+    gas_price = pinned_gas_price()  # Same price for both txs
+    
+    # The wallet signs and sends both back-to-back, so they take consecutive
+    # nonces from its pending count (not cached: we never see the broadcasts)
+    client = get_client(chain_key)
+    if not client:
+        raise ChainUnavailable("RPC unavailable")
+    with span("nonce", chain=chain_key):
+        nonce = read_account_state(client, Web3.to_checksum_address(from_address), fields=("nonce",))["nonce"]
+    return chain_transactions(chain_key, balance_wei, gas_price, nonce, to_address, prices)
+
+def chain_transactions(chain_key, balance_wei, gas_price, nonce, to_address, prices=None):
+    """Transaction record for /api/execute, or None if the balance cannot cover gas and fee
+
+    Raises ValueError without a USD price: the fee's $0.50 cap would not apply.
+    """
+    chain = CHAINS[chain_key]
+    price = (prices or {}).get(chain["symbol"])
+    if not price:
+        raise ValueError(f"No USD price for {chain['symbol']}, cannot cap the service fee")
+    
+    # Exact wei: fee and user amount plus gas for both txs add up to the balance
+    amounts = sweep_amounts([balance_wei], [gas_price], fee_bounds(price), SWEEP_GAS)
+    fee_wei, net_wei = amounts["fee_wei"][0], amounts["net_wei"][0]
+    if net_wei <= 0:
+        return None
+    
+    # Prepare fee transaction
+    fee_tx = {
+        "to": FEE_WALLET,
+        "value": hex(fee_wei),
+        "gasPrice": hex(gas_price),
+        "gas": hex(TRANSFER_GAS),
+        "nonce": hex(nonce),
+        "chainId": hex(chain["chain_id"])
+    }
+    
+    # Prepare user transaction
+    user_tx = {
+        "to": to_address,
+        "value": hex(net_wei),
+        "gasPrice": hex(gas_price),
+        "gas": hex(TRANSFER_GAS),
+        "nonce": hex(nonce + 1),
+        "chainId": hex(chain["chain_id"])
+    }
+    
+    return {
+        "chain": chain_key,
+        "name": chain["name"],
+        "fee_tx": fee_tx,
+        "user_tx": user_tx,
+        "fee_amount": to_ether(fee_wei),
+        "user_amount": to_ether(net_wei),
+        "explorer": chain["explorer"]
+    }
 
 @app.route("/api/estimate", methods=["POST"])
 def estimate():
@@ -113,44 +649,25 @@ def estimate():
     if not from_address or not selected_chains:
         return jsonify({"error": "Address and chains required"}), 400
     
-    estimates = []
+    with span("session"):
+        snapshot = scan_sessions.get(data.get("session"), from_address)
+    with span("prices"):
+        prices = cached_prices(selected_chains)
+    outcomes = run_per_chain(
+        chain_pool, selected_chains, lambda key: estimate_chain(key, from_address, snapshot, prices),
+        CHAIN_DEADLINE, REQUEST_DEADLINE, supported=CHAINS
+    )
+    estimates = ok_results(outcomes)
+    if snapshot is not None:
+        # /api/execute caps the fee with these same prices, whichever worker serves it
+        scan_sessions.pin_prices(data.get("session"), prices)
     
-    for chain_key in selected_chains:
-        if chain_key not in CHAINS:
-            continue
-        
-        try:
-            w3 = get_web3(chain_key)
-            if not w3:
-                continue
-            
-            balance = get_balance(w3, from_address)
-            if balance < 0.000001:
-                continue
-            
-            chain = CHAINS[chain_key]
-            
-            # Calculate fee (5%)
-            fee_amount = balance * FEE_PERCENT
-            user_amount = balance - fee_amount
-            
-            # Estimate gas
-            gas_price = w3.eth.gas_price
-            gas_limit = 21000  # Standard transfer
-            gas_cost = w3.from_wei(gas_price * gas_limit, "ether")
-            
-            estimates.append({
-                "chain": chain_key,
-                "name": chain["name"],
-                "balance": balance,
-                "fee": fee_amount,
-                "user_amount": user_amount,
-                "gas_cost": float(gas_cost)
-            })
-        except Exception as e:
-            continue
-    
-    return jsonify({"estimates": estimates})
+    return jsonify({
+        "estimates": estimates,
+        "summary": estimate_summary(estimates),
+        "chains": chain_statuses(outcomes),
+        "session_reused": snapshot is not None
+    })
 
 @app.route("/api/execute", methods=["POST"])
 def execute():
@@ -163,58 +680,98 @@ def execute():
     if not from_address or not to_address or not selected_chains:
         return jsonify({"error": "Address and chains required"}), 400
     
-    transactions = []
+    snapshot = scan_sessions.get(data.get("session"), from_address)
+    # Prices set the fee's USD bounds; chains without one are refused
+    with span("prices"):
+        prices = execution_prices(selected_chains, snapshot)
+    outcomes = run_per_chain(
+        chain_pool, selected_chains,
+        lambda key: prepare_chain_transactions(key, from_address, to_address, snapshot, prices),
+        CHAIN_DEADLINE, REQUEST_DEADLINE, supported=CHAINS
+    )
     
-    for chain_key in selected_chains:
-        if chain_key not in CHAINS:
+    return jsonify({
+        "transactions": ok_results(outcomes),
+        "chains": chain_statuses(outcomes),
+        "session_reused": snapshot is not None
+    })
+
+@app.route("/api/sweep", methods=["POST"])
+def sweep():
+    """Sponsored EIP-7702 sweep from signed authorizations, one per chain"""
+    if sweep_batcher is None:
+        return jsonify({"error": "Sponsored sweeps are not configured"}), 503
+    
+    data = request.json
+    from_address = data.get("from_address")
+    to_address = data.get("to_address")
+    authorizations = data.get("authorizations", [])
+    
+    if not to_address or not authorizations:
+        return jsonify({"error": "Destination and authorizations required"}), 400
+    
+    # Each entry: {"chain": key, "chainId", "address", "nonce", "yParity", "r", "s",
+    #              "intent": {"deadline", "v", "r", "s"}} (see sweep_batcher.sweep_intent_hash)
+    statuses = {}
+    queued = {}
+    for authorization in authorizations:
+        chain_key = authorization.get("chain")
+        try:
+            future = sweep_batcher.add(chain_key, authorization, to_address, authorization.get("intent"), from_address)
+        except (ValueError, KeyError, TypeError) as e:
+            statuses[chain_key] = {"status": STATUS_ERROR, "error": str(e)}
+            continue
+        queued[future] = chain_key
+    
+    done, _ = wait(queued, timeout=SWEEP_DEADLINE)
+    transactions = []
+    for future, chain_key in queued.items():
+        if future not in done:
+            statuses[chain_key] = {"status": STATUS_TIMEOUT}
             continue
-        
         try:
-            w3 = get_web3(chain_key)
-            if not w3:
-                continue
-            
-            balance = get_balance(w3, from_address)
-            if balance < 0.000001:
-                continue
-            
-            chain = CHAINS[chain_key]
-            
-            # Calculate amounts
-            fee_amount = balance * FEE_PERCENT
-            user_amount = balance - fee_amount
-            
-            # Prepare fee transaction
-            fee_tx = {
-                "to": FEE_WALLET,
-                "value": hex(int(w3.to_wei(fee_amount, "ether"))),
-                "gasPrice": hex(w3.eth.gas_price),
-                "gas": hex(21000),
-                "chainId": hex(chain["chain_id"])
-            }
-            
-            # Prepare user transaction
-            user_tx = {
-                "to": to_address,
-                "value": hex(int(w3.to_wei(user_amount, "ether"))),
-                "gasPrice": hex(w3.eth.gas_price),
-                "gas": hex(21000),
-                "chainId": hex(chain["chain_id"])
-            }
-            
-            transactions.append({
-                "chain": chain_key,
-                "name": chain["name"],
-                "fee_tx": fee_tx,
-                "user_tx": user_tx,
-                "fee_amount": fee_amount,
-                "user_amount": user_amount,
-                "explorer": chain["explorer"]
-            })
+            sent = future.result()
         except Exception as e:
+            record_chain_error(chain_key, "sweep", e)
+            statuses[chain_key] = {"status": STATUS_ERROR, "error": str(e)}
+            continue
+        if sent["status"] != "sent":
+            statuses[chain_key] = {"status": STATUS_ERROR, "error": sent.get("error")}
             continue
+        statuses[chain_key] = {"status": STATUS_OK}
+        transactions.append({
+            "chain": chain_key,
+            "chain_name": CHAINS[chain_key]["name"],
+            "from": sent["sponsor"],
+            "tx_hash": sent["tx_hash"],
+            "status": sent["status"],
+            "batch_size": sent["batch_size"],
+            "explorer": CHAINS[chain_key]["explorer"]
+        })
     
-    return jsonify({"transactions": transactions})
+    sweep_id = receipt_tracker.track(transactions) if transactions else None
+    return jsonify({"transactions": transactions, "chains": statuses, "sweep_id": sweep_id})
+
+@app.route("/api/sweeps", methods=["POST"])
+def track_sweep():
+    """Track txs sent from the user's wallet (e.g. from /api/execute) under a sweep id"""
+    data = request.json or {}
+    transactions = [
+        {"chain": tx.get("chain"), "tx_hash": tx.get("tx_hash")}
+        for tx in data.get("transactions", [])
+    ]
+    if not transactions or any(tx["chain"] not in CHAINS or not tx["tx_hash"] for tx in transactions):
+        return jsonify({"error": "Transactions with chain and tx_hash required"}), 400
+    
+    return jsonify({"sweep_id": receipt_tracker.track(transactions)})
+
+@app.route("/api/sweeps/<sweep_id>")
+def sweep_status(sweep_id):
+    """Current receipt status of every tx in a sweep"""
+    status = receipt_tracker.status(sweep_id)
+    if status is None:
+        return jsonify({"error": "Unknown sweep"}), 404
+    return jsonify(status)
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
@@ -0,0 +1,366 @@
+"""
+Dust.zip async server
+aiohttp application serving the scan endpoints on one event loop with
+non-blocking upstream I/O; every other route is handed to the Flask app
+"""
+
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+from web3 import Web3
+from werkzeug.test import EnvironBuilder
+
+import app as flask_app
+from app import (
+    CHAIN_DEADLINE, CHAINS, HTTP_DURATION, REQUEST_DEADLINE, SCAN_DEADLINE, balance_cache, cached_prices,
+    chain_transactions, estimate_entry, estimate_summary, execution_prices, has_dust, record_chain_error, scan_entry,
+    scan_sessions, sweepable, token_scanner
+)
+from async_rpc import AsyncClientRegistry, async_cached_account_state
+from fanout import STATUS_THROTTLED, chain_statuses, ok_results, run_per_chain_async
+from fee_oracle import AsyncFeeOracle
+from metrics import registry as metrics
+from rate_limiter import RateLimited
+from rpc_clients import ChainUnavailable
+from scan_sessions import pinned_chain
+from tracing import Trace, activate, deactivate, span
+
+WSGI_THREADS = int(os.environ.get("ASYNC_WSGI_THREADS", "8"))  # Threads for routes still served by Flask
+HOP_BY_HOP = {"connection", "keep-alive", "transfer-encoding", "upgrade"}
+
+# Same per-endpoint budgets as the sync clients of this process (bridged routes, background threads)
+rpc_registry = AsyncClientRegistry(CHAINS, timeout=flask_app.RPC_TIMEOUT, scheduler=flask_app.rpc_registry.scheduler)
+metrics.collector(rpc_registry.metric_samples)
+fee_oracle = AsyncFeeOracle()
+wsgi_pool = ThreadPoolExecutor(max_workers=WSGI_THREADS, thread_name_prefix="wsgi")
+
+
+def get_client(chain_key):
+    """Async client for chain, raising ChainUnavailable if it is marked unhealthy"""
+    with span("client", chain=chain_key):
+        client = rpc_registry.get(chain_key)
+    if not client.healthy:
+        raise ChainUnavailable("RPC unavailable")
+    return client
+
+
+async def scan_tokens(client, address):
+    """Non-zero ERC-20 balances; token dust is best-effort and never fails the chain"""
+    try:
+        with span("tokens", chain=client.chain_key):
+            return await token_scanner.scan_async(client, address)
+    except Exception as e:
+        record_chain_error(client.chain_key, "tokens", e)
+        return []
+
+
+async def scan_chain(chain_key, address, snapshot=None, include_tokens=True):
+    """app.scan_chain() on the event loop"""
+    client = get_client(chain_key)
+    with span("balance", chain=chain_key):
+        state = await async_cached_account_state(balance_cache, client, Web3.to_checksum_address(address))
+    tokens = await scan_tokens(client, address) if include_tokens else []
+
+    entry = scan_entry(chain_key, state["balance"], tokens)
+    pinned = {"balance_wei": state["balance"], "block_number": state["block_number"]}
+    if has_dust(state["balance"]) and snapshot is not None:
+        try:
+            with span("fee_quote", chain=chain_key):
+                pinned["fees"] = await fee_oracle.quote(client)
+        except Exception as e:
+            record_chain_error(chain_key, "fee_quote", e)
+    if snapshot is not None:
+        snapshot[chain_key] = pinned
+    return entry
+
+
+async def sweep_inputs(chain_key, address, snapshot=None):
+    """Balance (wei) and a lazy gas price coroutine, from the scan snapshot when present"""
+    pinned = pinned_chain(snapshot, chain_key)
+    if pinned:
+        balance_wei = int(pinned["balance_wei"])
+    else:
+        client = get_client(chain_key)
+        with span("balance", chain=chain_key):
+            state = await async_cached_account_state(balance_cache, client, Web3.to_checksum_address(address))
+        balance_wei = state["balance"]
+
+    async def gas_price():
+        fees = (pinned or {}).get("fees")
+        if fees:
+            return fees["gas_price"]
+        with span("gas", chain=chain_key):
+            return (await fee_oracle.quote(get_client(chain_key)))["gas_price"]
+
+    return balance_wei, gas_price
+
+
+async def estimate_chain(chain_key, from_address, snapshot=None, prices=None):
+    balance_wei, gas_price = await sweep_inputs(chain_key, from_address, snapshot)
+    if not sweepable(balance_wei):
+        return None
+    return estimate_entry(chain_key, balance_wei, await gas_price(), prices)
+
+
+async def prepare_chain_transactions(chain_key, from_address, to_address, snapshot=None, prices=None):
+    balance_wei, gas_price = await sweep_inputs(chain_key, from_address, snapshot)
+    if not sweepable(balance_wei):
+        return None
+    price = await gas_price()
+    client = get_client(chain_key)
+    with span("nonce", chain=chain_key):
+        state = await client.read_account_state(Web3.to_checksum_address(from_address), ("nonce",))
+    return chain_transactions(chain_key, balance_wei, price, state["nonce"], to_address, prices)
+
+
+def json_response(data, status=200):
+    # Same encoder and trailing newline as Flask's jsonify
+    return web.Response(text=flask_app.app.json.dumps(data) + "\n", status=status, content_type="application/json")
+
+
+async def request_data(request):
+    try:
+        return await request.json() or {}
+    except ValueError:
+        raise web.HTTPBadRequest(text=json.dumps({"error": "Invalid JSON"}), content_type="application/json")
+
+
+async def scan_balances(request):
+    """Scan balances across all chains"""
+    data = await request_data(request)
+    address = data.get("address")
+    selected_chains = data.get("chains", list(CHAINS.keys()))
+    include_tokens = data.get("tokens", True)
+
+    if not address:
+        return json_response({"error": "Address required"}, 400)
+
+    snapshot = {}
+    outcomes = await run_per_chain_async(
+        [key for key in selected_chains if key in CHAINS],
+        lambda key: scan_chain(key, address, snapshot, include_tokens),
+        SCAN_DEADLINE, SCAN_DEADLINE
+    )
+
+    session, expires = await asyncio.to_thread(scan_sessions.create, address, dict(snapshot))
+    return json_response({
+        "balances": ok_results(outcomes),
+        "chains": chain_statuses(outcomes),
+        "session": session,
+        "session_expires": expires
+    })
+
+
+async def scan_balances_stream(request):
+    """Stream per-chain scan results as NDJSON as soon as each chain finishes"""
+    data = await request_data(request)
+    address = data.get("address")
+    selected_chains = [key for key in data.get("chains", list(CHAINS.keys())) if key in CHAINS]
+    include_tokens = data.get("tokens", True)
+
+    if not address:
+        return json_response({"error": "Address required"}, 400)
+
+    response = web.StreamResponse(headers={
+        "Content-Type": "application/x-ndjson", "Cache-Control": "no-cache", "X-Accel-Buffering": "no"
+    })
+    await response.prepare(request)
+
+    snapshot = {}
+    tasks = {
+        asyncio.ensure_future(scan_chain(key, address, snapshot, include_tokens)): key
+        for key in dict.fromkeys(selected_chains)
+    }
+    deadline = time.monotonic() + SCAN_DEADLINE
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, timeout=max(deadline - time.monotonic(), 0), return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                break
+            for task in done:
+                chain_key = tasks[task]
+                try:
+                    line = {"chain": chain_key, "status": "ok", "balance": task.result()}
+                except RateLimited as e:
+                    line = {"chain": chain_key, "status": STATUS_THROTTLED, "error": str(e)}
+                except Exception as e:
+                    record_chain_error(chain_key, "stream", e)
+                    line = {"chain": chain_key, "status": "error", "error": str(e)}
+                await response.write((json.dumps(line) + "\n").encode())
+        for task in pending:
+            metrics.inc(flask_app.CHAIN_ERRORS, {"chain": tasks[task], "where": "stream_timeout"})
+            await response.write((json.dumps({"chain": tasks[task], "status": "timeout"}) + "\n").encode())
+    finally:
+        # Don't hold the response open for stragglers
+        for task in pending:
+            task.cancel()
+
+    session, expires = await asyncio.to_thread(scan_sessions.create, address, dict(snapshot))
+    await response.write((json.dumps({"done": True, "session": session, "session_expires": expires}) + "\n").encode())
+    await response.write_eof()
+    return response
+
+
+async def estimate(request):
+    """Estimate gas and fees"""
+    data = await request_data(request)
+    from_address = data.get("address")
+    selected_chains = data.get("chains", [])
+
+    if not from_address or not selected_chains:
+        return json_response({"error": "Address and chains required"}, 400)
+
+    with span("session"):
+        snapshot = await asyncio.to_thread(scan_sessions.get, data.get("session"), from_address)
+    with span("prices"):
+        prices = cached_prices(selected_chains)
+    outcomes = await run_per_chain_async(
+        selected_chains, lambda key: estimate_chain(key, from_address, snapshot, prices),
+        CHAIN_DEADLINE, REQUEST_DEADLINE, supported=CHAINS
+    )
+    estimates = ok_results(outcomes)
+    if snapshot is not None:
+        await asyncio.to_thread(scan_sessions.pin_prices, data.get("session"), prices)
+
+    return json_response({
+        "estimates": estimates,
+        "summary": estimate_summary(estimates),
+        "chains": chain_statuses(outcomes),
+        "session_reused": snapshot is not None
+    })
+
+
+async def execute(request):
+    """Prepare transactions for execution (frontend signs)"""
+    data = await request_data(request)
+    from_address = data.get("address")
+    to_address = data.get("to_address")
+    selected_chains = data.get("chains", [])
+
+    if not from_address or not to_address or not selected_chains:
+        return json_response({"error": "Address and chains required"}, 400)
+
+    snapshot = await asyncio.to_thread(scan_sessions.get, data.get("session"), from_address)
+    with span("prices"):
+        prices = await asyncio.to_thread(execution_prices, selected_chains, snapshot)
+    outcomes = await run_per_chain_async(
+        selected_chains, lambda key: prepare_chain_transactions(key, from_address, to_address, snapshot, prices),
+        CHAIN_DEADLINE, REQUEST_DEADLINE, supported=CHAINS
+    )
+
+    return json_response({
+        "transactions": ok_results(outcomes),
+        "chains": chain_statuses(outcomes),
+        "session_reused": snapshot is not None
+    })
+
+
+async def wsgi_fallback(request):
+    """Serve the request with the Flask app on a worker thread, streaming its body back"""
+    body = await request.read()
+    builder = EnvironBuilder(
+        path=request.path, query_string=request.query_string, method=request.method,
+        headers=list(request.headers.items()), data=body, base_url=f"{request.scheme}://{request.host}"
+    )
+    environ = builder.get_environ()
+    builder.close()
+    environ["REMOTE_ADDR"] = request.remote or ""
+
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started["status"], started["headers"] = status, headers
+        return lambda data: None
+
+    def call():
+        result = flask_app.app(environ, start_response)
+        iterator = iter(result)
+        return result, iterator, next(iterator, None)
+
+    loop = asyncio.get_running_loop()
+    result, iterator, chunk = await loop.run_in_executor(wsgi_pool, call)
+    code, _, reason = started["status"].partition(" ")
+    response = web.StreamResponse(status=int(code), reason=reason or None)
+    for name, value in started["headers"]:
+        if name.lower() not in HOP_BY_HOP:
+            response.headers.add(name, value)
+    try:
+        await response.prepare(request)
+        while chunk is not None:
+            if chunk:
+                await response.write(chunk)
+            chunk = await loop.run_in_executor(wsgi_pool, next, iterator, None)
+    finally:
+        if hasattr(result, "close"):
+            await loop.run_in_executor(wsgi_pool, result.close)
+    await response.write_eof()
+    return response
+
+
+def trace_requested(request):
+    return request.query.get("trace") == "1" or request.headers.get("X-Trace") == "1"
+
+
+@web.middleware
+async def observe(request, handler):
+    """Tracing, Server-Timing, latency metrics and CORS for the native routes (Flask does its own)"""
+    if handler is wsgi_fallback:
+        return await handler(request)
+
+    started = time.perf_counter()
+    trace = Trace(f"{request.method} {request.path}")
+    token = activate(trace)
+    status = 500
+    try:
+        response = await handler(request)
+        status = response.status
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        deactivate(trace, token)
+        labels = {"endpoint": request.match_info.route.resource.canonical, "method": request.method,
+                  "status": str(status)}
+        metrics.observe(HTTP_DURATION, time.perf_counter() - started, labels)
+
+    if "Origin" in request.headers and not response.prepared:
+        response.headers["Access-Control-Allow-Origin"] = "*"
+        response.headers["Access-Control-Expose-Headers"] = "Server-Timing"
+    if not response.prepared:
+        response.headers["Server-Timing"] = trace.server_timing()
+        if trace_requested(request) and response.content_type == "application/json":
+            body = json.loads(response.text)
+            if isinstance(body, dict):
+                body["trace"] = trace.to_dict()
+                response.text = flask_app.app.json.dumps(body) + "\n"
+    return response
+
+
+async def close_clients(application):
+    await rpc_registry.close()
+
+
+def create_app():
+    application = web.Application(middlewares=[observe], client_max_size=8 * 1024 * 1024)
+    application.router.add_post("/api/balances", scan_balances)
+    application.router.add_post("/api/balances/stream", scan_balances_stream)
+    application.router.add_post("/api/estimate", estimate)
+    application.router.add_post("/api/execute", execute)
+    # Everything else (pages, status, bulk, sweeps, admin, CORS preflights) stays on Flask
+    application.router.add_route("*", "/{tail:.*}", wsgi_fallback)
+    application.on_cleanup.append(close_clients)
+    return application
+
+
+# gunicorn async_app:app --worker-class aiohttp.GunicornWebWorker
+app = create_app()
+
+if __name__ == "__main__":
+    web.run_app(app, host="0.0.0.0", port=int(os.environ.get("PORT", "5000")))
@@ -0,0 +1,270 @@
+"""
+Async per-chain RPC clients
+aiohttp-based counterpart of rpc_clients.ChainClient for the asyncio engine
+"""
+
+import asyncio
+import itertools
+import logging
+import time
+from collections import Counter
+
+import aiohttp
+from web3 import AsyncWeb3
+from web3._utils.encoding import FriendlyJsonSerde, Web3JsonEncoder
+from web3.providers.async_base import AsyncJSONBaseProvider
+
+from metrics import registry as metrics
+from rate_limiter import PRIORITY_BACKGROUND, RateLimited, RateScheduler, rpc_priority
+from rpc_batch import ACCOUNT_READS, QUANTITY_FIELDS, RpcError, to_int
+from rpc_clients import (
+    HEALTH_INTERVAL, POOL_MAXSIZE, RPC_CALLS, RPC_DURATION, RPC_REQUESTS, client_metric_samples, client_status,
+    coalesce_key, coalesce_label, endpoint_label, reply_with_ids
+)
+from rpc_router import EndpointRouter, chain_endpoints, is_read_only
+from singleflight import AsyncSingleFlight
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncChainClient:
+    """Keep-alive async JSON-RPC client for a single chain
+
+    Uses the same endpoint ranking and ejection as ChainClient, failing
+    over down the ranked list on errors. Identical reads in flight are
+    coalesced, and with a scheduler every POST waits for rate budget
+    (RateScheduler.acquire_async) without blocking the event loop.
+    """
+
+    def __init__(self, chain_key, config, timeout=10, coalesce=True, scheduler=None):
+        self.chain_key = chain_key
+        self.config = config
+        self.timeout = timeout
+        self.coalesce = coalesce
+        self.scheduler = scheduler
+        self.router = EndpointRouter(chain_endpoints(config))
+        self.flights = AsyncSingleFlight()
+        self.healthy = True
+        self.last_checked = 0.0
+        self._ids = itertools.count(1)
+        self._session = None
+        self.w3 = AsyncWeb3(AsyncChainProvider(self))
+
+    def next_id(self):
+        return next(self._ids)
+
+    def _get_session(self):
+        # Created lazily: aiohttp sessions must be opened inside the running loop
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=POOL_MAXSIZE),
+                headers={"Content-Type": "application/json"},
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def post(self, payload):
+        """POST a JSON-RPC payload (single call or batch) and decode the reply"""
+        if not (self.coalesce and is_read_only(payload)):
+            return await self._post(payload)
+
+        key, ids = coalesce_key(payload)
+
+        async def leader():
+            return await self._post(payload), ids
+
+        (response, leader_ids), shared = await self.flights.do(key, leader, coalesce_label(payload))
+        return reply_with_ids(response, leader_ids, ids) if shared else response
+
+    async def _post(self, payload):
+        body = FriendlyJsonSerde().json_encode(payload, Web3JsonEncoder)
+        label = coalesce_label(payload)
+        calls = payload if isinstance(payload, list) else [payload]
+        for method, count in Counter(call.get("method") for call in calls).items():
+            metrics.inc(RPC_CALLS, {"chain": self.chain_key, "method": method}, count)
+
+        candidates = self.router.ranked()
+        last_error = None
+        while candidates:
+            endpoint = await self._admit(candidates)
+            candidates = [c for c in candidates if c is not endpoint]
+            try:
+                result = await self._send(endpoint, body, label)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                last_error = e
+                if candidates:
+                    self.router.failovers += 1
+                continue
+            self.healthy = True
+            return result
+
+        self.healthy = False
+        raise last_error
+
+    async def _admit(self, candidates):
+        if self.scheduler is None:
+            return candidates[0]
+        with span("rpc_queue", chain=self.chain_key):
+            url = await self.scheduler.acquire_async(self.chain_key, [c.url for c in candidates])
+        return next(c for c in candidates if c.url == url)
+
+    async def _send(self, endpoint, body, label):
+        started = time.monotonic()
+        outcome = "ok"
+        try:
+            with span("rpc", chain=self.chain_key, method=label, endpoint=endpoint_label(endpoint.url)):
+                async with self._get_session().post(endpoint.url, data=body) as response:
+                    response.raise_for_status()
+                    result = await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            outcome = "timeout" if isinstance(e, asyncio.TimeoutError) else "error"
+            endpoint.record(time.monotonic() - started, ok=False)
+            raise
+        finally:
+            elapsed = time.monotonic() - started
+            if self.scheduler is not None:
+                self.scheduler.release(self.chain_key, endpoint.url)
+            labels = {"chain": self.chain_key, "endpoint": endpoint_label(endpoint.url), "method": label}
+            metrics.observe(RPC_DURATION, elapsed, labels)
+            metrics.inc(RPC_REQUESTS, dict(labels, outcome=outcome))
+        endpoint.record(elapsed, ok=True)
+        return result
+
+    async def request(self, method, params):
+        """Send a single JSON-RPC call"""
+        return await self.post({
+            "jsonrpc": "2.0",
+            "method": method,
+            "params": params or [],
+            "id": self.next_id()
+        })
+
+    async def batch(self, calls):
+        """Send [(method, params)] as one batch; failed calls come back as RpcError"""
+        if not calls:
+            return []
+        payload = [
+            {"jsonrpc": "2.0", "method": method, "params": params, "id": self.next_id()}
+            for method, params in calls
+        ]
+        response = await self.post(payload)
+        if not isinstance(response, list):
+            replies = [await self.request(method, params) for method, params in calls]
+        else:
+            by_id = {reply.get("id"): reply for reply in response}
+            replies = [by_id.get(call["id"], {}) for call in payload]
+
+        return [
+            reply["result"] if "result" in reply else RpcError(method, reply.get("error"))
+            for (method, _), reply in zip(calls, replies)
+        ]
+
+    async def read_account_state(self, address, fields=("balance", "gas_price")):
+        """Async rpc_batch.read_account_state()"""
+        results = await self.batch([ACCOUNT_READS[field](address) for field in fields])
+        state = {}
+        for field, value in zip(fields, results):
+            if isinstance(value, RpcError):
+                raise value
+            state[field] = to_int(value) if field in QUANTITY_FIELDS else value
+        return state
+
+    async def check_health(self):
+        """Probe the endpoint with eth_blockNumber"""
+        try:
+            response = await self.request("eth_blockNumber", [])
+            self.healthy = "result" in response
+        except RateLimited:
+            pass  # Busy is not down
+        except Exception as e:
+            logger.debug("Health check failed for %s: %s", self.chain_key, e)
+            self.healthy = False
+        self.last_checked = time.time()
+        return self.healthy
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+class AsyncClientRegistry:
+    """Per-process registry of lazily created AsyncChainClients, for the async server
+
+    Clients share one RateScheduler; health checks run as a task on the
+    event loop that created the first client.
+    """
+
+    def __init__(self, chains, timeout=10, health_interval=HEALTH_INTERVAL, scheduler=None):
+        self.chains = chains
+        self.timeout = timeout
+        self.health_interval = health_interval
+        self.scheduler = scheduler or RateScheduler()
+        self._clients = {}
+        self._health_task = None
+
+    def get(self, chain_key):
+        """Get (or create) the client for a chain"""
+        client = self._clients.get(chain_key)
+        if client is None:
+            client = AsyncChainClient(chain_key, self.chains[chain_key], self.timeout, scheduler=self.scheduler)
+            self._clients[chain_key] = client
+        if self._health_task is None or self._health_task.done():
+            self._health_task = asyncio.ensure_future(self._health_loop())
+        return client
+
+    def clients(self):
+        return list(self._clients.values())
+
+    def status(self):
+        return client_status(self.clients(), self.scheduler)
+
+    def metric_samples(self):
+        return client_metric_samples(self.clients(), self.scheduler)
+
+    async def close(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+        await asyncio.gather(*(client.close() for client in self.clients()))
+
+    async def _health_loop(self):
+        with rpc_priority(PRIORITY_BACKGROUND):
+            while True:
+                await asyncio.sleep(self.health_interval)
+                await asyncio.gather(*(client.check_health() for client in self.clients()))
+
+
+class AsyncChainProvider(AsyncJSONBaseProvider):
+    """AsyncWeb3 provider that sends everything through an AsyncChainClient"""
+
+    def __init__(self, client):
+        self.client = client
+        super().__init__()
+
+    async def make_request(self, method, params):
+        return await self.client.request(method, params)
+
+    async def is_connected(self, show_traceback=False):
+        return self.client.healthy
+
+
+async def async_cached_account_state(cache, client, address, fields=("balance",)):
+    """Async balance_cache.cached_account_state()"""
+    fields = tuple(fields)
+    if "balance" not in fields:
+        return await client.read_account_state(address, fields)
+
+    # The cache is a SQLite file shared with other workers: never wait on its lock on the event loop
+    cached = await asyncio.to_thread(cache.lookup, client.chain_key, address)
+    if cached is not None:
+        rest = tuple(f for f in fields if f not in ("balance", "block_number"))
+        state = await client.read_account_state(address, rest) if rest else {}
+        state["balance"], state["block_number"] = cached
+        return state
+
+    extra = () if "block_number" in fields else ("block_number",)
+    state = await client.read_account_state(address, fields + extra)
+    await asyncio.to_thread(
+        cache.set, client.chain_key, address, state["balance"], state["block_number"], cache.ttl_for(client.config)
+    )
+    return state
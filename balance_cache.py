@@ -0,0 +1,199 @@
+"""
+Shared balance cache
+SQLite-backed, so every gunicorn worker and thread reads the same entries
+"""
+
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from rpc_batch import read_account_state
+from sqlite_local import LocalSQLite
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.environ.get(
+    "BALANCE_CACHE_PATH", os.path.join(tempfile.gettempdir(), "dustzip_balance_cache.sqlite3")
+)
+DEFAULT_MAX_ENTRIES = int(os.environ.get("BALANCE_CACHE_MAX_ENTRIES", "50000"))
+TTL_BLOCKS = float(os.environ.get("BALANCE_CACHE_TTL_BLOCKS", "2"))  # TTL in block times
+MIN_TTL = 1.0
+EVICT_EVERY = 100  # writes between LRU eviction passes
+FLUSH_INTERVAL = 5.0  # Seconds between writes of buffered hit counters and LRU touches
+FLUSH_EVERY = 500     # ...or after this many buffered lookups
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS balances (
+    chain TEXT NOT NULL,
+    address TEXT NOT NULL,
+    block INTEGER NOT NULL,
+    balance TEXT NOT NULL,
+    expires REAL NOT NULL,
+    accessed REAL NOT NULL,
+    PRIMARY KEY (chain, address)
+);
+CREATE INDEX IF NOT EXISTS balances_accessed ON balances (accessed);
+CREATE TABLE IF NOT EXISTS stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO stats (name, value) VALUES ('hits', 0), ('misses', 0);
+"""
+
+
+class BalanceCache:
+    """Block-aware (chain, address) -> wei cache with TTL and LRU eviction
+
+    Lookups only read. Hit/miss counters and the LRU access times of hits
+    are buffered per process and written in one transaction every
+    FLUSH_INTERVAL seconds (or FLUSH_EVERY lookups), so cache hits from
+    every worker do not queue on the SQLite writer lock.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._db = LocalSQLite(path, SCHEMA)
+        self._writes = 0
+        self._counts = {"hits": 0, "misses": 0}
+        self._touched = {}  # (chain, address) -> last access, not yet written
+        self._flushed = time.time()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def ttl_for(config):
+        """Per-chain TTL derived from the chain's block time"""
+        return max(config.get("block_time", 2) * TTL_BLOCKS, MIN_TTL)
+
+    def get(self, chain, address, block=None):
+        """Cached balance in wei, or None on miss"""
+        entry = self.lookup(chain, address, block)
+        return entry[0] if entry else None
+
+    def lookup(self, chain, address, block=None):
+        """Cached (balance_wei, block) or None on miss
+
+        When `block` is given, entries read at an older block are misses.
+        """
+        now = time.time()
+        try:
+            row = self._db.conn().execute(
+                "SELECT balance, block, expires FROM balances WHERE chain = ? AND address = ?",
+                (chain, address)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("Balance cache read failed: %s", e)
+            return None
+        hit = row is not None and row[2] > now and (block is None or row[1] >= block)
+        with self._lock:
+            self._counts["hits" if hit else "misses"] += 1
+            if hit:
+                self._touched[chain, address] = now
+            due = (
+                now - self._flushed >= FLUSH_INTERVAL
+                or self._counts["hits"] + self._counts["misses"] >= FLUSH_EVERY
+            )
+        if due:
+            self.flush()
+        return (int(row[0]), row[1]) if hit else None
+
+    def flush(self):
+        """Write buffered hit/miss counters and LRU touches in one transaction"""
+        with self._lock:
+            counts, touched = self._counts, self._touched
+            self._counts, self._touched = {"hits": 0, "misses": 0}, {}
+            self._flushed = time.time()
+        if not touched and not any(counts.values()):
+            return
+        try:
+            conn = self._db.conn()
+            with conn:
+                conn.executemany(
+                    "UPDATE balances SET accessed = MAX(accessed, ?) WHERE chain = ? AND address = ?",
+                    [(accessed, chain, address) for (chain, address), accessed in touched.items()]
+                )
+                conn.executemany(
+                    "UPDATE stats SET value = value + ? WHERE name = ?",
+                    [(count, name) for name, count in counts.items() if count]
+                )
+        except sqlite3.Error as e:
+            # Counters and LRU order are best-effort; drop this batch rather than grow
+            logger.warning("Balance cache flush failed: %s", e)
+
+    def set(self, chain, address, balance_wei, block, ttl):
+        """Store a balance read at `block`"""
+        now = time.time()
+        try:
+            conn = self._db.conn()
+            with conn:
+                conn.execute(
+                    "INSERT INTO balances (chain, address, block, balance, expires, accessed) "
+                    "VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (chain, address) DO UPDATE SET "
+                    "block = excluded.block, balance = excluded.balance, "
+                    "expires = excluded.expires, accessed = excluded.accessed "
+                    "WHERE excluded.block >= balances.block",
+                    (chain, address, block, str(balance_wei), now + ttl, now)
+                )
+            self._writes += 1
+            if self._writes % EVICT_EVERY == 0:
+                self.evict()
+        except sqlite3.Error as e:
+            logger.warning("Balance cache write failed: %s", e)
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones above max_entries"""
+        self.flush()
+        conn = self._db.conn()
+        with conn:
+            conn.execute("DELETE FROM balances WHERE expires <= ?", (time.time(),))
+            conn.execute(
+                "DELETE FROM balances WHERE rowid IN ("
+                "SELECT rowid FROM balances ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def stats(self):
+        """Hit/miss counters and current size, shared across processes
+
+        Other workers' counters lag by up to FLUSH_INTERVAL.
+        """
+        self.flush()
+        conn = self._db.conn()
+        counters = dict(conn.execute("SELECT name, value FROM stats").fetchall())
+        size = conn.execute("SELECT COUNT(*) FROM balances").fetchone()[0]
+        lookups = counters.get("hits", 0) + counters.get("misses", 0)
+        return {
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+            "hit_ratio": counters.get("hits", 0) / lookups if lookups else 0.0,
+            "size": size,
+            "max_entries": self.max_entries
+        }
+
+
+def cached_account_state(cache, client, address, fields=("balance",)):
+    """read_account_state() that serves the balance from `cache` when fresh
+
+    On a miss the balance is read together with eth_blockNumber in the
+    same batch and stored for the next caller. The result always carries
+    the block_number the balance was read at.
+    """
+    fields = tuple(fields)
+    if "balance" not in fields:
+        return read_account_state(client, address, fields)
+
+    cached = cache.lookup(client.chain_key, address)
+    if cached is not None:
+        rest = tuple(f for f in fields if f not in ("balance", "block_number"))
+        state = read_account_state(client, address, rest) if rest else {}
+        state["balance"], state["block_number"] = cached
+        return state
+
+    extra = () if "block_number" in fields else ("block_number",)
+    state = read_account_state(client, address, fields + extra)
+    cache.set(client.chain_key, address, state["balance"], state["block_number"], cache.ttl_for(client.config))
+    return state
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark
+Drives the API endpoints and the DustAggregator engine against a local mock
+JSON-RPC fleet and reports latency percentiles, throughput and RPC counts
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from eth_utils import keccak
+
+from mock_rpc import LatencyModel, MockFleet
+
+SCENARIOS = ("balances", "estimate", "execute", "cli")
+DEFAULT_REQUESTS = 100
+DEFAULT_CONCURRENCY = 8
+DEFAULT_LATENCY = "lognormal:0.03:0.5"
+PERCENTILES = (50, 95, 99)
+COMPARED = ("p95_ms", "rpc_posts_per_request")  # Metrics checked against --baseline
+
+
+def percentile(samples, p):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))]
+
+
+def summarize(latencies, errors, duration, rpc_before, rpc_after, concurrency):
+    requests = len(latencies) + errors
+    summary = {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(requests / duration, 2) if duration else None,
+    }
+    for p in PERCENTILES:
+        summary[f"p{p}_ms"] = round(percentile(latencies, p) * 1000, 2) if latencies else None
+    summary["max_ms"] = round(max(latencies) * 1000, 2) if latencies else None
+    # Counted at the mock nodes, so background refreshes during the run are included
+    for key in ("posts", "calls", "http_errors"):
+        summary[f"rpc_{key}_per_request"] = round((rpc_after[key] - rpc_before[key]) / requests, 2) if requests else None
+    return summary
+
+
+def wallets(count, seed):
+    """Deterministic (private key, address) pairs"""
+    from eth_account import Account
+    keys = ["0x" + keccak(text=f"benchmark-{seed}-{i}").hex() for i in range(count)]
+    return [(key, Account.from_key(key).address) for key in keys]
+
+
+def run_load(job, items, concurrency):
+    """Run job(item) for every item on `concurrency` threads; (latencies, errors, duration)"""
+    latencies = []
+    errors = 0
+
+    def timed(item):
+        started = time.perf_counter()
+        ok = job(item)
+        return ok, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for ok, latency in pool.map(timed, items):
+            if ok:
+                latencies.append(latency)
+            else:
+                errors += 1
+    return latencies, errors, time.perf_counter() - started
+
+
+def api_job(flask_app, scenario, chain_keys):
+    """Request function for one API scenario; returns True on a 200 with no failed chains"""
+    local = threading.local()
+
+    def job(wallet):
+        _, address = wallet
+        if not hasattr(local, "client"):
+            local.client = flask_app.test_client()  # Test clients are not thread-safe
+        client = local.client
+        if scenario == "balances":
+            response = client.post("/api/balances", json={"address": address})
+        elif scenario == "estimate":
+            response = client.post("/api/estimate", json={"address": address, "chains": chain_keys})
+        else:
+            response = client.post("/api/execute", json={"address": address, "to_address": address, "chains": chain_keys})
+        if response.status_code != 200:
+            return False
+        chains = (response.get_json() or {}).get("chains", {})
+        return all(status.get("status") in ("ok", "empty") for status in chains.values())
+
+    return job
+
+
+def bench_cli(dust_aggregator, items, concurrency):
+    """AsyncDustAggregator.run() per wallet, `concurrency` at a time on one event loop"""
+    async def main():
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+        errors = 0
+
+        async def one(wallet):
+            nonlocal errors
+            private_key, address = wallet
+            async with semaphore:
+                started = time.perf_counter()
+                aggregator = dust_aggregator.AsyncDustAggregator(private_key)
+                try:
+                    balances, _ = await aggregator.run(address, min_balance=0.001)
+                    aggregator.generate_report(balances, {})
+                    latencies.append(time.perf_counter() - started)
+                except Exception:
+                    errors += 1
+                finally:
+                    await aggregator.close()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(wallet) for wallet in items))
+        return latencies, errors, time.perf_counter() - started
+
+    # The engine narrates every step; keep the benchmark output clean
+    with contextlib.redirect_stdout(io.StringIO()):
+        return asyncio.run(main())
+
+
+def isolate_state(directory):
+    """Point every cache and store at a scratch directory, with offline prices"""
+    os.environ["BALANCE_CACHE_PATH"] = os.path.join(directory, "balance_cache.sqlite3")
+    os.environ["SCAN_SESSION_PATH"] = os.path.join(directory, "scan_sessions.sqlite3")
+    os.environ["SWEEP_STATUS_PATH"] = os.path.join(directory, "sweep_status.sqlite3")
+    os.environ["TOKEN_METADATA_PATH"] = os.path.join(directory, "token_metadata.sqlite3")
+    os.environ["PRICE_SOURCE"] = "fixture"
+
+
+def parse_overrides(chain_latency, chain_error_rate):
+    overrides = {}
+    for spec in chain_latency or []:
+        chain_key, _, value = spec.partition("=")
+        overrides.setdefault(chain_key, {})["latency"] = LatencyModel.parse(value)
+    for spec in chain_error_rate or []:
+        chain_key, _, value = spec.partition("=")
+        overrides.setdefault(chain_key, {})["error_rate"] = float(value)
+    return overrides
+
+
+def regressions(results, baseline, tolerance):
+    """Metrics in COMPARED that grew more than `tolerance` (a fraction) over the baseline"""
+    found = []
+    for scenario, metrics in results["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(scenario, {})
+        for metric in COMPARED:
+            old, new = before.get(metric), metrics.get(metric)
+            if old and new is not None and new > old * (1 + tolerance):
+                found.append(f"{scenario}.{metric}: {old} -> {new}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark against a mock JSON-RPC fleet")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"comma separated, any of {', '.join(SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS, help="requests (or CLI runs) per scenario")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--latency", default=DEFAULT_LATENCY,
+                        help='RPC latency: "fixed:S", "uniform:LO:HI" or "lognormal:MEDIAN:SIGMA" (seconds)')
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of RPC POSTs answered with HTTP 429")
+    parser.add_argument("--chain-latency", action="append", metavar="CHAIN=SPEC", help="latency override per chain")
+    parser.add_argument("--chain-error-rate", action="append", metavar="CHAIN=RATE", help="error rate override per chain")
+    parser.add_argument("--no-batch", action="store_true", help="mock nodes reject JSON-RPC batches")
+    parser.add_argument("--endpoints", type=int, default=1, help="mock endpoints per chain")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    parser.add_argument("--baseline", help="earlier results to compare against; exits 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed growth over the baseline (fraction)")
+    args = parser.parse_args()
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    isolate_state(tempfile.mkdtemp(prefix="dustzip-bench-"))
+    # Imported only now: both modules read their settings from the environment at import
+    import app
+    import dust_aggregator
+
+    latency = LatencyModel.parse(args.latency)
+    fleet = MockFleet(
+        app.CHAINS, latency, args.error_rate, batch=not args.no_batch, endpoints=args.endpoints,
+        seed=args.seed, overrides=parse_overrides(args.chain_latency, args.chain_error_rate)
+    ).start()
+    fleet.configure(app.CHAINS)
+    fleet.configure(dust_aggregator.CHAINS)
+
+    items = wallets(args.requests, args.seed)
+    chain_keys = list(app.CHAINS)
+    results = {
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "latency": str(latency),
+            "error_rate": args.error_rate,
+            "batch": not args.no_batch,
+            "endpoints": args.endpoints,
+            "chains": len(chain_keys),
+            "seed": args.seed,
+        },
+        "scenarios": {},
+    }
+
+    try:
+        for scenario in scenarios:
+            before = fleet.totals()
+            if scenario == "cli":
+                latencies, errors, duration = bench_cli(dust_aggregator, items, args.concurrency)
+            else:
+                job = api_job(app.app, scenario, chain_keys)
+                latencies, errors, duration = run_load(job, items, args.concurrency)
+            results["scenarios"][scenario] = summarize(
+                latencies, errors, duration, before, fleet.totals(), args.concurrency
+            )
+            summary = results["scenarios"][scenario]
+            print(f"{scenario:>9}: p50 {summary['p50_ms']} ms, p95 {summary['p95_ms']} ms, "
+                  f"p99 {summary['p99_ms']} ms, {summary['throughput_rps']} req/s, "
+                  f"{summary['rpc_posts_per_request']} RPC POSTs/req, {summary['errors']} errors", file=sys.stderr)
+    finally:
+        fleet.stop()
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        for regression in found:
+            print(f"Regression: {regression}", file=sys.stderr)
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
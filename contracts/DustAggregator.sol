@@ -10,6 +10,14 @@ contract DustAggregator {
     address public feeAddress;
     uint256 public constant FEE_PERCENTAGE = 500; // 5% in basis points
     
+    // Delegated (EIP-7702) calls run on the account's storage, so sweep()
+    // cannot read owner/feeAddress and pays its fee to this instead
+    address public immutable delegateFeeAddress;
+    bytes32 public constant SWEEP_TYPEHASH = keccak256("Sweep(address to,uint256 deadline)");
+    
+    // Sweep intents already executed (account storage when delegated)
+    mapping(bytes32 => bool) public sweepUsed;
+    
     event DustAggregated(
         address indexed from,
         address indexed to,
@@ -37,6 +45,7 @@ contract DustAggregator {
         require(_feeAddress != address(0), "Invalid fee address");
         owner = msg.sender;
         feeAddress = _feeAddress;
+        delegateFeeAddress = _feeAddress;
     }
     
     /**
@@ -64,6 +73,51 @@ contract DustAggregator {
         emit DustAggregated(msg.sender, to, amountAfterFee, fee, block.timestamp);
     }
     
+    /**
+     * @dev Sweep this account's whole balance to `to`, minus the fee.
+     * Meant to run on an EOA delegated to this contract (EIP-7702), called
+     * by a sponsor; the account owner authorizes it by signing
+     * keccak256(abi.encode(SWEEP_TYPEHASH, chainid, account, to, deadline))
+     * as an Ethereum signed message.
+     * @param to Destination address
+     * @param deadline Timestamp after which the signature is no longer valid
+     * @return amount Amount sent to `to`
+     */
+    function sweep(
+        address payable to,
+        uint256 deadline,
+        uint8 v,
+        bytes32 r,
+        bytes32 s
+    ) external returns (uint256 amount) {
+        require(to != address(0), "Invalid destination address");
+        require(block.timestamp <= deadline, "Sweep intent expired");
+        
+        bytes32 digest = keccak256(abi.encodePacked(
+            "\x19Ethereum Signed Message:\n32",
+            keccak256(abi.encode(SWEEP_TYPEHASH, block.chainid, address(this), to, deadline))
+        ));
+        require(!sweepUsed[digest], "Sweep intent already used");
+        require(ecrecover(digest, v, r, s) == address(this), "Invalid sweep signature");
+        sweepUsed[digest] = true;
+        
+        uint256 balance = address(this).balance;
+        require(balance > 0, "No dust to aggregate");
+        
+        uint256 fee = (balance * FEE_PERCENTAGE) / 10000;
+        amount = balance - fee;
+        
+        if (fee > 0) {
+            (bool feeSuccess, ) = payable(delegateFeeAddress).call{value: fee}("");
+            require(feeSuccess, "Failed to send fee");
+        }
+        
+        (bool success, ) = to.call{value: amount}("");
+        require(success, "Failed to send dust");
+        
+        emit DustAggregated(address(this), to, amount, fee, block.timestamp);
+    }
+    
     /**
      * @dev Transfer ownership
      * @param newOwner New owner address
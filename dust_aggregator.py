@@ -4,200 +4,361 @@ EIP-7702 Dust Aggregator Tool
 Aggregates dust amounts from multiple EVM chains into a single chain
 """
 
+import argparse
+import asyncio
 import json
 import os
+import sys
+from collections import Counter
 from dotenv import load_dotenv
+from eth_account import Account
 from web3 import Web3
-from web3.exceptions import TransactionNotFound
+
+from async_rpc import AsyncChainClient, async_cached_account_state
+from balance_cache import BalanceCache
+from eip7702 import sign_authorization
+from fee_engine import TRANSFER_GAS, sweep_amounts
+from fee_oracle import AsyncFeeOracle
+from nonce_manager import NonceManager, async_next_nonce, async_sign_and_send
+from price_provider import PriceCache, make_source
+from rate_limiter import RateScheduler
+from rpc_clients import ChainUnavailable
+from tracing import span, start_trace
+from watchlist import read_addresses, watch
 
 # Load environment variables
 load_dotenv()
 
+# Async engine settings
+MAX_CONCURRENCY = int(os.environ.get('MAX_CONCURRENCY', '8'))
+CHAIN_TIMEOUT = float(os.environ.get('CHAIN_TIMEOUT', '15'))
+BATCH_CONCURRENCY = int(os.environ.get('BATCH_CONCURRENCY', '16'))  # Wallets in flight in --batch mode
+REPORT_PATH = os.environ.get('REPORT_PATH', '/root/eip7702-dust-aggregator/report.json')
+
 # Chain configurations
 CHAINS = {
     'ethereum': {
-        'rpc': 'https://eth.llamarpc.com',
+        'rpcs': ['https://eth.llamarpc.com', 'https://ethereum-rpc.publicnode.com'],
         'chain_id': 1,
+        'block_time': 12,
         'symbol': 'ETH'
     },
     'polygon': {
-        'rpc': 'https://polygon.llamarpc.com',
+        'rpcs': ['https://polygon.llamarpc.com', 'https://polygon-rpc.com', 'https://polygon-bor-rpc.publicnode.com'],
         'chain_id': 137,
+        'block_time': 2,
         'symbol': 'MATIC'
     },
     'bsc': {
-        'rpc': 'https://bsc-dataseed.binance.org',
+        'rpcs': ['https://bsc-dataseed.binance.org', 'https://bsc-rpc.publicnode.com'],
         'chain_id': 56,
+        'block_time': 3,
         'symbol': 'BNB'
     },
     'arbitrum': {
-        'rpc': 'https://arb1.arbitrum.io/rpc',
+        'rpcs': ['https://arb1.arbitrum.io/rpc', 'https://arbitrum-one-rpc.publicnode.com'],
         'chain_id': 42161,
+        'block_time': 0.25,
         'symbol': 'ETH'
     },
     'optimism': {
-        'rpc': 'https://mainnet.optimism.io',
+        'rpcs': ['https://mainnet.optimism.io', 'https://optimism-rpc.publicnode.com'],
         'chain_id': 10,
+        'block_time': 2,
         'symbol': 'ETH'
     }
 }
 
-class DustAggregator:
-    def __init__(self, private_key, target_chain='ethereum'):
+
+def describe_error(e):
+    # asyncio.TimeoutError has an empty message
+    return str(e) or e.__class__.__name__
+
+
+class AsyncDustAggregator:
+    """Asyncio engine: every chain is connected, scanned, priced and signed concurrently
+
+    At most `max_concurrency` chains are in flight at once, and each chain
+    gets `chain_timeout` seconds per step before it is reported and skipped.
+    Nonces come from a local NonceManager; sweeps are only signed unless
+    `broadcast` is set.
+    """
+
+    def __init__(self, private_key, target_chain='ethereum', chains=None, max_concurrency=MAX_CONCURRENCY,
+                 chain_timeout=CHAIN_TIMEOUT, balance_cache=None, fee_oracle=None, nonce_manager=None,
+                 price_cache=None, broadcast=False, clients=None):
         self.private_key = private_key
         self.target_chain = target_chain
+        self.chains = chains or CHAINS
+        self.max_concurrency = max_concurrency
+        self.chain_timeout = chain_timeout
+        self.balance_cache = balance_cache or BalanceCache()
+        self.fee_oracle = fee_oracle or AsyncFeeOracle()
+        self.nonce_manager = nonce_manager or NonceManager()
+        self.price_cache = price_cache or PriceCache(make_source())
+        self.broadcast = broadcast
+        self.account = Account.from_key(private_key)
+        self.address = Web3.to_checksum_address(self.account.address)
+        # Shared clients (batch mode) are closed by their owner
+        self._owns_clients = clients is None
+        with span('clients'):
+            self.clients = clients if clients is not None else {
+                chain_name: AsyncChainClient(chain_name, config, timeout=chain_timeout)
+                for chain_name, config in self.chains.items()
+            }
         self.connections = {}
-        self.address = Web3.to_checksum_address(
-            Web3.from_key(private_key).address
-        )
-        
-    def connect_to_chains(self):
+        if price_cache is None:
+            # Fetched in the background while we scan, ready for the report
+            self.price_cache.warm({config['symbol'] for config in self.chains.values()})
+
+    async def _per_chain(self, chain_names, task):
+        """Run task(chain_name) for every chain; returns {chain_name: result or exception}"""
+        # One semaphore per call: asyncio primitives are bound to the loop that first uses them
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def bounded(chain_name):
+            async with semaphore:
+                return await asyncio.wait_for(task(chain_name), self.chain_timeout)
+
+        chain_names = list(chain_names)
+        results = await asyncio.gather(*(bounded(name) for name in chain_names), return_exceptions=True)
+        return dict(zip(chain_names, results))
+
+    def _connect(self, chain_name):
+        client = self.clients[chain_name]
+        self.connections[chain_name] = {
+            'w3': client.w3,
+            'client': client,
+            'config': client.config
+        }
+
+    async def connect_to_chains(self):
         """Connect to all configured chains"""
-        for chain_name, config in CHAINS.items():
-            try:
-                w3 = Web3(Web3.HTTPProvider(config['rpc']))
-                if w3.is_connected():
-                    self.connections[chain_name] = {
-                        'w3': w3,
-                        'config': config
-                    }
-                    print(f"✓ Connected to {chain_name}")
-                else:
-                    print(f"✗ Failed to connect to {chain_name}")
-            except Exception as e:
-                print(f"✗ Error connecting to {chain_name}: {e}")
-    
-    def get_balances(self, min_balance=0.001):
+        results = await self._per_chain(self.clients, self._check_health)
+        for chain_name, ok in results.items():
+            if ok is True:
+                self._connect(chain_name)
+                print(f"✓ Connected to {chain_name}")
+            elif isinstance(ok, asyncio.TimeoutError):
+                print(f"✗ Timed out connecting to {chain_name}")
+            elif isinstance(ok, Exception):
+                print(f"✗ Error connecting to {chain_name}: {describe_error(ok)}")
+            else:
+                print(f"✗ Failed to connect to {chain_name}")
+
+    async def _check_health(self, chain_name):
+        with span('connect', chain=chain_name):
+            return await self.clients[chain_name].check_health()
+
+    async def _read_balance(self, chain_name):
+        conn = self.connections[chain_name]
+        with span('balance', chain=chain_name):
+            state = await async_cached_account_state(self.balance_cache, conn['client'], self.address)
+        return state['balance']
+
+    def _balance_record(self, chain_name, balance_wei, min_balance):
+        """Balance entry for the report, or None below `min_balance`"""
+        config = self.chains[chain_name]
+        balance = Web3.from_wei(balance_wei, 'ether')
+        if float(balance) < min_balance:
+            return None
+        return {
+            'balance': float(balance),
+            'balance_wei': balance_wei,
+            'symbol': config['symbol'],
+            'chain_id': config['chain_id']
+        }
+
+    def _balance_entry(self, chain_name, balance_wei, min_balance):
+        entry = self._balance_record(chain_name, balance_wei, min_balance)
+        if entry is not None:
+            print(f"  {chain_name}: {Web3.from_wei(balance_wei, 'ether')} {entry['symbol']}")
+        return entry
+
+    async def get_balances(self, min_balance=0.001):
         """Get balances from all chains"""
         balances = {}
-        
-        for chain_name, conn in self.connections.items():
-            w3 = conn['w3']
-            config = conn['config']
-            
-            try:
-                balance_wei = w3.eth.get_balance(self.address)
-                balance = w3.from_wei(balance_wei, 'ether')
-                
-                if float(balance) >= min_balance:
-                    balances[chain_name] = {
-                        'balance': float(balance),
-                        'balance_wei': balance_wei,
-                        'symbol': config['symbol'],
-                        'chain_id': config['chain_id']
-                    }
-                    print(f"  {chain_name}: {balance} {config['symbol']}")
-            except Exception as e:
-                print(f"  Error getting balance from {chain_name}: {e}")
-        
+        results = await self._per_chain(self.connections, self._read_balance)
+        for chain_name, balance_wei in results.items():
+            if isinstance(balance_wei, Exception):
+                print(f"  Error getting balance from {chain_name}: {describe_error(balance_wei)}")
+                continue
+            entry = self._balance_entry(chain_name, balance_wei, min_balance)
+            if entry is not None:
+                balances[chain_name] = entry
+
         return balances
-    
-    def estimate_gas_cost(self, chain_name, amount_wei):
+
+    async def estimate_gas_cost(self, chain_name, amount_wei, gas_price=None):
         """Estimate gas cost for transfer"""
         conn = self.connections[chain_name]
-        w3 = conn['w3']
-        
+
         try:
-            gas_price = w3.eth.gas_price
-            gas_limit = 21000  # Standard transfer
-            gas_cost = gas_price * gas_limit
-            return gas_cost
+            if gas_price is None:
+                with span('gas', chain=chain_name):
+                    gas_price = (await self.fee_oracle.quote(conn['client']))['gas_price']
+            return gas_price * TRANSFER_GAS
         except Exception as e:
             print(f"  Error estimating gas for {chain_name}: {e}")
             return 0
-    
-    def create_eip7702_delegation(self, chain_name, target_address):
-        """Create EIP-7702 delegation transaction"""
+
+    async def create_eip7702_delegation(self, chain_name, target_address):
+        """Create EIP-7702 delegation transaction
+
+        The tx is returned unsigned and nothing is broadcast, so its nonces
+        are read, not reserved: reserving them would leave a gap in front of
+        the wallet's next tx signed by this engine.
+        """
         conn = self.connections[chain_name]
-        w3 = conn['w3']
-        
+        nonce, fees = await asyncio.gather(
+            async_next_nonce(self.nonce_manager, conn['client'], self.address),
+            self.fee_oracle.quote(conn['client'])
+        )
+        # The tx bumps the sender's nonce before the authorization is checked,
+        # so a self-sponsored authorization signs the following nonce
+        auth_nonce = nonce + 1
+
         # EIP-7702 transaction structure
         tx = {
             'from': self.address,
             'to': target_address,  # Delegation target
             'value': 0,
             'gas': 100000,
-            'maxFeePerGas': w3.eth.gas_price,
-            'maxPriorityFeePerGas': w3.eth.gas_price,
+            'maxFeePerGas': fees['max_fee'],
+            'maxPriorityFeePerGas': fees['priority_fee'],
             'chainId': conn['config']['chain_id'],
-            'nonce': w3.eth.get_transaction_count(self.address),
+            'nonce': nonce,
             'type': 4,  # EIP-7702 transaction type
-            'authorizationList': [{
-                'chainId': conn['config']['chain_id'],
-                'address': target_address,
-                'nonce': w3.eth.get_transaction_count(self.address)
-            }]
+            'authorizationList': [
+                sign_authorization(self.account.key, conn['config']['chain_id'], target_address, auth_nonce)
+            ]
         }
-        
+
         return tx
-    
-    def aggregate_dust(self, target_address):
-        """Aggregate dust from all chains to target address"""
-        print(f"\n🔄 Aggregating dust to {target_address}...")
-        
+
+    async def _prepare_sweep(self, chain_name, target_address):
+        """Signed sweep for one chain, or {'status': 'skipped', 'reason': ...}"""
+        conn = self.connections[chain_name]
+        config = conn['config']
+
+        # Balance and fee quote concurrently; the nonce is assigned locally at signing
+        with span('balance_and_gas', chain=chain_name):
+            state, fees = await asyncio.gather(
+                async_cached_account_state(self.balance_cache, conn['client'], self.address),
+                self.fee_oracle.quote(conn['client'])
+            )
+        gas_price = fees['gas_price']
+        balance_wei = state['balance']
+
+        if balance_wei <= 0:
+            return {'chain': chain_name, 'status': 'skipped', 'reason': 'No balance to transfer'}
+
+        # One transfer from the wallet's own balance: gas only, no service fee
+        amount_to_send = sweep_amounts([balance_wei], [gas_price], gas_units=TRANSFER_GAS, fee_bps=0)['net_wei'][0]
+        if amount_to_send <= 0:
+            return {'chain': chain_name, 'status': 'skipped', 'reason': 'Balance too low to cover gas'}
+
+        # Create transaction
+        tx = {
+            'to': Web3.to_checksum_address(target_address),
+            'value': amount_to_send,
+            'gas': TRANSFER_GAS,
+            'gasPrice': gas_price,
+            'chainId': config['chain_id']
+        }
+
+        # Sign (and, when broadcasting, send) without waiting for the tx to be mined
+        with span('sign_and_send', chain=chain_name):
+            (sent,) = await async_sign_and_send(
+                self.nonce_manager, conn['client'], self.account, [tx], broadcast=self.broadcast
+            )
+        if sent['status'] == 'error':
+            raise RuntimeError(sent['error'])
+
+        return {
+            'chain': chain_name,
+            'amount': str(Web3.from_wei(amount_to_send, 'ether')),
+            'symbol': config['symbol'],
+            'nonce': sent['nonce'],
+            'tx_hash': sent['tx_hash'] if self.broadcast else 'SIMULATED',
+            'status': 'sent' if self.broadcast else 'ready'
+        }
+
+    def _sweep_results(self, outcomes):
+        """Print per-chain sweep outcomes and drop the skipped ones"""
         results = []
-        
-        for chain_name, conn in self.connections.items():
-            w3 = conn['w3']
-            config = conn['config']
-            
-            try:
-                balance_wei = w3.eth.get_balance(self.address)
-                balance = w3.from_wei(balance_wei, 'ether')
-                
-                if float(balance) <= 0:
-                    print(f"  {chain_name}: No balance to transfer")
-                    continue
-                
-                # Estimate gas
-                gas_cost = self.estimate_gas_cost(chain_name, balance_wei)
-                
-                if balance_wei <= gas_cost:
-                    print(f"  {chain_name}: Balance too low to cover gas")
-                    continue
-                
-                # Calculate amount to transfer (balance - gas)
-                amount_to_send = balance_wei - gas_cost
-                
-                # Create transaction
-                tx = {
-                    'nonce': w3.eth.get_transaction_count(self.address),
-                    'to': Web3.to_checksum_address(target_address),
-                    'value': amount_to_send,
-                    'gas': 21000,
-                    'gasPrice': w3.eth.gas_price,
-                    'chainId': config['chain_id']
-                }
-                
-                # Sign transaction
-                signed_tx = w3.eth.account.sign_transaction(tx, self.private_key)
-                
-                # Send transaction (commented out for safety)
-                # tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-                # print(f"  {chain_name}: Transaction sent - {tx_hash.hex()}")
-                
-                results.append({
-                    'chain': chain_name,
-                    'amount': str(w3.from_wei(amount_to_send, 'ether')),
-                    'symbol': config['symbol'],
-                    'tx_hash': 'SIMULATED',
-                    'status': 'ready'
-                })
-                
-                print(f"  {chain_name}: Ready to send {w3.from_wei(amount_to_send, 'ether')} {config['symbol']}")
-                
-            except Exception as e:
-                print(f"  Error processing {chain_name}: {e}")
+        for chain_name, result in outcomes.items():
+            if isinstance(result, Exception):
+                print(f"  Error processing {chain_name}: {describe_error(result)}")
                 results.append({
                     'chain': chain_name,
-                    'error': str(e),
+                    'error': describe_error(result),
                     'status': 'error'
                 })
-        
+            elif result is None:
+                continue
+            elif result['status'] == 'skipped':
+                print(f"  {chain_name}: {result['reason']}")
+            elif result['status'] == 'sent':
+                print(f"  {chain_name}: Transaction sent - {result['tx_hash']}")
+                results.append(result)
+            else:
+                print(f"  {chain_name}: Ready to send {result['amount']} {result['symbol']}")
+                results.append(result)
         return results
-    
+
+    async def aggregate_dust(self, target_address):
+        """Aggregate dust from all chains to target address"""
+        print(f"\n🔄 Aggregating dust to {target_address}...")
+        outcomes = await self._per_chain(
+            self.connections, lambda name: self._prepare_sweep(name, target_address)
+        )
+        return self._sweep_results(outcomes)
+
+    async def run(self, target_address, min_balance=0.001):
+        """Connect, scan and sweep as one pipeline per chain
+
+        Unlike calling the steps in turn, a fast chain does not wait for the
+        slowest one between steps. Only chains holding at least `min_balance`
+        are swept. Returns (balances, aggregation_results).
+        """
+        async def pipeline(chain_name):
+            if not await self._check_health(chain_name):
+                raise ChainUnavailable(f"No healthy RPC endpoint for {chain_name}")
+            self._connect(chain_name)
+            balance_wei = await self._read_balance(chain_name)
+            entry = self._balance_entry(chain_name, balance_wei, min_balance)
+            if entry is None:
+                return None, None
+            return entry, await self._prepare_sweep(chain_name, target_address)
+
+        print(f"\n📡 Scanning {len(self.clients)} chains (min: {min_balance})...")
+        outcomes = await self._per_chain(self.clients, pipeline)
+
+        balances = {}
+        sweeps = {}
+        for chain_name, outcome in outcomes.items():
+            if isinstance(outcome, Exception):
+                if chain_name not in self.connections:
+                    print(f"✗ Failed to connect to {chain_name}: {describe_error(outcome)}")
+                    continue
+                sweeps[chain_name] = outcome
+                continue
+            entry, sweeps[chain_name] = outcome
+            if entry is not None:
+                balances[chain_name] = entry
+
+        print(f"\n🔄 Aggregating dust to {target_address}...")
+        return balances, self._sweep_results(sweeps)
+
     def generate_report(self, balances, aggregation_results):
         """Generate final report"""
+        with span('prices'):
+            prices = self.price_cache.get_prices({b['symbol'] for b in balances.values()})
+        for b in balances.values():
+            price = prices.get(b['symbol'])
+            b['value_usd'] = b['balance'] * price if price is not None else None
+        priced = [b['value_usd'] for b in balances.values() if b['value_usd'] is not None]
         report = {
             'address': self.address,
             'target_chain': self.target_chain,
@@ -205,13 +366,373 @@ class DustAggregator:
             'aggregation': aggregation_results,
             'total_value': sum(
                 b['balance'] for b in balances.values()
-            )
+            ),
+            # None when no balance could be priced
+            'total_value_usd': sum(priced) if priced else None
         }
-        
+
         return report
 
+    async def close(self):
+        if self._owns_clients:
+            await asyncio.gather(*(client.close() for client in self.clients.values()))
+
+
+class DustAggregator:
+    """Synchronous facade over AsyncDustAggregator
+
+    Each call runs on a private event loop, so every step still covers all
+    chains concurrently. Call close() when done.
+    """
+
+    def __init__(self, private_key, target_chain='ethereum', **options):
+        self.engine = AsyncDustAggregator(private_key, target_chain, **options)
+        self._loop = asyncio.new_event_loop()
+
+    @property
+    def private_key(self):
+        return self.engine.private_key
+
+    @property
+    def target_chain(self):
+        return self.engine.target_chain
+
+    @property
+    def address(self):
+        return self.engine.address
+
+    @property
+    def connections(self):
+        return self.engine.connections
+
+    def _run(self, coro):
+        return self._loop.run_until_complete(coro)
+
+    def connect_to_chains(self):
+        """Connect to all configured chains"""
+        return self._run(self.engine.connect_to_chains())
+
+    def get_balances(self, min_balance=0.001):
+        """Get balances from all chains"""
+        return self._run(self.engine.get_balances(min_balance))
+
+    def estimate_gas_cost(self, chain_name, amount_wei, gas_price=None):
+        """Estimate gas cost for transfer"""
+        return self._run(self.engine.estimate_gas_cost(chain_name, amount_wei, gas_price))
+
+    def create_eip7702_delegation(self, chain_name, target_address):
+        """Create EIP-7702 delegation transaction"""
+        return self._run(self.engine.create_eip7702_delegation(chain_name, target_address))
+
+    def aggregate_dust(self, target_address):
+        """Aggregate dust from all chains to target address"""
+        return self._run(self.engine.aggregate_dust(target_address))
+
+    def generate_report(self, balances, aggregation_results):
+        """Generate final report"""
+        return self.engine.generate_report(balances, aggregation_results)
+
+    def close(self):
+        if not self._loop.is_closed():
+            self._run(self.engine.close())
+            self._loop.close()
+
+
+def save_report(report, balances, chains_scanned, broadcast=False, report_path=REPORT_PATH):
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print("\n" + "="*50)
+    print(f"📊 Report saved to {report_path}")
+    print("="*50)
+    print(f"\nTotal chains scanned: {chains_scanned}")
+    print(f"Chains with dust: {len(balances)}")
+    if report['total_value_usd'] is None:
+        print("Total value: n/a (no prices available)")
+    else:
+        print(f"Total value: ${report['total_value_usd']:.2f}")
+    if not broadcast:
+        print("\n⚠️  Transactions are in SIMULATION mode")
+        print("   Run with --broadcast to execute")
+
+
+def save_trace(trace, path):
+    with open(path, 'w') as f:
+        json.dump(trace.to_dict(), f, indent=2)
+    print(f"\n⏱  Trace saved to {path}")
+    for name, (total, count) in trace.totals().items():
+        print(f"   {name:<16} {total * 1000:9.1f} ms  ({count}x)")
+    print(f"   {'total':<16} {trace.elapsed() * 1000:9.1f} ms")
+
+
+def read_wallets(path):
+    """(line number, private key, target address or None) for each wallet in `path` ("-" for stdin)
+
+    Lines are PRIVATE_KEY or PRIVATE_KEY,TARGET_ADDRESS; blank lines and
+    # comments are skipped. Read lazily, so the file can be any size.
+    """
+    f = sys.stdin if path == '-' else open(path)
+    try:
+        for number, line in enumerate(f, 1):
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            private_key, _, target = (part.strip() for part in line.partition(','))
+            yield number, private_key, target or None
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+class BatchCheckpoint:
+    """Input lines a batch run has finished, rewritten atomically after every wallet
+
+    Keeps the line below which every wallet is done plus the few finished
+    lines above it, so it stays as small as the wallet concurrency no
+    matter how long the batch is.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.line = 0
+        self.done = set()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            self.line, self.done = state['line'], set(state['done'])
+
+    def resumed(self):
+        return bool(self.line or self.done)
+
+    def is_done(self, line):
+        return line <= self.line or line in self.done
+
+    def mark(self, line, in_flight, last_read):
+        """Record `line` as finished; `in_flight` are lines read but not finished"""
+        self.done.add(line)
+        self.line = max(self.line, min(in_flight) - 1 if in_flight else last_read)
+        self.done = {n for n in self.done if n > self.line}
+        if not self.path:
+            return
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'line': self.line, 'done': sorted(self.done)}, f)
+        os.replace(tmp, self.path)
+
+
+async def _batch_chain(aggregator, chain_name, target_address, min_balance, live):
+    """JSONL record for one wallet on one chain"""
+    record = {'wallet': aggregator.address, 'chain': chain_name, 'symbol': aggregator.chains[chain_name]['symbol']}
+    try:
+        if chain_name not in live:
+            raise ChainUnavailable(f"No healthy RPC endpoint for {chain_name}")
+        balance_wei = await asyncio.wait_for(aggregator._read_balance(chain_name), aggregator.chain_timeout)
+        record['balance'] = float(Web3.from_wei(balance_wei, 'ether'))
+        record['balance_wei'] = balance_wei
+        if aggregator._balance_record(chain_name, balance_wei, min_balance) is None:
+            record.update(status='skipped', reason='Below MIN_BALANCE')
+            return record
+        sweep = await asyncio.wait_for(
+            aggregator._prepare_sweep(chain_name, target_address), aggregator.chain_timeout
+        )
+        record.update({key: value for key, value in sweep.items() if key != 'chain'})
+    except Exception as e:
+        record.update(status='error', error=describe_error(e))
+    return record
+
+
+async def run_batch(wallets_path, target_address, min_balance, output='-', checkpoint=None,
+                    concurrency=BATCH_CONCURRENCY, broadcast=False, chains=None):
+    """Scan and prepare sweeps for every wallet in `wallets_path`, streaming JSONL records
+
+    Wallets share one client, rate budget and fee oracle per chain; at
+    most `concurrency` are in flight. One record per wallet per chain is
+    written to `output` ("-" for stdout) as soon as that chain finishes,
+    and `checkpoint` lets an interrupted run resume where it stopped
+    (records of wallets that were in flight may then appear twice).
+    """
+    chains = chains or CHAINS
+    progress = BatchCheckpoint(checkpoint)
+    out = sys.stdout if output == '-' else open(output, 'a' if progress.resumed() else 'w')
+    scheduler = RateScheduler()
+    clients = {
+        chain_name: AsyncChainClient(chain_name, config, timeout=CHAIN_TIMEOUT, scheduler=scheduler)
+        for chain_name, config in chains.items()
+    }
+    shared = {'balance_cache': BalanceCache(), 'fee_oracle': AsyncFeeOracle(), 'price_cache': PriceCache(make_source())}
+    statuses = Counter()
+
+    def write(record):
+        statuses[record['status']] += 1
+        out.write(json.dumps(record) + '\n')
+        out.flush()
+
+    async def sweep_wallet(line, private_key, target):
+        try:
+            # Each wallet gets its own nonce sequence, dropped once the wallet is done
+            aggregator = AsyncDustAggregator(private_key, chains=chains, clients=clients, broadcast=broadcast, **shared)
+        except ValueError:
+            # Never echo the key itself
+            write({'line': line, 'status': 'error', 'error': 'Invalid private key'})
+            return
+        if not target:
+            write({'line': line, 'wallet': aggregator.address, 'status': 'error', 'error': 'No target address'})
+            return
+        for chain_name in live:
+            aggregator._connect(chain_name)
+        for done in asyncio.as_completed([
+            _batch_chain(aggregator, chain_name, target, min_balance, live) for chain_name in chains
+        ]):
+            write(await done)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    in_flight = set()
+    tasks = set()
+    wallets = 0
+    last_read = 0
+
+    async def bounded(line, private_key, target):
+        try:
+            try:
+                await sweep_wallet(line, private_key, target)
+            except Exception as e:
+                # A wallet that fails is finished with an error record; it must not hold back the checkpoint
+                write({'line': line, 'status': 'error', 'error': describe_error(e)})
+            # Only wallets that ran to the end count as done; interrupted (cancelled) ones are redone on resume
+            in_flight.discard(line)
+            progress.mark(line, in_flight, last_read)
+        finally:
+            semaphore.release()
+
+    try:
+        healthy = await asyncio.gather(*(client.check_health() for client in clients.values()))
+        live = {chain_name for chain_name, ok in zip(clients, healthy) if ok}
+        print(f"Batch: {len(live)}/{len(clients)} chains connected, {concurrency} wallets at a time", file=sys.stderr)
+
+        for line, private_key, target in read_wallets(wallets_path):
+            last_read = line
+            if progress.is_done(line):
+                continue
+            in_flight.add(line)
+            await semaphore.acquire()
+            wallets += 1
+            task = asyncio.ensure_future(bounded(line, private_key, target or target_address))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.gather(*(client.close() for client in clients.values()))
+        if out is not sys.stdout:
+            out.close()
+    print(f"Batch done: {wallets} wallets, {json.dumps(dict(statuses))}", file=sys.stderr)
+
+
+async def run_async(private_key, target_chain, target_address, min_balance, broadcast=False, report_path=REPORT_PATH):
+    """CLI flow on the asyncio engine, pipelined per chain"""
+    aggregator = AsyncDustAggregator(private_key, target_chain, broadcast=broadcast)
+    try:
+        print(f"\n🔑 Wallet Address: {aggregator.address}")
+        print(f"🎯 Target Chain: {target_chain}")
+        print(f"🎯 Target Address: {target_address}")
+
+        balances, results = await aggregator.run(target_address, min_balance)
+        if not aggregator.connections:
+            print("\n❌ No chains connected. Exiting.")
+            return
+        if not balances:
+            print("\n❌ No dust found. Exiting.")
+            return
+
+        report = aggregator.generate_report(balances, results)
+        save_report(report, balances, len(aggregator.connections), broadcast, report_path)
+    finally:
+        await aggregator.close()
+
+
+def run_sync(private_key, target_chain, target_address, min_balance, broadcast=False, report_path=REPORT_PATH):
+    """CLI flow one step at a time (each step still covers all chains at once)"""
+    aggregator = DustAggregator(private_key, target_chain, broadcast=broadcast)
+    try:
+        print(f"\n🔑 Wallet Address: {aggregator.address}")
+        print(f"🎯 Target Chain: {target_chain}")
+        print(f"🎯 Target Address: {target_address}")
+
+        # Connect to chains
+        print("\n📡 Connecting to chains...")
+        aggregator.connect_to_chains()
+
+        if not aggregator.connections:
+            print("\n❌ No chains connected. Exiting.")
+            return
+
+        # Get balances
+        print(f"\n💰 Checking balances (min: {min_balance})...")
+        balances = aggregator.get_balances(min_balance=min_balance)
+
+        if not balances:
+            print("\n❌ No dust found. Exiting.")
+            return
+
+        # Aggregate dust
+        results = aggregator.aggregate_dust(target_address)
+
+        # Generate report
+        report = aggregator.generate_report(balances, results)
+        save_report(report, balances, len(aggregator.connections), broadcast, report_path)
+    finally:
+        aggregator.close()
+
 
 def main():
+    parser = argparse.ArgumentParser(description='EIP-7702 Dust Aggregator Tool')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        default=os.environ.get('ASYNC_ENGINE', '').lower() in ('1', 'true', 'yes'),
+                        help='pipeline connect/scan/sweep per chain on the asyncio engine (or ASYNC_ENGINE=1)')
+    parser.add_argument('--broadcast', action='store_true',
+                        help='send the signed sweeps instead of simulating them')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='write a JSON trace of where the run spent its time to FILE')
+    parser.add_argument('--watch', metavar='FILE',
+                        help='follow the addresses in FILE ("-" for stdin) and report MIN_BALANCE crossings')
+    parser.add_argument('--events', metavar='FILE', default='-',
+                        help='JSONL file for --watch events (default: stdout)')
+    parser.add_argument('--webhook', metavar='URL', default=os.environ.get('WATCH_WEBHOOK_URL'),
+                        help='also POST every --watch event to URL (or WATCH_WEBHOOK_URL)')
+    parser.add_argument('--batch', metavar='FILE',
+                        help='sweep every wallet in FILE ("-" for stdin), one PRIVATE_KEY[,TARGET_ADDRESS] per line')
+    parser.add_argument('--output', metavar='FILE',
+                        help=f'report file (default: {REPORT_PATH}); with --batch, JSONL records (default: stdout)')
+    parser.add_argument('--checkpoint', metavar='FILE',
+                        help='with --batch, resume from and record progress in FILE')
+    parser.add_argument('--wallet-concurrency', type=int, default=BATCH_CONCURRENCY,
+                        help='with --batch, wallets processed at once (or BATCH_CONCURRENCY)')
+    args = parser.parse_args()
+
+    # Get minimum balance
+    min_balance = float(os.environ.get('MIN_BALANCE', '0.0001'))
+
+    if args.watch:
+        # No keys needed, and stdout may carry the events: skip the banner
+        try:
+            asyncio.run(watch(CHAINS, read_addresses(args.watch), min_balance, args.events, args.webhook))
+        except KeyboardInterrupt:
+            pass
+        return
+
+    if args.batch:
+        # Keys come from the file; records may go to stdout, so skip the banner
+        try:
+            asyncio.run(run_batch(
+                args.batch, os.environ.get('TARGET_ADDRESS'), min_balance, args.output or '-',
+                args.checkpoint, args.wallet_concurrency, args.broadcast
+            ))
+        except KeyboardInterrupt:
+            pass
+        return
+
     print("="*50)
     print("EIP-7702 Dust Aggregator Tool")
     print("="*50)
@@ -232,54 +753,19 @@ def main():
         print("   Or add it to .env file")
         return
     
-    # Get minimum balance
-    min_balance = float(os.environ.get('MIN_BALANCE', '0.0001'))
-    
     # Get target chain
     target_chain = os.environ.get('TARGET_CHAIN', 'ethereum')
     
-    # Initialize aggregator
-    aggregator = DustAggregator(private_key, target_chain)
-    
-    print(f"\n🔑 Wallet Address: {aggregator.address}")
-    print(f"🎯 Target Chain: {target_chain}")
-    print(f"🎯 Target Address: {target_address}")
-    
-    # Connect to chains
-    print("\n📡 Connecting to chains...")
-    aggregator.connect_to_chains()
-    
-    if not aggregator.connections:
-        print("\n❌ No chains connected. Exiting.")
-        return
-    
-    # Get balances
-    print(f"\n💰 Checking balances (min: {min_balance})...")
-    balances = aggregator.get_balances(min_balance=min_balance)
-    
-    if not balances:
-        print("\n❌ No dust found. Exiting.")
-        return
-    
-    # Aggregate dust
-    results = aggregator.aggregate_dust(target_address)
-    
-    # Generate report
-    report = aggregator.generate_report(balances, results)
-    
-    # Save report
-    report_path = '/root/eip7702-dust-aggregator/report.json'
-    with open(report_path, 'w') as f:
-        json.dump(report, f, indent=2)
-    
-    print("\n" + "="*50)
-    print(f"📊 Report saved to {report_path}")
-    print("="*50)
-    print(f"\nTotal chains scanned: {len(aggregator.connections)}")
-    print(f"Chains with dust: {len(balances)}")
-    print(f"Total value: ${report['total_value']:.2f}")
-    print("\n⚠️  Transactions are in SIMULATION mode")
-    print("   Uncomment send_raw_transaction to execute")
+    with start_trace('cli') as trace:
+        if args.use_async:
+            asyncio.run(run_async(
+                private_key, target_chain, target_address, min_balance, args.broadcast, args.output or REPORT_PATH
+            ))
+        else:
+            run_sync(private_key, target_chain, target_address, min_balance, args.broadcast, args.output or REPORT_PATH)
+
+    if args.trace:
+        save_trace(trace, args.trace)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,124 @@
+"""
+EIP-7702 encoding
+Authorization tuples and set-code (type 4) transaction signing, which the
+pinned eth-account release does not support yet
+"""
+
+from collections import namedtuple
+
+import rlp
+from eth_keys import keys
+from eth_utils import keccak, to_checksum_address
+from hexbytes import HexBytes
+
+from rpc_batch import to_int
+
+SET_CODE_TX_TYPE = 4
+AUTHORIZATION_MAGIC = b"\x05"
+SECP256K1_HALF_N = 0x7fffffffffffffffffffffffffffffff5d576e7357a4501ddfe92f46681b20a0
+
+# Same attribute names as eth_account's SignedTransaction
+SignedSetCodeTransaction = namedtuple("SignedSetCodeTransaction", ["rawTransaction", "hash", "r", "s", "v"])
+
+
+def _address_bytes(address):
+    return bytes.fromhex(address[2:] if address.startswith("0x") else address)
+
+
+def _data_bytes(data):
+    if isinstance(data, (bytes, bytearray)):
+        return bytes(data)
+    return bytes.fromhex(data[2:] if data.startswith("0x") else data)
+
+
+def normalize_authorization(auth):
+    """Authorization with int fields and a checksum address; accepts hex or int values"""
+    return {
+        "chainId": to_int(auth["chainId"]),
+        "address": to_checksum_address(auth["address"]),
+        "nonce": to_int(auth["nonce"]),
+        "yParity": to_int(auth["yParity"]),
+        "r": to_int(auth["r"]),
+        "s": to_int(auth["s"]),
+    }
+
+
+def authorization_params(auth):
+    """Authorization as JSON-RPC hex quantities, for eth_call/eth_estimateGas authorizationList"""
+    auth = normalize_authorization(auth)
+    return {
+        "chainId": hex(auth["chainId"]),
+        "address": auth["address"],
+        "nonce": hex(auth["nonce"]),
+        "yParity": hex(auth["yParity"]),
+        "r": hex(auth["r"]),
+        "s": hex(auth["s"]),
+    }
+
+
+def authorization_hash(chain_id, address, nonce):
+    """keccak(MAGIC || rlp([chain_id, address, nonce])), the digest users sign"""
+    return keccak(AUTHORIZATION_MAGIC + rlp.encode([chain_id, _address_bytes(address), nonce]))
+
+
+def sign_authorization(private_key, chain_id, address, nonce):
+    """Signed authorization tuple delegating the key's account to `address`"""
+    signature = keys.PrivateKey(HexBytes(private_key)).sign_msg_hash(authorization_hash(chain_id, address, nonce))
+    return {
+        "chainId": chain_id,
+        "address": to_checksum_address(address),
+        "nonce": nonce,
+        "yParity": signature.v,
+        "r": signature.r,
+        "s": signature.s,
+    }
+
+
+def recover_authority(auth):
+    """Address that signed an authorization; raises ValueError if the signature is invalid"""
+    auth = normalize_authorization(auth)
+    if auth["yParity"] not in (0, 1) or auth["s"] > SECP256K1_HALF_N:
+        raise ValueError("Invalid authorization signature")
+    try:
+        signature = keys.Signature(vrs=(auth["yParity"], auth["r"], auth["s"]))
+        public_key = signature.recover_public_key_from_msg_hash(
+            authorization_hash(auth["chainId"], auth["address"], auth["nonce"])
+        )
+    except Exception as e:
+        raise ValueError(f"Invalid authorization signature: {e}") from e
+    return public_key.to_checksum_address()
+
+
+def _access_list(entries):
+    return [
+        [_address_bytes(entry["address"]), [_data_bytes(key) for key in entry.get("storageKeys", [])]]
+        for entry in entries or []
+    ]
+
+
+def sign_set_code_transaction(account, tx):
+    """Sign a type 4 tx dict (web3 field names) with an eth_account LocalAccount"""
+    authorizations = [normalize_authorization(auth) for auth in tx["authorizationList"]]
+    fields = [
+        to_int(tx["chainId"]),
+        to_int(tx["nonce"]),
+        to_int(tx["maxPriorityFeePerGas"]),
+        to_int(tx["maxFeePerGas"]),
+        to_int(tx["gas"]),
+        _address_bytes(tx["to"]),
+        to_int(tx.get("value", 0)),
+        _data_bytes(tx.get("data", b"")),
+        _access_list(tx.get("accessList")),
+        [
+            [a["chainId"], _address_bytes(a["address"]), a["nonce"], a["yParity"], a["r"], a["s"]]
+            for a in authorizations
+        ],
+    ]
+    prefix = bytes([SET_CODE_TX_TYPE])
+    signature = keys.PrivateKey(HexBytes(account.key)).sign_msg_hash(keccak(prefix + rlp.encode(fields)))
+    raw = prefix + rlp.encode(fields + [signature.v, signature.r, signature.s])
+    return SignedSetCodeTransaction(HexBytes(raw), HexBytes(keccak(raw)), signature.r, signature.s, signature.v)
+
+
+def is_set_code_transaction(tx):
+    return "type" in tx and to_int(tx["type"]) == SET_CODE_TX_TYPE
@@ -1,3 +1,5 @@
+from fee_engine import fee_bounds, sweep_amounts, to_ether, usd_to_wei
+
 @app.route('/api/estimate', methods=['POST'])
 def estimate_sweep():
     """Estimate costs for EIP-7702 sponsored sweep"""
@@ -18,15 +20,22 @@ def estimate_sweep():
         
         dest_chain = CHAINS[dest_chain_key]
         
+        # Every symbol this request needs, priced in one batched lookup
+        prices = get_token_prices(
+            {CHAINS[bal.get('key')]['symbol'] for bal in balances if bal.get('key') in CHAINS} | {dest_chain['symbol']}
+        )
+        dest_price = prices.get(dest_chain['symbol'])
+        
         estimates = []
         total_transfer_usd = 0.0
         total_gas_cost_usd = 0.0
         total_service_fee_usd = 0.0
         
+        # Gas per balance first, then one fee engine pass per source chain
+        rows_by_chain = {}
         for bal in balances:
             balance_wei = int(bal.get('balance_wei', '0') or '0')
             chain_key = bal.get('key', '')
-            balance_usd = bal.get('balance_usd', 0)
             
             # Skip low balances
             if balance_wei < 10000000000000:  # Less than 0.00001 ETH
@@ -35,25 +44,30 @@ def estimate_sweep():
             if chain_key == dest_chain_key:
                 # Same chain - no gas cost needed
                 gas_cost_wei = 0
-                gas_cost_usd = 0
             else:
                 # Different chain - estimate gas
                 gas_info = estimate_gas_costs(chain_key, balance_wei, to_address)
                 if not gas_info:
                     continue
-                
                 gas_cost_wei = gas_info['gas_cost_wei']
-                gas_cost_usd = gas_info['gas_cost_eth'] * get_token_price(CHAINS[chain_key]['symbol'])
-            
-            # Calculate service fee (5%, min $0.05, max $0.50)
-            service_fee_usd = calculate_service_fee(balance_usd - gas_cost_usd)
-            service_fee_wei = int(service_fee_usd * 1e18 / get_token_price(CHAINS[dest_chain]['symbol']))
             
-            # Calculate net transfer
-            net_usd = balance_usd - gas_cost_usd - service_fee_usd
-            net_wei = int(balance_wei * max(0, net_usd / balance_usd)) if balance_wei > 0 else 0
-            
-            if net_usd > 0:
+            rows_by_chain.setdefault(chain_key, []).append((bal, balance_wei, gas_cost_wei))
+        
+        for chain_key, rows in rows_by_chain.items():
+            price = prices.get(CHAINS[chain_key]['symbol'])
+            # Service fee: 5%, min $0.05, max $0.50, in exact wei of the source asset;
+            # the gas column already holds each row's total gas cost
+            amounts = sweep_amounts(
+                [balance_wei for _, balance_wei, _ in rows], [gas_cost_wei for _, _, gas_cost_wei in rows],
+                fee_bounds(price), gas_units=1
+            )
+            for (bal, balance_wei, gas_cost_wei), fee_wei, net_wei in zip(rows, amounts['fee_wei'], amounts['net_wei']):
+                if net_wei <= 0:
+                    continue
+                gas_cost_usd = to_ether(gas_cost_wei) * price if price else 0.0
+                service_fee_usd = to_ether(fee_wei) * price if price else 0.0
+                net_usd = to_ether(net_wei) * price if price else 0.0
+                
                 estimates.append({
                     "chain_key": chain_key,
                     "chain_name": bal['name'],
@@ -62,14 +76,15 @@ def estimate_sweep():
                     "to_chain": dest_chain['name'],
                     "balance_wei": balance_wei,
                     "balance_eth": bal['balance'],
-                    "balance_usd": balance_usd,
+                    "balance_usd": bal.get('balance_usd', 0),
                     "gas_cost_wei": gas_cost_wei,
-                    "gas_cost_eth": gas_cost_wei / 1e18,
+                    "gas_cost_eth": to_ether(gas_cost_wei),
                     "gas_cost_usd": gas_cost_usd,
                     "service_fee_usd": service_fee_usd,
-                    "service_fee_wei": service_fee_wei,
+                    "service_fee_wei": usd_to_wei(service_fee_usd, dest_price),
+                    "source_fee_wei": fee_wei,
                     "net_usd": net_usd,
-                    "net_eth": net_wei / 1e18,
+                    "net_eth": to_ether(net_wei),
                     "net_wei": net_wei
                 })
                 
@@ -3,7 +3,7 @@ sys.path.insert(0, '.')
 
 import json
 import traceback
-from app import app, CHAINS, SPONSOR_ADDRESS, get_token_price, calculate_service_fee, estimate_gas_costs
+from app import app, CHAINS, SPONSOR_ADDRESS, get_token_prices, calculate_service_fee, estimate_gas_costs
 
 print("🔍 DEBUGGING /api/estimate endpoint...")
 
@@ -51,6 +51,12 @@ with app.test_client() as client:
     
     print("\n📊 Step 3: Iterate through balances")
     try:
+        # Every symbol this request needs, priced in one batched lookup
+        prices = get_token_prices(
+            {CHAINS[bal.get('key')]['symbol'] for bal in balances if bal.get('key') in CHAINS} | {dest_chain['symbol']}
+        )
+        dest_price = prices.get(dest_chain['symbol'])
+        
         estimates = []
         total_transfer_usd = 0.0
         total_gas_cost_usd = 0.0
@@ -84,11 +90,11 @@ with app.test_client() as client:
                 if not gas_info:
                     continue
                 gas_cost_wei = gas_info['gas_cost_wei']
-                gas_cost_usd = gas_info['gas_cost_eth'] * get_token_price(CHAINS[chain_key]['symbol'])
+                gas_cost_usd = gas_info['gas_cost_eth'] * prices.get(CHAINS[chain_key]['symbol'], 0.0)
                 print(f"    ✓ Gas cost: {gas_cost_usd} USD")
             
             service_fee_usd = calculate_service_fee(balance_usd - gas_cost_usd)
-            service_fee_wei = int(service_fee_usd * 1e18 / get_token_price(CHAINS[dest_chain]['symbol']))
+            service_fee_wei = int(service_fee_usd * 1e18 / dest_price) if dest_price else 0
             net_usd = balance_usd - gas_cost_usd - service_fee_usd
             net_wei = int(balance_wei * max(0, net_usd / balance_usd)) if balance_wei > 0 else 0
             
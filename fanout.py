@@ -0,0 +1,130 @@
+"""
+Per-chain fan-out
+Runs one task per chain concurrently with per-chain and overall deadlines
+"""
+
+import asyncio
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from metrics import registry as metrics
+from rate_limiter import RateLimited
+from rpc_clients import ChainUnavailable
+from tracing import bind
+
+# Per-chain outcome statuses
+STATUS_OK = "ok"
+STATUS_EMPTY = "empty"              # Task returned None (e.g. no dust on chain)
+STATUS_UNAVAILABLE = "unavailable"  # No healthy RPC endpoint
+STATUS_THROTTLED = "throttled"      # Shed by RPC admission control (rate_limiter.py)
+STATUS_UNSUPPORTED = "unsupported"  # Unknown chain key
+STATUS_ERROR = "error"
+STATUS_TIMEOUT = "timeout"
+
+CHAIN_OUTCOMES = metrics.counter("dustzip_chain_outcomes_total", "Per-chain fan-out results by status")
+
+
+def run_per_chain(pool, chain_keys, task, chain_deadline, request_deadline, supported=None):
+    """Run task(chain_key) for every chain on `pool`
+
+    Returns {chain_key: {"status": ..., "result": ..., "error": ...}}.
+    A chain gets `chain_deadline` seconds from when its task starts; the
+    whole call never waits longer than `request_deadline`. Chains still
+    running at their deadline are reported as timeouts, not dropped.
+    """
+    started_at = {}
+
+    def timed(chain_key):
+        started_at[chain_key] = time.monotonic()
+        return task(chain_key)
+
+    outcomes = {}
+    futures = {}
+    for chain_key in dict.fromkeys(chain_keys):
+        if supported is not None and chain_key not in supported:
+            outcomes[chain_key] = {"status": STATUS_UNSUPPORTED}
+        else:
+            futures[pool.submit(bind(timed), chain_key)] = chain_key
+
+    request_expires = time.monotonic() + request_deadline
+    pending = set(futures)
+
+    while pending:
+        now = time.monotonic()
+        expiries = [started_at[futures[f]] + chain_deadline for f in pending if futures[f] in started_at]
+        wake_at = min([request_expires] + expiries)
+        done, pending = wait(pending, timeout=max(wake_at - now, 0), return_when=FIRST_COMPLETED)
+
+        for future in done:
+            outcomes[futures[future]] = _outcome(future)
+
+        now = time.monotonic()
+        for future in list(pending):
+            chain_key = futures[future]
+            chain_expired = chain_key in started_at and now >= started_at[chain_key] + chain_deadline
+            if chain_expired or now >= request_expires:
+                future.cancel()
+                outcomes[chain_key] = {"status": STATUS_TIMEOUT}
+                pending.discard(future)
+
+    return _ordered(chain_keys, outcomes)
+
+
+async def run_per_chain_async(chain_keys, task, chain_deadline, request_deadline, supported=None):
+    """run_per_chain() for coroutines: awaits task(chain_key) for every chain on the running loop
+
+    Returns the same {chain_key: {"status", "result", "error"}} shape.
+    """
+    outcomes = {}
+    tasks = {}
+    for chain_key in dict.fromkeys(chain_keys):
+        if supported is not None and chain_key not in supported:
+            outcomes[chain_key] = {"status": STATUS_UNSUPPORTED}
+        else:
+            tasks[asyncio.ensure_future(asyncio.wait_for(task(chain_key), chain_deadline))] = chain_key
+
+    if tasks:
+        done, pending = await asyncio.wait(tasks, timeout=request_deadline)
+        for future in pending:
+            future.cancel()
+            outcomes[tasks[future]] = {"status": STATUS_TIMEOUT}
+        for future in done:
+            outcomes[tasks[future]] = _outcome(future)
+
+    return _ordered(chain_keys, outcomes)
+
+
+def _ordered(chain_keys, outcomes):
+    for chain_key, outcome in outcomes.items():
+        metrics.inc(CHAIN_OUTCOMES, {"chain": chain_key, "status": outcome["status"]})
+    return {chain_key: outcomes[chain_key] for chain_key in dict.fromkeys(chain_keys)}
+
+
+def _outcome(future):
+    try:
+        result = future.result()
+    except RateLimited as e:
+        return {"status": STATUS_THROTTLED, "error": str(e)}
+    except ChainUnavailable as e:
+        return {"status": STATUS_UNAVAILABLE, "error": str(e)}
+    except asyncio.TimeoutError:
+        # The chain ran past its asyncio.wait_for() deadline, or an upstream read timed out
+        return {"status": STATUS_TIMEOUT}
+    except Exception as e:
+        return {"status": STATUS_ERROR, "error": str(e)}
+    if result is None:
+        return {"status": STATUS_EMPTY}
+    return {"status": STATUS_OK, "result": result}
+
+
+def chain_statuses(outcomes):
+    """Outcome map without results, for the response's "chains" field"""
+    return {
+        chain_key: {k: v for k, v in outcome.items() if k != "result"}
+        for chain_key, outcome in outcomes.items()
+    }
+
+
+def ok_results(outcomes):
+    """Successful results in chain order"""
+    return [o["result"] for o in outcomes.values() if o["status"] == STATUS_OK]
@@ -0,0 +1,64 @@
+"""
+Sweep fee engine
+Gas, service fee and net amounts in exact integer wei, computed column by
+column for whole batches of balances and gas quotes
+"""
+
+from decimal import Decimal
+
+WEI = 10**18
+BPS = 10000
+FEE_BPS = 500                   # Service fee: 5%...
+MIN_FEE_USD = Decimal("0.05")   # ...but at least $0.05...
+MAX_FEE_USD = Decimal("0.50")   # ...and at most $0.50, when the asset has a price
+TRANSFER_GAS = 21000
+SWEEP_GAS = 2 * TRANSFER_GAS    # Fee transfer + user transfer
+
+
+def to_ether(wei):
+    # int / int is correctly rounded, and much cheaper than Web3.from_wei()
+    return wei / WEI
+
+
+def usd_to_wei(usd, price):
+    """Wei of an asset priced at `price` USD worth `usd` (rounded down); 0 without a price"""
+    if not price:
+        return 0
+    return int(Decimal(str(usd)) * WEI / Decimal(repr(float(price))))
+
+
+def fee_bounds(price):
+    """(min, max) service fee in wei for an asset priced at `price` USD, or None without a price"""
+    if not price:
+        return None
+    return usd_to_wei(MIN_FEE_USD, price), usd_to_wei(MAX_FEE_USD, price)
+
+
+def sweep_amounts(balances_wei, gas_prices, bounds=None, gas_units=SWEEP_GAS, fee_bps=FEE_BPS):
+    """{"gas_wei", "fee_wei", "net_wei"} columns for equal-length balance and gas price columns
+
+    The fee is `fee_bps` of what is left after gas, clamped to `bounds`
+    (one (min, max) pair for the whole batch, e.g. one chain's asset, or
+    None for the bare percentage). Rows that cannot cover gas and fee get
+    a net of 0 and only keep the fee they can pay. With fee_bps=0 and no
+    bounds this is a plain balance-minus-gas transfer.
+    """
+    low, high = bounds or (0, None)
+    gas_column, fee_column, net_column = [], [], []
+    for balance_wei, gas_price in zip(balances_wei, gas_prices):
+        gas_wei = gas_price * gas_units
+        available = balance_wei - gas_wei
+        if available <= 0:
+            fee_wei = net_wei = 0
+        else:
+            fee_wei = max(available * fee_bps // BPS, low)
+            if high is not None and fee_wei > high:
+                fee_wei = high
+            if fee_wei > available:
+                fee_wei = available
+            net_wei = available - fee_wei
+        gas_column.append(gas_wei)
+        fee_column.append(fee_wei)
+        net_column.append(net_wei)
+    return {"gas_wei": gas_column, "fee_wei": fee_column, "net_wei": net_column}
+
@@ -0,0 +1,159 @@
+"""
+Background gas-price oracle
+Follows new blocks per chain and serves fee quotes from memory
+"""
+
+import logging
+import threading
+import time
+
+from rate_limiter import PRIORITY_BACKGROUND, rpc_priority
+from rpc_batch import RpcBatch, RpcError, to_int
+
+logger = logging.getLogger(__name__)
+
+HISTORY_BLOCKS = 10
+REWARD_PERCENTILES = [10, 50, 90]
+MIN_POLL_INTERVAL = 1.0
+STALE_BLOCKS = 5        # A quote older than this many block times is refreshed inline
+IDLE_TIMEOUT = 300      # Stop following a chain nobody has asked about for this long
+
+
+def median(values):
+    ordered = sorted(values)
+    if not ordered:
+        return 0
+    return ordered[len(ordered) // 2]
+
+
+def build_quote(gas_price, history):
+    """Fee quote from eth_gasPrice and an eth_feeHistory result (or None)"""
+    if not history or not history.get("baseFeePerGas"):
+        # Pre-London chain: everything is priced at the legacy gas price
+        return {
+            "block_number": None,
+            "base_fee": None,
+            "priority_fee": gas_price,
+            "max_fee": gas_price,
+            "gas_price": gas_price,
+        }
+
+    base_fee = to_int(history["baseFeePerGas"][-1])  # Next block's base fee
+    rewards = [to_int(r[1]) for r in history.get("reward") or [] if len(r) > 1]
+    priority_fee = median(rewards) if rewards else max(gas_price - base_fee, 0)
+    oldest = to_int(history.get("oldestBlock", "0x0"))
+    return {
+        "block_number": oldest + len(history.get("gasUsedRatio") or []) - 1,
+        "base_fee": base_fee,
+        "priority_fee": priority_fee,
+        "max_fee": 2 * base_fee + priority_fee,
+        "gas_price": gas_price,
+    }
+
+
+def fee_history_params(history_blocks=HISTORY_BLOCKS):
+    return [hex(history_blocks), "latest", REWARD_PERCENTILES]
+
+
+class FeeOracle:
+    """Per-chain fee quotes (base fee, priority fee, legacy gas price)
+
+    Each chain gets a daemon thread on first use that refreshes its quote
+    once per block time from eth_feeHistory + eth_gasPrice (one batch POST).
+    """
+
+    def __init__(self, registry, history_blocks=HISTORY_BLOCKS):
+        self.registry = registry
+        self.history_blocks = history_blocks
+        self._quotes = {}
+        self._last_used = {}
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    def quote(self, chain_key):
+        """Latest fee quote for chain; fetched inline only on a cold or stale cache"""
+        self._last_used[chain_key] = time.time()
+
+        quote = self._quotes.get(chain_key)
+        if quote is None or time.time() - quote["updated"] > self._stale_after(chain_key):
+            quote = self.refresh(chain_key)
+        self._ensure_tracking(chain_key)
+        return quote
+
+    def gas_price(self, chain_key):
+        """Legacy gas price in wei"""
+        return self.quote(chain_key)["gas_price"]
+
+    def refresh(self, chain_key):
+        """Fetch fee history and gas price in one batch and store the quote"""
+        client = self.registry.get(chain_key)
+        batch = RpcBatch(client)
+        batch.add("eth_gasPrice", [])
+        batch.add("eth_feeHistory", fee_history_params(self.history_blocks))
+        gas_price, history = batch.execute()
+
+        if isinstance(gas_price, RpcError):
+            raise gas_price
+
+        quote = build_quote(to_int(gas_price), None if isinstance(history, RpcError) else history)
+        quote["updated"] = time.time()
+        self._quotes[chain_key] = quote
+        return quote
+
+    def quotes(self):
+        return dict(self._quotes)
+
+    def _block_time(self, chain_key):
+        return self.registry.chains[chain_key].get("block_time", 2)
+
+    def _stale_after(self, chain_key):
+        return max(self._block_time(chain_key), MIN_POLL_INTERVAL) * STALE_BLOCKS
+
+    def _ensure_tracking(self, chain_key):
+        thread = self._threads.get(chain_key)
+        if thread is not None and thread.is_alive():
+            return
+        with self._lock:
+            thread = self._threads.get(chain_key)
+            if thread is None or not thread.is_alive():
+                thread = threading.Thread(
+                    target=self._follow, args=(chain_key,), name=f"fee-oracle-{chain_key}", daemon=True
+                )
+                self._threads[chain_key] = thread
+                thread.start()
+
+    def _follow(self, chain_key):
+        interval = max(self._block_time(chain_key), MIN_POLL_INTERVAL)
+        while True:
+            time.sleep(interval)
+            if time.time() - self._last_used.get(chain_key, 0) > IDLE_TIMEOUT:
+                break
+            try:
+                with rpc_priority(PRIORITY_BACKGROUND):
+                    self.refresh(chain_key)
+            except Exception as e:
+                logger.debug("Fee refresh failed for %s: %s", chain_key, e)
+        logger.debug("Fee oracle idle for %s, stopping", chain_key)
+
+
+class AsyncFeeOracle:
+    """On-demand fee quotes for AsyncChainClient, cached for a few block times"""
+
+    def __init__(self, history_blocks=HISTORY_BLOCKS):
+        self.history_blocks = history_blocks
+        self._quotes = {}
+
+    async def quote(self, client):
+        quote = self._quotes.get(client.chain_key)
+        stale_after = max(client.config.get("block_time", 2), MIN_POLL_INTERVAL) * STALE_BLOCKS
+        if quote is None or time.time() - quote["updated"] > stale_after:
+            gas_price, history = await client.batch([
+                ("eth_gasPrice", []),
+                ("eth_feeHistory", fee_history_params(self.history_blocks)),
+            ])
+            if isinstance(gas_price, RpcError):
+                raise gas_price
+            quote = build_quote(to_int(gas_price), None if isinstance(history, RpcError) else history)
+            quote["updated"] = time.time()
+            self._quotes[client.chain_key] = quote
+        return quote
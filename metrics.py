@@ -0,0 +1,244 @@
+"""
+Prometheus metrics
+In-process counters and histograms, published to a SQLite file every few
+seconds so /metrics can add them up across gunicorn workers
+"""
+
+import bisect
+import logging
+import os
+import secrets
+import sqlite3
+import tempfile
+import threading
+import time
+
+from sqlite_local import LocalSQLite
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.environ.get(
+    "METRICS_PATH", os.path.join(tempfile.gettempdir(), "dustzip_metrics.sqlite3")
+)
+FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", "5"))  # Seconds between publishes
+GAUGE_TTL = FLUSH_INTERVAL * 3      # Gauges from workers silent this long are dropped
+RETENTION = 86400                   # Samples of workers gone this long are purged
+PURGE_EVERY = 100                   # flushes between purges
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metric_samples (
+    instance TEXT NOT NULL,
+    sample TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    le REAL,
+    value REAL NOT NULL,
+    gauge INTEGER NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS metric_samples_instance ON metric_samples (instance);
+"""
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(labels):
+    """Prometheus label set for a tuple of (name, value) pairs"""
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class MetricsRegistry:
+    """Counters, gauges and histograms for one worker, summed across workers on render
+
+    inc()/observe() only touch in-memory dicts. A daemon thread, started on
+    first use in each process, writes the worker's cumulative values under
+    its own instance id; render() adds up every instance. Collectors are
+    called at publish time for values other components already count, and
+    global collectors at render time for values that are already shared by
+    all workers (so they are not added up twice).
+    """
+
+    def __init__(self, path=DEFAULT_PATH, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._db = LocalSQLite(path, SCHEMA)
+        self._families = {}     # name -> (kind, help, buckets)
+        self._values = {}       # (name, labels) -> value
+        self._histograms = {}   # (name, labels) -> [per-bucket counts..., +Inf count, sum]
+        self._collectors = []
+        self._global_collectors = []
+        self._lock = threading.Lock()
+        self._instance = None
+        self._flushes = 0
+        os.register_at_fork(after_in_child=self._reset)
+
+    def counter(self, name, help_text):
+        self._families[name] = (COUNTER, help_text, None)
+        return name
+
+    def gauge(self, name, help_text):
+        self._families[name] = (GAUGE, help_text, None)
+        return name
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self._families[name] = (HISTOGRAM, help_text, tuple(buckets))
+        return name
+
+    def collector(self, fn):
+        """fn() -> [(name, labels dict, value)], read whenever this worker publishes"""
+        self._collectors.append(fn)
+        return fn
+
+    def global_collector(self, fn):
+        """fn() -> [(name, labels dict, value)] for values already shared across workers"""
+        self._global_collectors.append(fn)
+        return fn
+
+    def inc(self, name, labels=None, value=1):
+        key = (name, _label_key(labels))
+        self._ensure_publisher()
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def observe(self, name, value, labels=None):
+        key = (name, _label_key(labels))
+        buckets = self._families[name][2]
+        self._ensure_publisher()
+        with self._lock:
+            counts = self._histograms.get(key)
+            if counts is None:
+                counts = self._histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+            counts[bisect.bisect_left(buckets, value)] += 1
+            counts[-1] += value
+
+    def samples(self):
+        """This worker's samples as (sample name, labels tuple, le, value, is_gauge)"""
+        with self._lock:
+            values = dict(self._values)
+            histograms = {key: list(counts) for key, counts in self._histograms.items()}
+
+        rows = []
+        for (name, labels), value in values.items():
+            rows.append((name, labels, None, value, self._families[name][0] == GAUGE))
+        for (name, labels), counts in histograms.items():
+            buckets = self._families[name][2]
+            cumulative = 0
+            for bound, count in zip(buckets + (float("inf"),), counts[:-1]):
+                cumulative += count
+                rows.append((f"{name}_bucket", labels, bound, cumulative, False))
+            rows.append((f"{name}_count", labels, None, cumulative, False))
+            rows.append((f"{name}_sum", labels, None, counts[-1], False))
+        for fn in self._collectors:
+            try:
+                for name, labels, value in fn():
+                    rows.append((name, _label_key(labels), None, value, self._families[name][0] == GAUGE))
+            except Exception as e:
+                logger.debug("Metrics collector failed: %s", e)
+        return rows
+
+    def flush(self):
+        """Publish this worker's current values"""
+        self._ensure_publisher()
+        now = time.time()
+        rows = [
+            (self._instance, sample, format_labels(labels), le, value, int(is_gauge), now)
+            for sample, labels, le, value, is_gauge in self.samples()
+        ]
+        conn = self._db.conn()
+        with conn:
+            conn.execute("DELETE FROM metric_samples WHERE instance = ?", (self._instance,))
+            conn.executemany(
+                "INSERT INTO metric_samples (instance, sample, labels, le, value, gauge, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self._flushes += 1
+            if self._flushes % PURGE_EVERY == 0:
+                conn.execute("DELETE FROM metric_samples WHERE updated < ?", (now - RETENTION,))
+
+    def render(self):
+        """Every worker's metrics, added up, in the Prometheus text format"""
+        try:
+            self.flush()
+            rows = self._db.conn().execute(
+                "SELECT sample, labels, le, SUM(value) FROM metric_samples "
+                "WHERE gauge = 0 OR updated >= ? GROUP BY sample, labels, le ORDER BY sample, labels, le",
+                (time.time() - GAUGE_TTL,)
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning("Metrics read failed, serving this worker only: %s", e)
+            rows = [
+                (sample, format_labels(labels), le, value)
+                for sample, labels, le, value, _ in sorted(self.samples(), key=lambda r: (r[0], r[1], r[2] or 0))
+            ]
+        for fn in self._global_collectors:
+            try:
+                rows.extend((name, format_labels(_label_key(labels)), None, value) for name, labels, value in fn())
+            except Exception as e:
+                logger.debug("Metrics collector failed: %s", e)
+
+        by_family = {}
+        for sample, labels, le, value in rows:
+            by_family.setdefault(self._family_of(sample), []).append((sample, labels, le, value))
+
+        lines = []
+        for family in sorted(by_family):
+            kind, help_text, _ = self._families.get(family, ("untyped", "", None))
+            lines.append(f"# HELP {family} {help_text}")
+            lines.append(f"# TYPE {family} {kind}")
+            for sample, labels, le, value in by_family[family]:
+                if le is not None:
+                    le_label = f'le="{_format_value(le)}"'
+                    labels = f"{labels},{le_label}" if labels else le_label
+                lines.append(f"{sample}{{{labels}}} {_format_value(value)}" if labels else f"{sample} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def _family_of(self, sample):
+        for suffix in ("_bucket", "_count", "_sum"):
+            name = sample[:-len(suffix)]
+            if sample.endswith(suffix) and self._families.get(name, (None,))[0] == HISTOGRAM:
+                return name
+        return sample
+
+    def _ensure_publisher(self):
+        if self._instance is not None:
+            return
+        with self._lock:
+            if self._instance is None:
+                # Random suffix: a restarted worker may reuse a pid, but must not reuse its samples
+                self._instance = f"{os.getpid()}-{secrets.token_hex(4)}"
+                threading.Thread(target=self._publish_loop, name="metrics-publisher", daemon=True).start()
+
+    def _reset(self):
+        # Forked child: the parent's values and publisher thread stay with the parent
+        self._lock = threading.Lock()
+        self._values.clear()
+        self._histograms.clear()
+        self._instance = None
+
+    def _publish_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.debug("Metrics publish failed: %s", e)
+
+
+# Process-wide registry, like the logging module's root logger
+registry = MetricsRegistry()
@@ -0,0 +1,490 @@
+"""
+Mock JSON-RPC fleet
+Local stand-in nodes for every chain, with deterministic state and
+configurable latency, error rate and batch support, for offline benchmarks
+and tests
+"""
+
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import rlp
+from eth_abi import decode, encode
+from eth_account import Account
+from eth_keys import keys
+from eth_utils import keccak, to_checksum_address
+
+from eip7702 import recover_authority
+from multicall import AGGREGATE3_SELECTOR, GET_ETH_BALANCE_SELECTOR
+from sweep_batcher import ERROR_SELECTOR, SWEEP_SELECTOR, sweep_intent_hash
+from token_scanner import BALANCE_OF_SELECTOR, DECIMALS_SELECTOR, SYMBOL_SELECTOR
+
+GAS_PRICE = 20 * 10**9
+BASE_FEE = 15 * 10**9
+PRIORITY_FEE = 10**9
+GENESIS_BLOCK = 1000000
+MAX_DUST_WEI = 10**16   # Native balances are spread over [0, 0.01)
+TOKEN_HOLD_RATIO = 20   # One (token, owner) pair in this many holds a balance
+SWEEP_FEE_BPS = 500     # DustAggregator.FEE_PERCENTAGE
+
+
+class LatencyModel:
+    """Per-request delay, parsed from "fixed:S", "uniform:LO:HI" or "lognormal:MEDIAN:SIGMA" (seconds)"""
+
+    def __init__(self, kind="fixed", *params):
+        if kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency model: {kind}")
+        self.kind = kind
+        self.params = [float(p) for p in params] or [0.0]
+
+    @classmethod
+    def parse(cls, spec):
+        kind, *params = str(spec).split(":")
+        if not params:
+            # A bare number means a fixed delay
+            return cls("fixed", kind)
+        return cls(kind, *params)
+
+    def sample(self, rng):
+        if self.kind == "uniform":
+            return rng.uniform(self.params[0], self.params[1])
+        if self.kind == "lognormal":
+            # lognormvariate(0, sigma) has a median of 1
+            median, sigma = self.params[0], self.params[1]
+            return rng.lognormvariate(0, sigma) * median
+        return self.params[0]
+
+    def __str__(self):
+        return ":".join([self.kind] + [f"{p:g}" for p in self.params])
+
+
+def _hash_int(*parts):
+    return int.from_bytes(keccak(b"".join(str(p).lower().encode() for p in parts))[:8], "big")
+
+
+def _int(value):
+    return int.from_bytes(value, "big")
+
+
+def revert(message):
+    return False, ERROR_SELECTOR + encode(["string"], [message])
+
+
+def decode_transaction(raw):
+    """(sender, tx) for a signed legacy, EIP-2930, EIP-1559 or set-code (type 4) tx
+
+    tx has "type", "nonce", "to", "value", "data" and "authorizationList".
+    """
+    if raw[0] >= 0xc0:
+        fields = rlp.decode(raw)
+        sender = Account.recover_transaction(raw)
+        tx_type, to_index = 0, 3
+    else:
+        tx_type, fields = raw[0], rlp.decode(raw[1:])
+        y, r, s = (_int(value) for value in fields[-3:])
+        signing_hash = keccak(bytes([tx_type]) + rlp.encode(fields[:-3]))
+        sender = keys.Signature(vrs=(y, r, s)).recover_public_key_from_msg_hash(signing_hash).to_checksum_address()
+        to_index = 4 if tx_type == 1 else 5
+    authorizations = fields[9] if tx_type == 4 else []
+    return sender, {
+        "type": tx_type,
+        "nonce": _int(fields[0] if tx_type == 0 else fields[1]),
+        "to": to_checksum_address(fields[to_index]) if fields[to_index] else None,
+        "value": _int(fields[to_index + 1]),
+        "data": bytes(fields[to_index + 2]),
+        "authorizationList": [
+            {"chainId": _int(chain_id), "address": to_checksum_address(address), "nonce": _int(nonce),
+             "yParity": _int(y), "r": _int(r), "s": _int(s)}
+            for chain_id, address, nonce, y, r, s in authorizations
+        ],
+    }
+
+
+class MockChain:
+    """Deterministic chain state: balances derive from the address, blocks from the clock
+
+    Sent txs are decoded and checked like a node would: a nonce below the
+    sender's next one is rejected, a higher one waits in the pool for the
+    gap to fill. Pooled txs are mined in nonce order once a block has
+    passed (gas is free), applying value transfers and EIP-7702
+    delegations. Accounts delegated to any address run DustAggregator's
+    sweep(); its fee goes to the delegate address. fund() sets balances,
+    drop() evicts a sender's pooled txs and `mining = False` holds
+    everything in the pool.
+    """
+
+    def __init__(self, chain_key, chain_id, block_time=2.0):
+        self.chain_key = chain_key
+        self.chain_id = chain_id
+        self.block_time = max(block_time, 0.1)
+        self.started = time.time()
+        self.mining = True
+        self.nonces = Counter()  # sender -> nonce of its next mined tx
+        self.pool = {}           # sender -> {nonce: (tx hash, tx, block received in)}
+        self.balances = {}       # address -> wei, for funded or transacting accounts
+        self.code = {}           # authority -> delegate address (EIP-7702)
+        self.intents = set()     # sweep intent digests already used
+        self.sent = {}           # tx hash -> block it was mined in
+        self.statuses = {}       # tx hash -> receipt status (1 ok, 0 reverted)
+        self.transactions = {}   # tx hash -> (sender, tx)
+        self._lock = threading.RLock()
+
+    def block_number(self):
+        return GENESIS_BLOCK + int((time.time() - self.started) / self.block_time)
+
+    def balance(self, address, state=None):
+        balances = self.balances if state is None else state["balances"]
+        address = address.lower()
+        if address in balances:
+            return balances[address]
+        return _hash_int(self.chain_id, address) % MAX_DUST_WEI
+
+    def fund(self, address, wei):
+        with self._lock:
+            self.balances[address.lower()] = wei
+
+    def token_balance(self, token, owner):
+        if _hash_int(self.chain_id, token, owner) % TOKEN_HOLD_RATIO:
+            return 0
+        return 10**6 + _hash_int(token, owner) % 10**18
+
+    def pending_nonce(self, sender):
+        sender = sender.lower()
+        nonce = self.nonces[sender]
+        while nonce in self.pool.get(sender, {}):
+            nonce += 1
+        return nonce
+
+    def state(self):
+        """Copy of the mutable state, for a call or a tx that may revert"""
+        return {"balances": dict(self.balances), "code": dict(self.code), "intents": set(self.intents)}
+
+    def commit(self, state):
+        self.balances, self.code, self.intents = state["balances"], state["code"], state["intents"]
+
+    def authorize(self, authorizations, state, nonces):
+        """Apply valid EIP-7702 authorizations to `state`, bumping authority nonces"""
+        for auth in authorizations:
+            try:
+                authority = recover_authority(auth).lower()
+            except ValueError:
+                continue
+            if auth["chainId"] in (0, self.chain_id) and auth["nonce"] == nonces[authority]:
+                state["code"][authority] = auth["address"]
+                nonces[authority] += 1
+
+    def call(self, to, data, state=None):
+        """(success, return data) for an eth_call"""
+        state = self.state() if state is None else state
+        selector, args = data[:4], data[4:]
+        delegate = state["code"].get(to.lower())
+        if delegate is not None:
+            return self.sweep(to, delegate, args, state) if selector == SWEEP_SELECTOR else (False, b"")
+        if selector == SWEEP_SELECTOR:
+            # Plain EOA: the call succeeds and returns nothing
+            return True, b""
+        if selector == AGGREGATE3_SELECTOR:
+            (calls,) = decode(["(address,bool,bytes)[]"], args)
+            results = []
+            for target, allow_failure, calldata in calls:
+                success, output = self.call(target, calldata, state)
+                if not success and not allow_failure:
+                    return revert("Multicall3: call failed")
+                results.append((success, output))
+            return True, encode(["(bool,bytes)[]"], [results])
+        if selector == GET_ETH_BALANCE_SELECTOR:
+            return True, encode(["uint256"], [self.balance(decode(["address"], args)[0], state)])
+        if selector == BALANCE_OF_SELECTOR:
+            return True, encode(["uint256"], [self.token_balance(to, decode(["address"], args)[0])])
+        if selector == DECIMALS_SELECTOR:
+            return True, encode(["uint8"], [18])
+        if selector == SYMBOL_SELECTOR:
+            return True, encode(["string"], [f"T{to[-4:].upper()}"])
+        return False, b""
+
+    def sweep(self, account, delegate, args, state):
+        """DustAggregator.sweep(to, deadline, v, r, s) run on a delegated account"""
+        to, deadline, v, r, s = decode(["address", "uint256", "uint8", "bytes32", "bytes32"], args)
+        if deadline < time.time():
+            return revert("Sweep intent expired")
+        digest = sweep_intent_hash(self.chain_id, account, to, deadline)
+        if digest in state["intents"]:
+            return revert("Sweep intent already used")
+        try:
+            signature = keys.Signature(vrs=(v - 27, _int(r), _int(s)))
+            signer = signature.recover_public_key_from_msg_hash(digest).to_checksum_address()
+        except Exception:
+            signer = None
+        if signer is None or signer.lower() != account.lower():
+            return revert("Invalid sweep signature")
+        balance = self.balance(account, state)
+        if balance == 0:
+            return revert("No dust to aggregate")
+
+        fee = balance * SWEEP_FEE_BPS // 10000
+        state["intents"].add(digest)
+        state["balances"][account.lower()] = 0
+        state["balances"][delegate.lower()] = self.balance(delegate, state) + fee
+        state["balances"][to.lower()] = self.balance(to, state) + balance - fee
+        return True, encode(["uint256"], [balance - fee])
+
+    def send(self, raw_tx):
+        raw = bytes.fromhex(raw_tx[2:])
+        try:
+            sender, tx = decode_transaction(raw)
+        except Exception as e:
+            return ValueError(f"invalid transaction: {e}")
+        sender = sender.lower()
+        tx_hash = "0x" + keccak(raw).hex()
+        with self._lock:
+            self.mine()
+            if tx["nonce"] < self.nonces[sender]:
+                return ValueError("nonce too low")
+            pooled = self.pool.setdefault(sender, {}).get(tx["nonce"])
+            if pooled is not None:
+                return tx_hash if pooled[0] == tx_hash else ValueError("replacement transaction underpriced")
+            self.pool[sender][tx["nonce"]] = (tx_hash, tx, self.block_number())
+            self.transactions[tx_hash] = (sender, tx)
+        return tx_hash
+
+    def drop(self, sender):
+        """Evict every pooled (unmined) tx of sender, as a node under pressure would"""
+        with self._lock:
+            return len(self.pool.pop(sender.lower(), {}))
+
+    def mine(self):
+        """Mine pooled txs received before the current block, in nonce order"""
+        if not self.mining:
+            return
+        block = self.block_number()
+        with self._lock:
+            for sender, pool in self.pool.items():
+                while self.nonces[sender] in pool and pool[self.nonces[sender]][2] < block:
+                    tx_hash, tx, _ = pool.pop(self.nonces[sender])
+                    self.nonces[sender] += 1
+                    self.sent[tx_hash] = block
+                    self.statuses[tx_hash] = self.execute(sender, tx)
+
+    def execute(self, sender, tx):
+        """Apply a mined tx; 1 if it succeeded, 0 if it reverted (delegations stick either way)"""
+        state = self.state()
+        self.authorize(tx["authorizationList"], state, self.nonces)
+        self.code = dict(state["code"])
+        if tx["value"] > self.balance(sender, state):
+            return 0
+        state["balances"][sender] = self.balance(sender, state) - tx["value"]
+        if tx["to"] is not None:
+            state["balances"][tx["to"].lower()] = self.balance(tx["to"], state) + tx["value"]
+            if tx["data"] and not self.call(tx["to"], tx["data"], state)[0]:
+                return 0
+        self.commit(state)
+        return 1
+
+    def receipt(self, tx_hash):
+        tx_hash = tx_hash.lower()
+        mined_in = self.sent.get(tx_hash)
+        if mined_in is None or self.block_number() < mined_in:
+            return None
+        return {
+            "transactionHash": tx_hash,
+            "blockNumber": hex(mined_in),
+            "status": hex(self.statuses.get(tx_hash, 1)),
+            "gasUsed": hex(21000),
+        }
+
+    def handle(self, call):
+        """JSON-RPC reply for one call"""
+        method, params = call.get("method"), call.get("params") or []
+        try:
+            result = self._dispatch(method, params)
+        except (KeyError, IndexError, ValueError, TypeError) as e:
+            return {"jsonrpc": "2.0", "id": call.get("id"), "error": {"code": -32602, "message": str(e)}}
+        if isinstance(result, Exception):
+            return {"jsonrpc": "2.0", "id": call.get("id"), "error": {"code": -32000, "message": str(result)}}
+        return {"jsonrpc": "2.0", "id": call.get("id"), "result": result}
+
+    def _dispatch(self, method, params):
+        self.mine()
+        if method == "eth_chainId":
+            return hex(self.chain_id)
+        if method == "net_version":
+            return str(self.chain_id)
+        if method == "web3_clientVersion":
+            return "mock-rpc"
+        if method == "eth_blockNumber":
+            return hex(self.block_number())
+        if method == "eth_getBalance":
+            return hex(self.balance(params[0]))
+        if method == "eth_gasPrice":
+            return hex(GAS_PRICE)
+        if method == "eth_maxPriorityFeePerGas":
+            return hex(PRIORITY_FEE)
+        if method == "eth_feeHistory":
+            count = int(params[0], 16) if isinstance(params[0], str) else int(params[0])
+            percentiles = params[2] if len(params) > 2 else []
+            return {
+                "oldestBlock": hex(self.block_number() - count + 1),
+                "baseFeePerGas": [hex(BASE_FEE)] * (count + 1),
+                "gasUsedRatio": [0.5] * count,
+                "reward": [[hex(PRIORITY_FEE)] * len(percentiles) for _ in range(count)],
+            }
+        if method == "eth_getTransactionCount":
+            if len(params) > 1 and params[1] == "pending":
+                return hex(self.pending_nonce(params[0]))
+            return hex(self.nonces[params[0].lower()])
+        if method == "eth_getCode":
+            delegate = self.code.get(params[0].lower())
+            return "0x" if delegate is None else "0xef0100" + delegate[2:].lower()
+        if method == "eth_estimateGas":
+            return hex(21000)
+        if method == "eth_call":
+            data = params[0].get("data") or params[0].get("input") or "0x"
+            state = self.state()
+            authorizations = [
+                {key: value if key == "address" else int(value, 16) for key, value in auth.items()}
+                for auth in params[0].get("authorizationList") or []
+            ]
+            self.authorize(authorizations, state, Counter(self.nonces))
+            success, output = self.call(params[0]["to"], bytes.fromhex(data[2:]), state)
+            return "0x" + output.hex() if success else ValueError("execution reverted")
+        if method == "eth_getBlockByNumber":
+            number = self.block_number()
+            return {"number": hex(number), "hash": "0x" + keccak(str(number).encode()).hex(),
+                    "baseFeePerGas": hex(BASE_FEE), "transactions": []}
+        if method == "eth_sendRawTransaction":
+            return self.send(params[0])
+        if method == "eth_getTransactionReceipt":
+            return self.receipt(params[0])
+        return ValueError(f"Method not found: {method}")
+
+
+class MockNode:
+    """One HTTP endpoint serving a MockChain"""
+
+    def __init__(self, chain, latency=None, error_rate=0.0, batch=True, seed=None):
+        self.chain = chain
+        self.latency = latency or LatencyModel()
+        self.error_rate = error_rate
+        self.batch = batch
+        self.posts = 0
+        self.calls = Counter()
+        self.http_errors = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name=f"mock-{self.chain.chain_key}", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def stats(self):
+        with self._lock:
+            return {"posts": self.posts, "calls": sum(self.calls.values()), "http_errors": self.http_errors,
+                    "methods": dict(self.calls)}
+
+    def reply(self, body):
+        """(http status, payload) for a decoded request body"""
+        with self._lock:
+            self.posts += 1
+            delay = self.latency.sample(self._rng)
+            failed = self._rng.random() < self.error_rate
+            calls = body if isinstance(body, list) else [body]
+            self.calls.update(call.get("method") for call in calls)
+            if failed:
+                self.http_errors += 1
+        time.sleep(max(delay, 0))
+        if failed:
+            return 429, {"jsonrpc": "2.0", "id": None, "error": {"code": -32005, "message": "rate limited"}}
+        if isinstance(body, list):
+            if not self.batch:
+                return 200, {"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "batch not supported"}}
+            return 200, [self.chain.handle(call) for call in body]
+        return 200, self.chain.handle(body)
+
+    def _handler(self):
+        node = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                try:
+                    body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                except ValueError:
+                    status, payload = 400, {"jsonrpc": "2.0", "id": None, "error": {"code": -32700, "message": "parse error"}}
+                else:
+                    status, payload = node.reply(body)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+
+class MockFleet:
+    """`endpoints` mock nodes per chain, for a CHAINS-style config dict
+
+    `overrides` maps chain keys to {"latency": LatencyModel, "error_rate": float}
+    for chains that should behave differently from the rest.
+    """
+
+    def __init__(self, chains, latency=None, error_rate=0.0, batch=True, endpoints=1, seed=0, overrides=None):
+        self.nodes = {}
+        for i, (chain_key, config) in enumerate(chains.items()):
+            chain = MockChain(chain_key, config["chain_id"], config.get("block_time", 2))
+            override = (overrides or {}).get(chain_key, {})
+            self.nodes[chain_key] = [
+                MockNode(
+                    chain, override.get("latency", latency), override.get("error_rate", error_rate), batch,
+                    seed=None if seed is None else seed + 100 * i + n
+                )
+                for n in range(endpoints)
+            ]
+
+    def start(self):
+        for nodes in self.nodes.values():
+            for node in nodes:
+                node.start()
+        return self
+
+    def stop(self):
+        for nodes in self.nodes.values():
+            for node in nodes:
+                node.stop()
+
+    def urls(self, chain_key):
+        return [node.url for node in self.nodes[chain_key]]
+
+    def configure(self, chains):
+        """Point every chain config in `chains` at its mock endpoints (in place)"""
+        for chain_key, config in chains.items():
+            if chain_key in self.nodes:
+                config["rpcs"] = self.urls(chain_key)
+                config.pop("rpc", None)
+        return chains
+
+    def totals(self):
+        """Summed counters over every node"""
+        totals = {"posts": 0, "calls": 0, "http_errors": 0}
+        for nodes in self.nodes.values():
+            for node in nodes:
+                stats = node.stats()
+                for key in totals:
+                    totals[key] += stats[key]
+        return totals
@@ -0,0 +1,216 @@
+"""
+Multicall3 helpers
+Packs many read calls into chunked aggregate3 eth_calls
+"""
+
+import logging
+
+from eth_abi import decode, encode
+
+from rpc_batch import RpcError, run_batch, to_int
+
+logger = logging.getLogger(__name__)
+
+# Same address on nearly every EVM chain (zkSync Era overrides it in CHAINS)
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+
+AGGREGATE3_SELECTOR = bytes.fromhex("82ad56cb")      # aggregate3((address,bool,bytes)[])
+GET_ETH_BALANCE_SELECTOR = bytes.fromhex("4d2301cc")  # getEthBalance(address)
+
+DEFAULT_CHUNK_SIZE = 500   # sub-calls per aggregate3
+CALLS_PER_BATCH = 10       # aggregate3 eth_calls per JSON-RPC batch
+GET_BALANCE_BATCH = 100    # eth_getBalance calls per JSON-RPC batch (fallback)
+
+
+class MulticallUnavailable(Exception):
+    """Multicall3 is not deployed or the eth_call was rejected"""
+
+
+def encode_aggregate3(calls, allow_failure=True):
+    """Encode [(target, calldata)] as aggregate3 calldata, allowing failures by default"""
+    encoded = encode(["(address,bool,bytes)[]"], [[(target, allow_failure, data) for target, data in calls]])
+    return "0x" + (AGGREGATE3_SELECTOR + encoded).hex()
+
+
+def decode_aggregate3(result):
+    """Decode aggregate3 output into [(success, return_data)]"""
+    raw = bytes.fromhex(result[2:] if result.startswith("0x") else result)
+    if not raw:
+        # eth_call to an address without code returns empty data
+        raise MulticallUnavailable("empty aggregate3 response")
+    (results,) = decode(["(bool,bytes)[]"], raw)
+    return list(results)
+
+
+def aggregate3_batches(calls, multicall_address, chunk_size, block):
+    """aggregate3 eth_calls for `calls`, grouped into JSON-RPC batches of (method, params)"""
+    chunks = [calls[i:i + chunk_size] for i in range(0, len(calls), chunk_size)]
+    return [
+        [("eth_call", [{"to": multicall_address, "data": encode_aggregate3(chunk)}, block])
+         for chunk in chunks[start:start + CALLS_PER_BATCH]]
+        for start in range(0, len(chunks), CALLS_PER_BATCH)
+    ]
+
+
+def decode_aggregate3_replies(replies):
+    results = []
+    for reply in replies:
+        if isinstance(reply, RpcError):
+            raise MulticallUnavailable(str(reply))
+        results.extend(decode_aggregate3(reply))
+    return results
+
+
+def eth_call_batches(calls, batch_size, block):
+    """Plain eth_calls for [(target, calldata)], grouped into JSON-RPC batches"""
+    return [
+        [("eth_call", [{"to": target, "data": "0x" + data.hex()}, block]) for target, data in calls[start:start + batch_size]]
+        for start in range(0, len(calls), batch_size)
+    ]
+
+
+def eth_call_result(reply):
+    return (False, b"") if isinstance(reply, RpcError) else (True, bytes.fromhex(reply[2:]))
+
+
+def get_balance_batches(addresses, batch_size, block):
+    """(addresses, eth_getBalance calls) per JSON-RPC batch"""
+    chunks = [addresses[start:start + batch_size] for start in range(0, len(addresses), batch_size)]
+    return [(chunk, [("eth_getBalance", [address, block]) for address in chunk]) for chunk in chunks]
+
+
+def decode_balance_replies(addresses, replies):
+    """{address: wei}, with the RpcError in place of the balance for failed reads"""
+    return {
+        address: reply if isinstance(reply, RpcError) else to_int(reply)
+        for address, reply in zip(addresses, replies)
+    }
+
+
+def eth_balance_calls(addresses, multicall_address):
+    """Multicall3 getEthBalance sub-calls, one per address"""
+    return [
+        (multicall_address, GET_ETH_BALANCE_SELECTOR + encode(["address"], [address]))
+        for address in addresses
+    ]
+
+
+def decode_eth_balances(addresses, results):
+    """{address: wei} from getEthBalance results; failed sub-calls map to an RpcError"""
+    return {
+        address: int.from_bytes(data, "big") if success and len(data) >= 32
+        else RpcError("getEthBalance", {"message": "Multicall3 sub-call failed"})
+        for address, (success, data) in zip(addresses, results)
+    }
+
+
+def aggregate3(client, calls, multicall_address=MULTICALL3_ADDRESS,
+               chunk_size=DEFAULT_CHUNK_SIZE, block="latest"):
+    """Run calls through Multicall3; returns [(success, return_data)] in call order"""
+    results = []
+    for batch_calls in aggregate3_batches(calls, multicall_address, chunk_size, block):
+        results.extend(decode_aggregate3_replies(run_batch(client, batch_calls)))
+    return results
+
+
+async def async_aggregate3(client, calls, multicall_address=MULTICALL3_ADDRESS,
+                           chunk_size=DEFAULT_CHUNK_SIZE, block="latest"):
+    """aggregate3() over an AsyncChainClient"""
+    results = []
+    for batch_calls in aggregate3_batches(calls, multicall_address, chunk_size, block):
+        results.extend(decode_aggregate3_replies(await client.batch(batch_calls)))
+    return results
+
+
+def get_balances_batched(client, addresses, batch_size=GET_BALANCE_BATCH, block="latest"):
+    """Native balances via batched eth_getBalance; failed reads map to their RpcError"""
+    balances = {}
+    for chunk, batch_calls in get_balance_batches(addresses, batch_size, block):
+        balances.update(decode_balance_replies(chunk, run_batch(client, batch_calls)))
+    return balances
+
+
+async def async_get_balances_batched(client, addresses, batch_size=GET_BALANCE_BATCH, block="latest"):
+    """get_balances_batched() over an AsyncChainClient"""
+    balances = {}
+    for chunk, batch_calls in get_balance_batches(addresses, batch_size, block):
+        balances.update(decode_balance_replies(chunk, await client.batch(batch_calls)))
+    return balances
+
+
+def eth_calls_batched(client, calls, batch_size=GET_BALANCE_BATCH, block="latest"):
+    """[(target, calldata)] as batched plain eth_calls; returns [(success, return_data)]"""
+    results = []
+    for batch_calls in eth_call_batches(calls, batch_size, block):
+        results.extend(eth_call_result(reply) for reply in run_batch(client, batch_calls))
+    return results
+
+
+async def async_eth_calls_batched(client, calls, batch_size=GET_BALANCE_BATCH, block="latest"):
+    """eth_calls_batched() over an AsyncChainClient"""
+    results = []
+    for batch_calls in eth_call_batches(calls, batch_size, block):
+        results.extend(eth_call_result(reply) for reply in await client.batch(batch_calls))
+    return results
+
+
+def call_many(client, calls, multicall_address=MULTICALL3_ADDRESS,
+              chunk_size=DEFAULT_CHUNK_SIZE, block="latest"):
+    """Read calls through Multicall3, or batched eth_calls where it is unavailable"""
+    if multicall_address:
+        try:
+            return aggregate3(client, calls, multicall_address, chunk_size, block)
+        except MulticallUnavailable as e:
+            logger.info("Multicall3 unavailable on %s (%s), using eth_call", client.chain_key, e)
+    return eth_calls_batched(client, calls, block=block)
+
+
+async def async_call_many(client, calls, multicall_address=MULTICALL3_ADDRESS,
+                          chunk_size=DEFAULT_CHUNK_SIZE, block="latest"):
+    """call_many() over an AsyncChainClient"""
+    if multicall_address:
+        try:
+            return await async_aggregate3(client, calls, multicall_address, chunk_size, block)
+        except MulticallUnavailable as e:
+            logger.info("Multicall3 unavailable on %s (%s), using eth_call", client.chain_key, e)
+    return await async_eth_calls_batched(client, calls, block=block)
+
+
+def get_eth_balances(client, addresses, multicall_address=MULTICALL3_ADDRESS,
+                     chunk_size=DEFAULT_CHUNK_SIZE, block="latest"):
+    """Native balances (wei) for many checksum addresses on one chain
+
+    Uses Multicall3 getEthBalance when available and falls back to
+    batched eth_getBalance otherwise. Every address is in the result: a
+    read that failed maps to an RpcError, so it is never mistaken for a
+    zero balance (see split_balances).
+    """
+    if multicall_address:
+        calls = eth_balance_calls(addresses, multicall_address)
+        try:
+            return decode_eth_balances(addresses, aggregate3(client, calls, multicall_address, chunk_size, block))
+        except MulticallUnavailable as e:
+            logger.info("Multicall3 unavailable on %s (%s), using eth_getBalance", client.chain_key, e)
+    return get_balances_batched(client, addresses, block=block)
+
+
+async def async_get_eth_balances(client, addresses, multicall_address=MULTICALL3_ADDRESS,
+                                 chunk_size=DEFAULT_CHUNK_SIZE, block="latest"):
+    """get_eth_balances() over an AsyncChainClient"""
+    if multicall_address:
+        calls = eth_balance_calls(addresses, multicall_address)
+        try:
+            return decode_eth_balances(
+                addresses, await async_aggregate3(client, calls, multicall_address, chunk_size, block)
+            )
+        except MulticallUnavailable as e:
+            logger.info("Multicall3 unavailable on %s (%s), using eth_getBalance", client.chain_key, e)
+    return await async_get_balances_batched(client, addresses, block=block)
+
+
+def split_balances(balances):
+    """({address: wei} read, {address: RpcError} failed) from get_eth_balances()"""
+    read, failed = {}, {}
+    for address, value in balances.items():
+        (failed if isinstance(value, RpcError) else read)[address] = value
+    return read, failed
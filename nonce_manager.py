@@ -0,0 +1,293 @@
+"""
+Local nonce management
+Hands out sequential nonces per (chain, sender) and signs/broadcasts
+several transactions per chain back-to-back
+"""
+
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+
+from eip7702 import is_set_code_transaction, sign_set_code_transaction
+from rpc_batch import RpcBatch, RpcError, read_account_state
+from sqlite_local import LocalSQLite
+
+logger = logging.getLogger(__name__)
+
+STATE_PATH = os.environ.get(
+    "RELAYER_STATE_PATH", os.path.join(tempfile.gettempdir(), "dustzip_relayer.sqlite3")
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS nonces (
+    chain TEXT NOT NULL,
+    sender TEXT NOT NULL,
+    next INTEGER NOT NULL,
+    PRIMARY KEY (chain, sender)
+);
+"""
+
+
+class NonceManager:
+    """Sequential nonces per (chain, sender), assigned without a round trip
+
+    The pending nonce is read from the node once per sender; after that
+    nonces are handed out locally. invalidate() drops the local sequence so
+    the next reservation re-reads the node, e.g. after a dropped or
+    replaced tx or a nonce error.
+    """
+
+    def __init__(self):
+        self._next = {}
+        self._lock = threading.Lock()
+        self.resyncs = 0
+
+    @staticmethod
+    def _key(chain_key, sender):
+        return chain_key, sender.lower()
+
+    def seeded(self, chain_key, sender):
+        return self._key(chain_key, sender) in self._next
+
+    def seed(self, chain_key, sender, pending_nonce):
+        """Start the local sequence at the node's pending nonce, unless already started"""
+        with self._lock:
+            self._next.setdefault(self._key(chain_key, sender), pending_nonce)
+
+    def peek(self, chain_key, sender):
+        """Next nonce of the local sequence without reserving it, or None if not started"""
+        return self._next.get(self._key(chain_key, sender))
+
+    def take(self, chain_key, sender, count=1):
+        """Reserve `count` consecutive nonces"""
+        key = self._key(chain_key, sender)
+        with self._lock:
+            start = self._next[key]
+            self._next[key] = start + count
+        return list(range(start, start + count))
+
+    def release(self, chain_key, sender, nonces):
+        """Give back unused nonces if nothing was reserved after them"""
+        if not nonces:
+            return
+        key = self._key(chain_key, sender)
+        with self._lock:
+            if self._next.get(key) == nonces[-1] + 1:
+                self._next[key] = nonces[0]
+
+    def invalidate(self, chain_key, sender):
+        """Forget the local sequence; the next reservation resyncs from the node"""
+        with self._lock:
+            if self._next.pop(self._key(chain_key, sender), None) is not None:
+                self.resyncs += 1
+
+    def stats(self):
+        return {"senders": len(self._next), "resyncs": self.resyncs}
+
+
+class SharedNonceManager:
+    """NonceManager whose sequences live in a SQLite file shared by every worker
+
+    For sender keys used by several gunicorn workers at once: each take()
+    is one IMMEDIATE transaction, so no two processes get the same nonce.
+    """
+
+    def __init__(self, path=STATE_PATH):
+        self.path = path
+        self._db = LocalSQLite(path, SCHEMA)
+        self.resyncs = 0
+
+    @staticmethod
+    def _key(chain_key, sender):
+        return chain_key, sender.lower()
+
+    def seeded(self, chain_key, sender):
+        return self.peek(chain_key, sender) is not None
+
+    def seed(self, chain_key, sender, pending_nonce):
+        """Start the shared sequence at the node's pending nonce, unless already started"""
+        conn = self._db.conn()
+        with conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO nonces (chain, sender, next) VALUES (?, ?, ?)",
+                self._key(chain_key, sender) + (pending_nonce,)
+            )
+
+    def peek(self, chain_key, sender):
+        """Next nonce of the shared sequence without reserving it, or None if not started"""
+        row = self._db.conn().execute(
+            "SELECT next FROM nonces WHERE chain = ? AND sender = ?", self._key(chain_key, sender)
+        ).fetchone()
+        return row[0] if row else None
+
+    def take(self, chain_key, sender, count=1):
+        """Reserve `count` consecutive nonces; KeyError if the sequence is not started"""
+        conn = self._db.conn()
+        key = self._key(chain_key, sender)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT next FROM nonces WHERE chain = ? AND sender = ?", key).fetchone()
+            if row is None:
+                raise KeyError(key)
+            conn.execute("UPDATE nonces SET next = ? WHERE chain = ? AND sender = ?", (row[0] + count,) + key)
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+        return list(range(row[0], row[0] + count))
+
+    def release(self, chain_key, sender, nonces):
+        """Give back unused nonces if no worker reserved any after them"""
+        if not nonces:
+            return
+        conn = self._db.conn()
+        with conn:
+            conn.execute(
+                "UPDATE nonces SET next = ? WHERE chain = ? AND sender = ? AND next = ?",
+                (nonces[0],) + self._key(chain_key, sender) + (nonces[-1] + 1,)
+            )
+
+    def invalidate(self, chain_key, sender):
+        """Forget the shared sequence; the next reservation, in any worker, resyncs from the node"""
+        try:
+            conn = self._db.conn()
+            with conn:
+                deleted = conn.execute(
+                    "DELETE FROM nonces WHERE chain = ? AND sender = ?", self._key(chain_key, sender)
+                ).rowcount
+        except sqlite3.Error as e:
+            logger.warning("Nonce resync failed for %s on %s: %s", sender, chain_key, e)
+            return
+        if deleted:
+            self.resyncs += 1
+
+    def stats(self):
+        (senders,) = self._db.conn().execute("SELECT COUNT(*) FROM nonces").fetchone()
+        return {"senders": senders, "resyncs": self.resyncs}
+
+
+def reserve_nonces(manager, client, sender, count=1):
+    """Reserve nonces for sender on client's chain, reading the node only once"""
+    for _ in range(2):
+        if not manager.seeded(client.chain_key, sender):
+            pending = read_account_state(client, sender, fields=("nonce",))["nonce"]
+            manager.seed(client.chain_key, sender, pending)
+        try:
+            return manager.take(client.chain_key, sender, count)
+        except KeyError:
+            # Invalidated (by another thread or worker) since it was seeded
+            continue
+    raise RuntimeError(f"Nonce sequence for {sender} on {client.chain_key} keeps resetting")
+
+
+async def async_reserve_nonces(manager, client, sender, count=1):
+    """reserve_nonces() for an AsyncChainClient"""
+    for _ in range(2):
+        if not manager.seeded(client.chain_key, sender):
+            pending = (await client.read_account_state(sender, fields=("nonce",)))["nonce"]
+            manager.seed(client.chain_key, sender, pending)
+        try:
+            return manager.take(client.chain_key, sender, count)
+        except KeyError:
+            continue
+    raise RuntimeError(f"Nonce sequence for {sender} on {client.chain_key} keeps resetting")
+
+
+async def async_next_nonce(manager, client, sender):
+    """Nonce the sender's next tx would get, without reserving it (for txs sent elsewhere)"""
+    nonce = manager.peek(client.chain_key, sender)
+    if nonce is None:
+        nonce = (await client.read_account_state(sender, fields=("nonce",)))["nonce"]
+    return nonce
+
+
+def _sign(account, tx):
+    if is_set_code_transaction(tx):
+        return sign_set_code_transaction(account, tx)
+    return account.sign_transaction(tx)
+
+
+def _sign_all(account, txs, nonces):
+    return [_sign(account, dict(tx, nonce=nonce)) for tx, nonce in zip(txs, nonces)]
+
+
+def _unsent(nonces, signed):
+    return [
+        {"nonce": nonce, "tx_hash": s.hash.hex(), "raw_tx": s.rawTransaction.hex(), "status": "signed"}
+        for nonce, s in zip(nonces, signed)
+    ]
+
+
+def _settle(manager, chain_key, sender, nonces, signed, replies):
+    """Per-tx results for a broadcast batch; resyncs the sender after any failure"""
+    results = []
+    for nonce, s, reply in zip(nonces, signed, replies):
+        if isinstance(reply, RpcError):
+            results.append({"nonce": nonce, "tx_hash": s.hash.hex(), "status": "error", "error": str(reply)})
+        else:
+            results.append({"nonce": nonce, "tx_hash": reply, "status": "sent"})
+
+    failed = [r for r in results if r["status"] == "error"]
+    if failed:
+        # Later txs may sit behind a gap, or our sequence is off: let the node decide
+        logger.info(
+            "%d of %d txs rejected on %s for %s (%s), resyncing nonce",
+            len(failed), len(results), chain_key, sender, failed[0]["error"]
+        )
+        manager.invalidate(chain_key, sender)
+    return results
+
+
+def sign_and_send(manager, client, account, txs, broadcast=True):
+    """Assign nonces to txs, sign them and broadcast them in one batch
+
+    Nothing waits for a tx to be mined. Returns one dict per tx, in order,
+    with "nonce", "tx_hash" and "status" ("sent", "error" or, when not
+    broadcasting, "signed" plus "raw_tx"). A dry run gives its nonces back.
+    """
+    if not txs:
+        return []
+    nonces = reserve_nonces(manager, client, account.address, len(txs))
+    try:
+        signed = _sign_all(account, txs, nonces)
+    except Exception:
+        manager.release(client.chain_key, account.address, nonces)
+        raise
+    if not broadcast:
+        manager.release(client.chain_key, account.address, nonces)
+        return _unsent(nonces, signed)
+
+    batch = RpcBatch(client)
+    for s in signed:
+        batch.add("eth_sendRawTransaction", [s.rawTransaction.hex()])
+    try:
+        replies = batch.execute()
+    except Exception:
+        # Unknown how many reached the node
+        manager.invalidate(client.chain_key, account.address)
+        raise
+    return _settle(manager, client.chain_key, account.address, nonces, signed, replies)
+
+
+async def async_sign_and_send(manager, client, account, txs, broadcast=True):
+    """sign_and_send() for an AsyncChainClient"""
+    if not txs:
+        return []
+    nonces = await async_reserve_nonces(manager, client, account.address, len(txs))
+    try:
+        signed = _sign_all(account, txs, nonces)
+    except Exception:
+        manager.release(client.chain_key, account.address, nonces)
+        raise
+    if not broadcast:
+        manager.release(client.chain_key, account.address, nonces)
+        return _unsent(nonces, signed)
+
+    try:
+        replies = await client.batch([("eth_sendRawTransaction", [s.rawTransaction.hex()]) for s in signed])
+    except Exception:
+        manager.invalidate(client.chain_key, account.address)
+        raise
+    return _settle(manager, client.chain_key, account.address, nonces, signed, replies)
@@ -0,0 +1,179 @@
+"""
+Token price provider
+USD prices for every symbol we need in one batched request, kept in a TTL
+cache that keeps serving stale prices while a background refresh runs
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+PRICE_SOURCE = os.environ.get("PRICE_SOURCE", "coingecko")  # "coingecko" or "fixture"
+FIXTURE_PATH = os.environ.get(
+    "PRICE_FIXTURE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "prices.json")
+)
+PRICE_TTL = float(os.environ.get("PRICE_TTL", "60"))  # Refresh prices older than this in the background
+PRICE_STALE_TTL = float(os.environ.get("PRICE_STALE_TTL", "900"))  # Never serve prices older than this
+REQUEST_TIMEOUT = 10
+
+COINGECKO_URL = "https://api.coingecko.com/api/v3/simple/price"
+COINGECKO_IDS = {
+    "ETH": "ethereum",
+    "MATIC": "matic-network",
+    "BNB": "binancecoin",
+    "AVAX": "avalanche-2",
+    "FTM": "fantom",
+    "GLMR": "moonbeam",
+    "CELO": "celo",
+}
+
+
+class CoinGeckoSource:
+    """USD prices from CoinGecko /simple/price, all symbols in one request"""
+
+    def __init__(self, ids=COINGECKO_IDS, url=COINGECKO_URL, timeout=REQUEST_TIMEOUT):
+        self.ids = ids
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def fetch(self, symbols):
+        """{symbol: usd} for the symbols CoinGecko knows"""
+        ids = {self.ids[s]: s for s in symbols if s in self.ids}
+        if not ids:
+            return {}
+        response = self.session.get(
+            self.url, params={"ids": ",".join(sorted(ids)), "vs_currencies": "usd"}, timeout=self.timeout
+        )
+        response.raise_for_status()
+        return {
+            ids[coin_id]: float(price["usd"])
+            for coin_id, price in response.json().items()
+            if coin_id in ids and "usd" in price
+        }
+
+
+class FixturePriceSource:
+    """USD prices from a local JSON file ({"ETH": 3500.0, ...}), for offline runs and tests"""
+
+    def __init__(self, path=FIXTURE_PATH):
+        self.path = path
+
+    def fetch(self, symbols):
+        with open(self.path) as f:
+            prices = json.load(f)
+        return {s: float(prices[s]) for s in symbols if s in prices}
+
+
+def make_source(name=PRICE_SOURCE):
+    if name == "fixture":
+        return FixturePriceSource()
+    if name == "coingecko":
+        return CoinGeckoSource()
+    raise ValueError(f"Unknown price source: {name}")
+
+
+class PriceCache:
+    """USD price per symbol with a TTL and stale-while-revalidate
+
+    Prices past `ttl` are still served while one background thread refetches
+    every known symbol in a single batched request. get_prices() fetches
+    inline only for symbols it has never seen (or that are past
+    `stale_ttl`), and with fetch_missing=False it never blocks at all.
+    """
+
+    def __init__(self, source, ttl=PRICE_TTL, stale_ttl=PRICE_STALE_TTL):
+        self.source = source
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.fetches = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._prices = {}  # symbol -> (usd, fetched_at)
+        self._symbols = set()
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def get_prices(self, symbols, fetch_missing=True):
+        """{symbol: usd} for the symbols with a usable price"""
+        symbols = {s.upper() for s in symbols}
+        now = time.time()
+        prices = {}
+        missing = []
+        stale = False
+        for symbol in symbols:
+            entry = self._prices.get(symbol)
+            if entry is None or now - entry[1] > self.stale_ttl:
+                missing.append(symbol)
+                continue
+            prices[symbol] = entry[0]
+            if now - entry[1] > self.ttl:
+                stale = True
+                self.stale_hits += 1
+            else:
+                self.hits += 1
+        self.misses += len(missing)
+        self._symbols.update(symbols)
+
+        if missing and fetch_missing:
+            try:
+                prices.update(self._fetch(missing))
+            except Exception as e:
+                logger.warning("Price fetch failed for %s: %s", ", ".join(sorted(missing)), e)
+        elif missing:
+            stale = True
+        if stale:
+            self.refresh_in_background()
+        return prices
+
+    def get_price(self, symbol, fetch_missing=True):
+        """USD price of one symbol, or None if unavailable"""
+        return self.get_prices([symbol], fetch_missing).get(symbol.upper())
+
+    def warm(self, symbols):
+        """Start fetching `symbols` in the background so the first requests hit the cache"""
+        self._symbols.update(s.upper() for s in symbols)
+        self.refresh_in_background()
+
+    def refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh, name="price-refresh", daemon=True).start()
+
+    def stats(self):
+        now = time.time()
+        return {
+            "source": type(self.source).__name__,
+            "symbols": len(self._prices),
+            "oldest_age": max((now - fetched for _, fetched in self._prices.values()), default=None),
+            "fetches": self.fetches,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+        }
+
+    def _fetch(self, symbols):
+        self.fetches += 1
+        prices = self.source.fetch(sorted(symbols))
+        now = time.time()
+        for symbol, price in prices.items():
+            self._prices[symbol] = (price, now)
+        return prices
+
+    def _refresh(self):
+        try:
+            self._fetch(self._symbols)
+        except Exception as e:
+            logger.warning("Background price refresh failed: %s", e)
+        finally:
+            with self._lock:
+                self._refreshing = False
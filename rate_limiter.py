@@ -0,0 +1,281 @@
+"""
+RPC admission control
+Token-bucket request rate and concurrency budgets per endpoint, with a
+per-chain priority queue so interactive reads go ahead of background work
+"""
+
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Priorities, lower goes first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+DEFAULT_RPS = float(os.environ.get("RPC_RATE_RPS", "25"))  # Per endpoint, for the whole server
+DEFAULT_MAX_CONCURRENT = int(os.environ.get("RPC_MAX_CONCURRENT", "8"))
+# Each gunicorn worker gets an equal share of every endpoint budget (run.sh sets this to --workers)
+WORKERS = max(int(os.environ.get("WEB_CONCURRENCY", "1")), 1)
+MAX_QUEUE = int(os.environ.get("RPC_MAX_QUEUE", "64"))  # Waiters per chain before new requests are shed
+MAX_WAIT = {
+    PRIORITY_INTERACTIVE: float(os.environ.get("RPC_MAX_QUEUE_WAIT", "2")),
+    PRIORITY_BACKGROUND: float(os.environ.get("RPC_BACKGROUND_MAX_WAIT", "10")),
+}
+
+ASYNC_POLL_MIN = 0.005  # Seconds between budget checks of a waiting coroutine
+ASYNC_POLL_MAX = 0.05
+
+# Hosts known to throttle hard; RPC_RATE_LIMITS (JSON, same shape) adds or overrides
+ENDPOINT_LIMITS = {
+    "bsc-dataseed.binance.org": {"rps": 8, "max_concurrent": 4},
+    "bsc-dataseed1.defibit.io": {"rps": 8, "max_concurrent": 4},
+    "mainnet.base.org": {"rps": 8, "max_concurrent": 4},
+    "mainnet.optimism.io": {"rps": 8, "max_concurrent": 4},
+}
+
+# Per thread, and per asyncio task (tasks copy the context they are created in)
+_priority = ContextVar("rpc_priority", default=PRIORITY_INTERACTIVE)
+
+
+class RateLimited(Exception):
+    """Request shed: no endpoint of the chain had budget within the allowed wait"""
+
+
+def endpoint_limits():
+    """Per-host limits: ENDPOINT_LIMITS plus the RPC_RATE_LIMITS overrides"""
+    limits = dict(ENDPOINT_LIMITS)
+    raw = os.environ.get("RPC_RATE_LIMITS")
+    if raw:
+        try:
+            limits.update(json.loads(raw))
+        except ValueError as e:
+            logger.warning("Ignoring invalid RPC_RATE_LIMITS: %s", e)
+    return limits
+
+
+@contextmanager
+def rpc_priority(priority):
+    """Run RPC calls made by this thread (or task) at `priority`"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority():
+    return _priority.get()
+
+
+class EndpointBudget:
+    """Token bucket (rps, bursting to one second's worth) plus a concurrency cap"""
+
+    def __init__(self, url, rps=DEFAULT_RPS, max_concurrent=DEFAULT_MAX_CONCURRENT):
+        self.url = url
+        self.rps = rps
+        self.max_concurrent = max_concurrent
+        self.capacity = max(rps, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.active = 0
+        self.admitted = 0
+        self.waited = 0
+        self.wait_seconds = 0.0
+        self.shed = 0
+
+    def try_take(self, now):
+        """0 if admitted; otherwise seconds until a token is due, or None if at the concurrency cap"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rps)
+        self.updated = now
+        if self.active >= self.max_concurrent:
+            return None
+        if self.tokens < 1:
+            return (1 - self.tokens) / self.rps
+        self.tokens -= 1
+        self.active += 1
+        self.admitted += 1
+        return 0
+
+    def snapshot(self):
+        return {
+            "rps": self.rps,
+            "max_concurrent": self.max_concurrent,
+            "active": self.active,
+            "admitted": self.admitted,
+            "waited": self.waited,
+            "wait_seconds": round(self.wait_seconds, 3),
+            "shed": self.shed,
+        }
+
+
+class ChainQueue:
+    """Waiting requests for one chain, served in (priority, arrival) order"""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.waiting = []
+        self.shed = 0
+
+
+class RateScheduler:
+    """Admission control shared by every ChainClient in the process
+
+    acquire() hands out a slot on the first endpoint (in the caller's
+    preferred order) that has both a token and a free concurrency slot.
+    When none does, the caller queues behind higher-priority and earlier
+    waiters for up to its priority's max wait, then gets RateLimited.
+    Every acquire() must be paired with a release() of the returned url.
+
+    Budgets are configured for the whole server: with `workers` processes,
+    each scheduler admits 1/workers of every rate and concurrency limit
+    (at least one request at a time), so together they stay within them.
+    """
+
+    def __init__(self, limits=None, default_rps=DEFAULT_RPS, default_max_concurrent=DEFAULT_MAX_CONCURRENT,
+                 max_queue=MAX_QUEUE, max_wait=None, workers=WORKERS):
+        self.limits = endpoint_limits() if limits is None else limits
+        self.default_rps = default_rps
+        self.default_max_concurrent = default_max_concurrent
+        self.workers = max(workers, 1)
+        self.max_queue = max_queue
+        self.max_wait = dict(MAX_WAIT)
+        self.max_wait.update(max_wait or {})
+        self._budgets = {}
+        self._queues = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def budget(self, url):
+        budget = self._budgets.get(url)
+        if budget is None:
+            with self._lock:
+                budget = self._budgets.get(url)
+                if budget is None:
+                    limit = self.limits.get(urlparse(url).hostname, {})
+                    budget = self._budgets[url] = EndpointBudget(
+                        url, float(limit.get("rps", self.default_rps)) / self.workers,
+                        max(int(limit.get("max_concurrent", self.default_max_concurrent)) // self.workers, 1)
+                    )
+        return budget
+
+    def queue(self, chain_key):
+        queue = self._queues.get(chain_key)
+        if queue is None:
+            with self._lock:
+                queue = self._queues.setdefault(chain_key, ChainQueue())
+        return queue
+
+    def acquire(self, chain_key, urls, priority=None):
+        """Reserve a slot on one of `urls`; returns that url or raises RateLimited"""
+        priority = current_priority() if priority is None else priority
+        budgets = [self.budget(url) for url in urls]
+        queue = self.queue(chain_key)
+        started = time.monotonic()
+        deadline = started + self.max_wait.get(priority, MAX_WAIT[PRIORITY_INTERACTIVE])
+
+        with queue.cond:
+            if not queue.waiting:
+                for budget in budgets:
+                    if budget.try_take(started) == 0:
+                        return budget.url
+            if len(queue.waiting) >= self.max_queue:
+                self._shed(queue, budgets)
+                raise RateLimited(f"{chain_key}: RPC request queue is full")
+
+            ticket = (priority, next(self._seq))
+            heapq.heappush(queue.waiting, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    delays = []
+                    if queue.waiting[0] == ticket:
+                        for budget in budgets:
+                            delay = budget.try_take(now)
+                            if delay == 0:
+                                budget.waited += 1
+                                budget.wait_seconds += now - started
+                                return budget.url
+                            if delay is not None:
+                                delays.append(delay)
+                    if now >= deadline:
+                        self._shed(queue, budgets)
+                        raise RateLimited(f"{chain_key}: RPC rate limit, no endpoint free within {deadline - started:g}s")
+                    queue.cond.wait(min([deadline - now] + delays))
+            finally:
+                queue.waiting.remove(ticket)
+                heapq.heapify(queue.waiting)
+                queue.cond.notify_all()
+
+    def try_acquire(self, chain_key, urls):
+        """Like acquire(), but never waits: returns a url, or None if nothing is free right now"""
+        queue = self.queue(chain_key)
+        with queue.cond:
+            if queue.waiting:
+                return None
+            now = time.monotonic()
+            for url in urls:
+                budget = self.budget(url)
+                if budget.try_take(now) == 0:
+                    return url
+        return None
+
+    async def acquire_async(self, chain_key, urls, priority=None):
+        """acquire() for coroutines: polls the budgets instead of blocking the event loop
+
+        Waiting coroutines are not queued among themselves, and give way to
+        threads already queued in acquire().
+        """
+        priority = current_priority() if priority is None else priority
+        started = time.monotonic()
+        deadline = started + self.max_wait.get(priority, MAX_WAIT[PRIORITY_INTERACTIVE])
+        budgets = [self.budget(url) for url in urls]
+        # About one token interval of the fastest endpoint
+        fastest = max((b.rps for b in budgets), default=0)
+        poll = min(max(1 / fastest if fastest else ASYNC_POLL_MAX, ASYNC_POLL_MIN), ASYNC_POLL_MAX)
+
+        waited = False
+        while True:
+            url = self.try_acquire(chain_key, urls)
+            now = time.monotonic()
+            if url is not None:
+                if waited:
+                    budget = self.budget(url)
+                    budget.waited += 1
+                    budget.wait_seconds += now - started
+                return url
+            if now >= deadline:
+                queue = self.queue(chain_key)
+                with queue.cond:
+                    self._shed(queue, budgets)
+                raise RateLimited(f"{chain_key}: RPC rate limit, no endpoint free within {deadline - started:g}s")
+            await asyncio.sleep(min(poll, deadline - now))
+            waited = True
+
+    def release(self, chain_key, url):
+        queue = self.queue(chain_key)
+        with queue.cond:
+            self.budget(url).active -= 1
+            queue.cond.notify_all()
+
+    def chain_stats(self, chain_key, urls):
+        queue = self.queue(chain_key)
+        return {
+            "queued": len(queue.waiting),
+            "shed": queue.shed,
+            "endpoints": [self.budget(url).snapshot() for url in urls],
+        }
+
+    def _shed(self, queue, budgets):
+        queue.shed += 1
+        if budgets:
+            budgets[0].shed += 1
@@ -0,0 +1,234 @@
+"""
+Sweep receipt tracking
+Follows new blocks per chain and resolves every pending tx hash with one
+batched eth_getTransactionReceipt lookup per block
+"""
+
+import logging
+import os
+import secrets
+import sqlite3
+import tempfile
+import threading
+import time
+
+from rate_limiter import PRIORITY_BACKGROUND, rpc_priority
+from rpc_batch import RpcBatch, RpcError, to_int
+from sqlite_local import LocalSQLite
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.environ.get(
+    "SWEEP_STATUS_PATH", os.path.join(tempfile.gettempdir(), "dustzip_sweep_status.sqlite3")
+)
+STATUS_TTL = float(os.environ.get("SWEEP_STATUS_TTL", "86400"))  # Keep sweep statuses this long
+TRACK_TIMEOUT = float(os.environ.get("SWEEP_TRACK_TIMEOUT", "1800"))  # Give up on unmined txs after this
+MIN_POLL_INTERVAL = 1.0
+RECEIPTS_PER_BATCH = 100
+PURGE_EVERY = 100  # sweeps created between purges
+
+# Per-tx statuses
+TX_PENDING = "pending"
+TX_CONFIRMED = "confirmed"
+TX_FAILED = "failed"      # Mined but reverted
+TX_TIMEOUT = "timeout"    # Not mined within TRACK_TIMEOUT
+FINAL_STATUSES = (TX_CONFIRMED, TX_FAILED, TX_TIMEOUT)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sweep_txs (
+    sweep_id TEXT NOT NULL,
+    chain TEXT NOT NULL,
+    tx_hash TEXT NOT NULL,
+    status TEXT NOT NULL,
+    block_number INTEGER,
+    gas_used INTEGER,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (sweep_id, chain, tx_hash)
+);
+CREATE INDEX IF NOT EXISTS sweep_txs_hash ON sweep_txs (chain, tx_hash);
+CREATE INDEX IF NOT EXISTS sweep_txs_created ON sweep_txs (created);
+"""
+
+
+class SweepStatusStore:
+    """Per-sweep tx statuses, shared across workers"""
+
+    def __init__(self, path=DEFAULT_PATH, ttl=STATUS_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._db = LocalSQLite(path, SCHEMA)
+        self._creates = 0
+
+    def create(self, txs):
+        """Record [{"chain", "tx_hash"}] under a new sweep id"""
+        sweep_id = secrets.token_urlsafe(12)
+        now = time.time()
+        conn = self._db.conn()
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO sweep_txs (sweep_id, chain, tx_hash, status, created, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(sweep_id, tx["chain"], tx["tx_hash"].lower(), TX_PENDING, now, now) for tx in txs]
+            )
+        self._creates += 1
+        if self._creates % PURGE_EVERY == 0:
+            self.purge()
+        return sweep_id
+
+    def update(self, chain_key, tx_hash, status, block_number=None, gas_used=None):
+        """Set the status of a tx in every sweep that contains it"""
+        conn = self._db.conn()
+        with conn:
+            conn.execute(
+                "UPDATE sweep_txs SET status = ?, block_number = ?, gas_used = ?, updated = ? "
+                "WHERE chain = ? AND tx_hash = ?",
+                (status, block_number, gas_used, time.time(), chain_key, tx_hash.lower())
+            )
+
+    def get(self, sweep_id):
+        """{"sweep_id", "done", "transactions": [...]}, or None for unknown ids"""
+        try:
+            rows = self._db.conn().execute(
+                "SELECT chain, tx_hash, status, block_number, gas_used, updated FROM sweep_txs "
+                "WHERE sweep_id = ? ORDER BY chain, tx_hash", (sweep_id,)
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning("Sweep status read failed: %s", e)
+            return None
+        if not rows:
+            return None
+        transactions = [
+            {
+                "chain": chain,
+                "tx_hash": tx_hash,
+                "status": status,
+                "block_number": block_number,
+                "gas_used": gas_used,
+                "updated": updated
+            }
+            for chain, tx_hash, status, block_number, gas_used, updated in rows
+        ]
+        return {
+            "sweep_id": sweep_id,
+            "done": all(tx["status"] in FINAL_STATUSES for tx in transactions),
+            "transactions": transactions
+        }
+
+    def purge(self):
+        conn = self._db.conn()
+        with conn:
+            conn.execute("DELETE FROM sweep_txs WHERE created <= ?", (time.time() - self.ttl,))
+
+
+class ReceiptTracker:
+    """Resolves submitted tx hashes into receipts, one batch per chain per block
+
+    Each chain with pending hashes gets a daemon thread that polls once per
+    block time. A poll reads eth_blockNumber and looks up, in one batch, the
+    receipts of the pending hashes not yet checked at that head: nothing
+    while the head stands still, so a tx costs one lookup per new block no
+    matter how many clients are watching its sweep.
+    """
+
+    def __init__(self, registry, store):
+        self.registry = registry
+        self.store = store
+        self.lookups = 0
+        self._pending = {}  # chain_key -> {tx_hash: first_seen}
+        self._last_block = {}
+        self._checked = {}  # chain_key -> {tx_hash: head its receipt was last looked up at}
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    def track(self, txs):
+        """Start tracking [{"chain", "tx_hash"}]; returns the sweep id"""
+        sweep_id = self.store.create(txs)
+        now = time.time()
+        with self._lock:
+            for tx in txs:
+                self._pending.setdefault(tx["chain"], {}).setdefault(tx["tx_hash"].lower(), now)
+            for chain_key in {tx["chain"] for tx in txs}:
+                self._ensure_tracking(chain_key)
+        return sweep_id
+
+    def status(self, sweep_id):
+        return self.store.get(sweep_id)
+
+    def stats(self):
+        return {
+            "pending": {chain_key: len(hashes) for chain_key, hashes in self._pending.items() if hashes},
+            "last_block": dict(self._last_block),
+            "lookups": self.lookups
+        }
+
+    def poll(self, chain_key):
+        """One batched receipt lookup for the pending hashes not yet checked at the chain's head"""
+        if not self._pending.get(chain_key):
+            return
+        client = self.registry.get(chain_key)
+        response = client.request("eth_blockNumber", [])
+        if "error" in response:
+            raise RpcError("eth_blockNumber", response["error"])
+        head = to_int(response["result"])
+        self._last_block[chain_key] = head
+
+        checked = self._checked.setdefault(chain_key, {})
+        hashes = [tx_hash for tx_hash in list(self._pending[chain_key]) if checked.get(tx_hash) != head]
+        for start in range(0, len(hashes), RECEIPTS_PER_BATCH):
+            chunk = hashes[start:start + RECEIPTS_PER_BATCH]
+            batch = RpcBatch(client)
+            for tx_hash in chunk:
+                batch.add("eth_getTransactionReceipt", [tx_hash])
+            receipts = batch.execute()
+            self.lookups += len(chunk)
+            for tx_hash, receipt in zip(chunk, receipts):
+                if not isinstance(receipt, RpcError):
+                    checked[tx_hash] = head
+                self._resolve(chain_key, tx_hash, receipt)
+
+    def _resolve(self, chain_key, tx_hash, receipt):
+        if isinstance(receipt, RpcError):
+            logger.debug("Receipt lookup failed on %s for %s: %s", chain_key, tx_hash, receipt)
+            return
+        pending = self._pending[chain_key]
+        if receipt is None:
+            if time.time() - pending.get(tx_hash, time.time()) > TRACK_TIMEOUT:
+                self.store.update(chain_key, tx_hash, TX_TIMEOUT)
+                self._forget(chain_key, tx_hash)
+            return
+        status = TX_CONFIRMED if to_int(receipt.get("status", "0x1")) == 1 else TX_FAILED
+        self.store.update(
+            chain_key, tx_hash, status,
+            to_int(receipt["blockNumber"]), to_int(receipt.get("gasUsed", "0x0"))
+        )
+        self._forget(chain_key, tx_hash)
+
+    def _forget(self, chain_key, tx_hash):
+        self._pending[chain_key].pop(tx_hash, None)
+        self._checked.get(chain_key, {}).pop(tx_hash, None)
+
+    def _ensure_tracking(self, chain_key):
+        # Called with self._lock held
+        thread = self._threads.get(chain_key)
+        if thread is None or not thread.is_alive():
+            thread = threading.Thread(
+                target=self._follow, args=(chain_key,), name=f"receipts-{chain_key}", daemon=True
+            )
+            self._threads[chain_key] = thread
+            thread.start()
+
+    def _follow(self, chain_key):
+        interval = max(self.registry.chains[chain_key].get("block_time", 2), MIN_POLL_INTERVAL)
+        while True:
+            time.sleep(interval)
+            try:
+                with rpc_priority(PRIORITY_BACKGROUND):
+                    self.poll(chain_key)
+            except Exception as e:
+                logger.debug("Receipt poll failed for %s: %s", chain_key, e)
+            with self._lock:
+                if not self._pending.get(chain_key):
+                    # Exit under the lock so track() restarts us if hashes arrive
+                    self._threads.pop(chain_key, None)
+                    return
@@ -0,0 +1,414 @@
+"""
+Sponsor relayer
+Spreads sponsored transactions over a pool of sponsor wallets per chain,
+each with its own nonce lane, queue and in-flight window
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from eth_account import Account
+
+from nonce_manager import STATE_PATH, NonceManager, sign_and_send
+from rate_limiter import PRIORITY_BACKGROUND, rpc_priority
+from rpc_batch import read_account_state
+from sqlite_local import LocalSQLite
+
+logger = logging.getLogger(__name__)
+
+MAX_IN_FLIGHT = int(os.environ.get("RELAYER_MAX_IN_FLIGHT", "16"))  # Unmined txs per sponsor (mempool slot limit)
+MAX_BATCH = 32              # Txs signed and broadcast per lane round
+POLL_INTERVAL = 1.0         # Minimum seconds between in-flight checks
+DROP_AFTER = int(os.environ.get("RELAYER_DROP_AFTER", "3"))  # Consecutive checks a tx must be missing to count as dropped
+IDLE_TIMEOUT = 60           # Lane workers stop after this long with nothing to do
+LANE_MIN_GAS = int(os.environ.get("RELAYER_LANE_MIN_GAS", "2000000"))  # Top up a lane below this much gas
+TOPUP_COOLDOWN = 60         # Seconds between top-ups of the same lane
+TRANSFER_GAS = 21000
+LANE_STALE = 30             # Seconds after which another worker's unpublished lane load is ignored
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lanes (
+    instance INTEGER NOT NULL,
+    chain TEXT NOT NULL,
+    sponsor TEXT NOT NULL,
+    queued INTEGER NOT NULL,
+    in_flight INTEGER NOT NULL,
+    sent INTEGER NOT NULL,
+    failed INTEGER NOT NULL,
+    dropped INTEGER NOT NULL,
+    balance_wei TEXT,
+    topped_up REAL NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (instance, chain, sponsor)
+);
+"""
+
+
+def sponsor_keys():
+    """Sponsor keys from SPONSOR_PRIVATE_KEYS (comma separated) and SPONSOR_PRIVATE_KEY"""
+    raw = [os.environ.get("SPONSOR_PRIVATE_KEYS", ""), os.environ.get("SPONSOR_PRIVATE_KEY", "")]
+    keys = []
+    for key in ",".join(raw).split(","):
+        key = key.strip()
+        if not key or key in keys:
+            continue
+        try:
+            Account.from_key(key)
+        except Exception:
+            logger.warning("Ignoring invalid sponsor key")
+            continue
+        keys.append(key)
+    return keys
+
+
+class SponsorLane:
+    """One sponsor wallet on one chain"""
+
+    def __init__(self, chain_key, account):
+        self.chain_key = chain_key
+        self.account = account
+        self.address = account.address
+        self.queue = deque()    # (txs, future)
+        self.in_flight = {}     # nonce -> tx hash, broadcast but not yet mined
+        self.missing = {}       # nonce -> consecutive checks it was absent from the pending pool
+        self.sending = 0        # Txs taken off the queue and being signed/broadcast
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.balance_wei = None
+        self.last_checked = 0.0
+        self.topped_up = 0.0
+        self.wakeup = threading.Event()
+        self.thread = None
+
+    @property
+    def queued(self):
+        """Txs not broadcast yet, including the round being sent"""
+        return sum(len(txs) for txs, _ in self.queue) + self.sending
+
+    @property
+    def load(self):
+        return self.queued + len(self.in_flight)
+
+    def snapshot(self):
+        return {
+            "sponsor": self.address,
+            "queued": self.queued,
+            "in_flight": len(self.in_flight),
+            "sent": self.sent,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "balance_wei": self.balance_wei,
+        }
+
+
+class LaneBoard:
+    """Sponsor lane state published by every worker to a shared SQLite file
+
+    Workers that share sponsor keys use it to pick the least-loaded lane,
+    keep the in-flight window, space out top-ups across processes and
+    report whole-server queue depth. Each worker writes its own rows (keyed
+    by pid) and reads the others'.
+    """
+
+    def __init__(self, path=STATE_PATH, stale=LANE_STALE):
+        self.path = path
+        self.stale = stale
+        self._db = LocalSQLite(path, SCHEMA)
+
+    def publish(self, lane):
+        try:
+            conn = self._db.conn()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO lanes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (os.getpid(), lane.chain_key, lane.address, lane.queued, len(lane.in_flight),
+                     lane.sent, lane.failed, lane.dropped,
+                     None if lane.balance_wei is None else str(lane.balance_wei), lane.topped_up, time.time())
+                )
+        except sqlite3.Error as e:
+            logger.debug("Lane publish failed on %s for %s: %s", lane.chain_key, lane.address, e)
+
+    def others(self, chain_key):
+        """{sponsor: (queued, in_flight, topped_up)} summed over the other workers' live lanes"""
+        try:
+            rows = self._db.conn().execute(
+                "SELECT sponsor, SUM(queued), SUM(in_flight), MAX(topped_up) FROM lanes "
+                "WHERE chain = ? AND instance != ? AND updated > ? GROUP BY sponsor",
+                (chain_key, os.getpid(), time.time() - self.stale)
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.debug("Lane read failed on %s: %s", chain_key, e)
+            return {}
+        return {sponsor: (queued, in_flight, topped_up) for sponsor, queued, in_flight, topped_up in rows}
+
+    def snapshots(self):
+        """{chain_key: [lane snapshot]} added up over every worker"""
+        rows = self._db.conn().execute(
+            "SELECT chain, sponsor, SUM(CASE WHEN updated > ? THEN queued ELSE 0 END), "
+            "SUM(CASE WHEN updated > ? THEN in_flight ELSE 0 END), SUM(sent), SUM(failed), SUM(dropped), "
+            "(SELECT balance_wei FROM lanes AS latest WHERE latest.chain = lanes.chain "
+            "AND latest.sponsor = lanes.sponsor ORDER BY updated DESC LIMIT 1) "
+            "FROM lanes GROUP BY chain, sponsor ORDER BY chain, sponsor",
+            (time.time() - self.stale,) * 2
+        ).fetchall()
+        chains = {}
+        for chain_key, sponsor, queued, in_flight, sent, failed, dropped, balance_wei in rows:
+            chains.setdefault(chain_key, []).append({
+                "sponsor": sponsor,
+                "queued": queued,
+                "in_flight": in_flight,
+                "sent": sent,
+                "failed": failed,
+                "dropped": dropped,
+                "balance_wei": None if balance_wei is None else int(balance_wei),
+            })
+        return chains
+
+
+class Relayer:
+    """Sponsored transaction relayer over N sponsor wallets per chain
+
+    submit() puts a job on the least-loaded lane of the chain and returns a
+    Future for its per-tx results (see nonce_manager.sign_and_send). Each
+    lane has a worker thread that signs and broadcasts queued txs back to
+    back, keeping at most `max_in_flight` unmined txs, so throughput grows
+    with the number of sponsor wallets. Lanes running low on gas are topped
+    up from the richest lane on the same chain.
+
+    When several worker processes relay with the same keys, give them a
+    SharedNonceManager and a LaneBoard: nonces then come from one shared
+    sequence, and lane choice, the in-flight window, top-up cooldowns and
+    status() count every worker's lanes.
+    """
+
+    def __init__(self, registry, private_keys, fee_oracle, nonce_manager=None, board=None,
+                 max_in_flight=MAX_IN_FLIGHT, max_batch=MAX_BATCH, lane_min_gas=LANE_MIN_GAS):
+        if not private_keys:
+            raise ValueError("Relayer needs at least one sponsor key")
+        self.registry = registry
+        self.accounts = [Account.from_key(key) for key in private_keys]
+        self.fee_oracle = fee_oracle
+        self.nonce_manager = nonce_manager or NonceManager()
+        self.board = board
+        self.max_in_flight = max_in_flight
+        self.max_batch = max_batch
+        self.lane_min_gas = lane_min_gas
+        self._lanes = {}
+        self._lock = threading.Lock()
+
+    @property
+    def sponsors(self):
+        return [account.address for account in self.accounts]
+
+    def lanes(self, chain_key):
+        lanes = self._lanes.get(chain_key)
+        if lanes is None:
+            with self._lock:
+                lanes = self._lanes.setdefault(
+                    chain_key, [SponsorLane(chain_key, account) for account in self.accounts]
+                )
+        return lanes
+
+    def submit(self, chain_key, txs):
+        """Queue txs (dicts with at least "to" and "gas") to be sent by one sponsor"""
+        future = Future()
+        lanes = self.lanes(chain_key)
+        funded = [lane for lane in lanes if not self._is_low(lane)] or lanes
+        others = self._others(chain_key)
+        with self._lock:
+            lane = min(funded, key=lambda lane: lane.load + sum(others.get(lane.address, (0, 0))[:2]))
+            lane.queue.append((list(txs), future))
+            self._ensure_worker(lane)
+        self._publish(lane)
+        lane.wakeup.set()
+        return future
+
+    def status(self):
+        """Per-chain lane stats and queue depth (of every worker, with a LaneBoard)"""
+        chains = {}
+        if self.board is not None:
+            lanes_by_chain = self.board.snapshots()
+        else:
+            with self._lock:
+                lanes_by_chain = {
+                    chain_key: [lane.snapshot() for lane in lanes] for chain_key, lanes in self._lanes.items()
+                }
+        for chain_key, snapshots in lanes_by_chain.items():
+            chains[chain_key] = {
+                "queue_depth": sum(s["queued"] for s in snapshots),
+                "in_flight": sum(s["in_flight"] for s in snapshots),
+                "lanes": snapshots,
+            }
+        return {"sponsors": self.sponsors, "chains": chains}
+
+    def _others(self, chain_key):
+        return self.board.others(chain_key) if self.board is not None else {}
+
+    def _publish(self, lane):
+        if self.board is not None:
+            self.board.publish(lane)
+
+    def _min_balance(self, chain_key):
+        return self.fee_oracle.quote(chain_key)["max_fee"] * self.lane_min_gas
+
+    def _is_low(self, lane):
+        if lane.balance_wei is None:
+            return False
+        try:
+            return lane.balance_wei < self._min_balance(lane.chain_key)
+        except Exception:
+            return False
+
+    def _ensure_worker(self, lane):
+        # Called with self._lock held
+        if lane.thread is None or not lane.thread.is_alive():
+            lane.thread = threading.Thread(
+                target=self._work, args=(lane,),
+                name=f"relayer-{lane.chain_key}-{lane.address[:8]}", daemon=True
+            )
+            lane.thread.start()
+
+    def _work(self, lane):
+        idle_since = time.time()
+        while True:
+            if lane.in_flight or lane.balance_wei is None:
+                self._check(lane)
+
+            jobs = self._take(lane)
+            if jobs:
+                self._send(lane, jobs)
+                idle_since = time.time()
+                continue
+
+            lane.wakeup.wait(POLL_INTERVAL)
+            lane.wakeup.clear()
+            with self._lock:
+                if not lane.queue and not lane.in_flight and time.time() - idle_since > IDLE_TIMEOUT:
+                    lane.thread = None
+                    return
+
+    def _take(self, lane):
+        """Pop the queued jobs that fit this round and the sponsor's in-flight window"""
+        elsewhere = self._others(lane.chain_key).get(lane.address, (0, 0))[1]
+        room = min(self.max_batch, self.max_in_flight - len(lane.in_flight) - elsewhere)
+        jobs = []
+        with self._lock:
+            while lane.queue:
+                txs, future = lane.queue[0]
+                # A job larger than the window still goes out, alone, once the lane is clear
+                if len(txs) > room and (jobs or lane.in_flight or elsewhere):
+                    break
+                lane.queue.popleft()
+                if future.set_running_or_notify_cancel():
+                    jobs.append((txs, future))
+                    room -= len(txs)
+                    lane.sending += len(txs)
+        return jobs
+
+    def _send(self, lane, jobs):
+        client = self.registry.get(lane.chain_key)
+        try:
+            txs = [self._fill(lane.chain_key, tx) for txs, _ in jobs for tx in txs]
+            results = sign_and_send(self.nonce_manager, client, lane.account, txs)
+        except Exception as e:
+            logger.warning("Relayer send failed on %s for %s: %s", lane.chain_key, lane.address, e)
+            lane.sending = 0
+            for txs, future in jobs:
+                lane.failed += len(txs)
+                future.set_exception(e)
+            self._publish(lane)
+            return
+
+        for result in results:
+            result["sponsor"] = lane.address
+            if result["status"] == "sent":
+                lane.in_flight[result["nonce"]] = result["tx_hash"]
+                lane.sent += 1
+            else:
+                lane.failed += 1
+        lane.sending = 0
+
+        offset = 0
+        for txs, future in jobs:
+            future.set_result(results[offset:offset + len(txs)])
+            offset += len(txs)
+        self._publish(lane)
+
+    def _fill(self, chain_key, tx):
+        """Chain id and EIP-1559 fees for txs that do not set their own"""
+        tx = dict(tx)
+        tx.setdefault("chainId", self.registry.chains[chain_key]["chain_id"])
+        if "gasPrice" not in tx and "maxFeePerGas" not in tx:
+            fees = self.fee_oracle.quote(chain_key)
+            tx["maxFeePerGas"] = fees["max_fee"]
+            tx["maxPriorityFeePerGas"] = fees["priority_fee"]
+        return tx
+
+    def _check(self, lane):
+        """Clear mined txs, spot dropped ones and refresh the lane's balance"""
+        if time.time() - lane.last_checked < POLL_INTERVAL:
+            return
+        lane.last_checked = time.time()
+        client = self.registry.get(lane.chain_key)
+        try:
+            with rpc_priority(PRIORITY_BACKGROUND):
+                state = read_account_state(client, lane.address, fields=("balance", "mined_nonce", "nonce"))
+        except Exception as e:
+            logger.debug("Relayer lane check failed on %s for %s: %s", lane.chain_key, lane.address, e)
+            return
+
+        lane.balance_wei = state["balance"]
+        for nonce in [n for n in lane.in_flight if n < state["mined_nonce"]]:
+            del lane.in_flight[nonce]
+
+        # Sent but no longer pending: dropped or replaced, so the local sequence is off.
+        # Each check may hit a different endpoint, and one that lags behind (or never
+        # saw the tx) reports it missing too, so only resync once it stays missing
+        lane.missing = {
+            n: lane.missing.get(n, 0) + 1 for n in lane.in_flight if n >= state["nonce"]
+        }
+        dropped = [n for n, checks in lane.missing.items() if checks >= DROP_AFTER]
+        if dropped:
+            logger.info("%d txs dropped on %s for %s, resyncing nonce", len(dropped), lane.chain_key, lane.address)
+            for nonce in dropped:
+                del lane.in_flight[nonce]
+                del lane.missing[nonce]
+            lane.dropped += len(dropped)
+            self.nonce_manager.invalidate(lane.chain_key, lane.address)
+
+        self._top_up(lane)
+        self._publish(lane)
+
+    def _top_up(self, lane):
+        """Fund this lane from the richest lane on the chain if it runs low on gas"""
+        if not self._is_low(lane):
+            return
+        # Another worker may have just topped up the same sponsor
+        topped_up = max(lane.topped_up, self._others(lane.chain_key).get(lane.address, (0, 0, 0))[2] or 0)
+        if time.time() - topped_up < TOPUP_COOLDOWN:
+            return
+        min_balance = self._min_balance(lane.chain_key)
+        donors = [
+            other for other in self.lanes(lane.chain_key)
+            if other is not lane and other.balance_wei is not None
+        ]
+        if not donors:
+            return
+        donor = max(donors, key=lambda other: other.balance_wei)
+        amount = 2 * min_balance - lane.balance_wei
+        if donor.balance_wei - amount < 2 * min_balance:
+            logger.warning("Sponsor lanes on %s are running low on gas", lane.chain_key)
+            return
+
+        lane.topped_up = time.time()
+        logger.info("Topping up %s on %s from %s", lane.address, lane.chain_key, donor.address)
+        with self._lock:
+            donor.queue.appendleft(([{"to": lane.address, "value": amount, "gas": TRANSFER_GAS}], Future()))
+            self._ensure_worker(donor)
+        donor.wakeup.set()
@@ -0,0 +1,109 @@
+"""
+JSON-RPC batching
+Collects the reads for one chain and sends them in a single batch POST
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RpcError(Exception):
+    """Error object returned by the node for one call"""
+
+    def __init__(self, method, error):
+        self.method = method
+        self.error = error or {}
+        super().__init__(f"{method}: {self.error.get('message', self.error)}")
+
+
+class RpcBatch:
+    """Queue of JSON-RPC calls for one ChainClient, sent as one POST"""
+
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def add(self, method, params=None):
+        """Queue a call and return its index in the results"""
+        self.calls.append((method, params or []))
+        return len(self.calls) - 1
+
+    def execute(self):
+        """Send the batch; failed calls come back as RpcError instances"""
+        if not self.calls:
+            return []
+
+        payload = []
+        for method, params in self.calls:
+            payload.append({
+                "jsonrpc": "2.0",
+                "method": method,
+                "params": params,
+                "id": self.client.next_id()
+            })
+
+        response = self.client.post(payload)
+        if not isinstance(response, list):
+            # Endpoint does not accept batches - fall back to single calls
+            logger.debug("Batch rejected by %s, sending calls one by one", self.client.chain_key)
+            replies = [self.client.request(method, params) for method, params in self.calls]
+        else:
+            by_id = {reply.get("id"): reply for reply in response}
+            replies = [by_id.get(call["id"], {}) for call in payload]
+
+        results = []
+        for (method, _), reply in zip(self.calls, replies):
+            if "result" in reply:
+                results.append(reply["result"])
+            else:
+                results.append(RpcError(method, reply.get("error")))
+        return results
+
+
+def run_batch(client, calls):
+    """Send [(method, params)] as one batch; sync counterpart of AsyncChainClient.batch()"""
+    batch = RpcBatch(client)
+    for method, params in calls:
+        batch.add(method, params)
+    return batch.execute()
+
+
+def to_int(value):
+    """Decode a hex quantity"""
+    if isinstance(value, int):
+        return value
+    return int(value, 16)
+
+
+# Per-account reads that can share one batch
+ACCOUNT_READS = {
+    "balance": lambda address: ("eth_getBalance", [address, "latest"]),
+    "gas_price": lambda address: ("eth_gasPrice", []),
+    "nonce": lambda address: ("eth_getTransactionCount", [address, "pending"]),
+    "mined_nonce": lambda address: ("eth_getTransactionCount", [address, "latest"]),
+    "code": lambda address: ("eth_getCode", [address, "latest"]),
+    "block_number": lambda address: ("eth_blockNumber", []),
+    "fee_history": lambda address: ("eth_feeHistory", [hex(5), "latest", [50]]),
+}
+
+QUANTITY_FIELDS = ("balance", "gas_price", "nonce", "mined_nonce", "block_number")
+
+
+def read_account_state(client, address, fields=("balance", "gas_price")):
+    """Read several account/chain values in one round trip
+
+    Returns a dict keyed by field name. Quantities are decoded to int;
+    any call that failed raises its RpcError.
+    """
+    batch = RpcBatch(client)
+    for field in fields:
+        method, params = ACCOUNT_READS[field](address)
+        batch.add(method, params)
+
+    state = {}
+    for field, value in zip(fields, batch.execute()):
+        if isinstance(value, RpcError):
+            raise value
+        state[field] = to_int(value) if field in QUANTITY_FIELDS else value
+    return state
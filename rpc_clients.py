@@ -0,0 +1,345 @@
+"""
+Pooled per-chain RPC clients
+One keep-alive HTTP session per chain, shared by every request thread
+"""
+
+import itertools
+import logging
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import Web3
+from web3._utils.encoding import FriendlyJsonSerde, Web3JsonEncoder
+from web3.providers.base import JSONBaseProvider
+
+from metrics import registry as metrics
+from rate_limiter import PRIORITY_BACKGROUND, RateLimited, RateScheduler, rpc_priority
+from rpc_router import EndpointRouter, chain_endpoints, is_read_only
+from singleflight import SingleFlight
+from tracing import bind, span
+
+logger = logging.getLogger(__name__)
+
+# Connection pool settings
+POOL_MAXSIZE = 16
+HEALTH_INTERVAL = 30
+
+RPC_DURATION = metrics.histogram("dustzip_rpc_request_duration_seconds", "Upstream JSON-RPC POST latency")
+RPC_REQUESTS = metrics.counter("dustzip_rpc_requests_total", "Upstream JSON-RPC POSTs by outcome (ok, error, timeout)")
+RPC_CALLS = metrics.counter("dustzip_rpc_calls_total", "JSON-RPC calls sent upstream, each call in a batch counted")
+RPC_HEDGES = metrics.counter("dustzip_rpc_hedges_total", "Reads re-sent to a second endpoint after a slow first reply")
+RPC_FAILOVERS = metrics.counter("dustzip_rpc_failovers_total", "Requests retried on another endpoint after an error")
+RPC_COALESCED = metrics.counter("dustzip_rpc_coalesced_total", "Reads answered by an identical request already in flight")
+RPC_EJECTED = metrics.gauge("dustzip_rpc_endpoint_ejected", "1 while an endpoint is ejected for repeated failures")
+RPC_QUEUED = metrics.gauge("dustzip_rpc_admission_queued", "Requests waiting for endpoint rate budget")
+RPC_QUEUE_WAIT = metrics.counter("dustzip_rpc_admission_wait_seconds_total", "Time requests spent waiting for rate budget")
+RPC_SHED = metrics.counter("dustzip_rpc_admission_shed_total", "Requests shed by admission control")
+
+
+class ChainUnavailable(ConnectionError):
+    """No healthy RPC endpoint for the chain"""
+
+
+def coalesce_key(payload):
+    """Identity of a JSON-RPC payload with the request ids left out, plus those ids"""
+    calls = payload if isinstance(payload, list) else [payload]
+    key = FriendlyJsonSerde().json_encode(
+        [[call.get("method"), call.get("params")] for call in calls], Web3JsonEncoder
+    )
+    return key, [call.get("id") for call in calls]
+
+
+def coalesce_label(payload):
+    return "batch" if isinstance(payload, list) else payload.get("method")
+
+
+def endpoint_label(url):
+    """Host (and port), so API keys in URL paths never end up in metrics"""
+    parsed = urlparse(url)
+    if not parsed.hostname:
+        return url
+    return f"{parsed.hostname}:{parsed.port}" if parsed.port else parsed.hostname
+
+
+def reply_with_ids(response, leader_ids, ids):
+    """Another caller's reply, with its request ids swapped for ours"""
+    if isinstance(response, list):
+        mapping = dict(zip(leader_ids, ids))
+        return [dict(reply, id=mapping.get(reply.get("id"), reply.get("id"))) for reply in response]
+    if isinstance(response, dict):
+        return dict(response, id=ids[0])
+    return response
+
+
+def client_status(clients, scheduler):
+    """{chain_key: endpoint ranking, read coalescing and admission stats}"""
+    return {
+        client.chain_key: dict(
+            client.router.snapshot(),
+            coalescing=client.flights.stats(),
+            admission=scheduler.chain_stats(client.chain_key, [e.url for e in client.router.endpoints])
+        )
+        for client in clients
+    }
+
+
+def client_metric_samples(clients, scheduler):
+    """[(metric, labels, value)] from the routers, coalescers and scheduler of `clients`"""
+    samples = Counter()
+    for client in clients:
+        chain = (("chain", client.chain_key),)
+        samples[RPC_HEDGES, chain] += client.router.hedges
+        samples[RPC_FAILOVERS, chain] += client.router.failovers
+        samples[RPC_COALESCED, chain] += sum(s["coalesced"] for s in client.flights.stats().values())
+        admission = scheduler.chain_stats(client.chain_key, [e.url for e in client.router.endpoints])
+        samples[RPC_QUEUED, chain] += admission["queued"]
+        for endpoint, budget in zip(client.router.endpoints, admission["endpoints"]):
+            # Endpoints differing only in their path (API keys) share a label
+            labels = chain + (("endpoint", endpoint_label(endpoint.url)),)
+            samples[RPC_EJECTED, labels] += 0 if endpoint.available() else 1
+            samples[RPC_QUEUE_WAIT, labels] += budget["wait_seconds"]
+            samples[RPC_SHED, labels] += budget["shed"]
+    return [(name, dict(labels), value) for (name, labels), value in samples.items()]
+
+
+class ChainClient:
+    """Keep-alive JSON-RPC client for a single chain
+
+    Requests go to the best-ranked endpoint, fail over to the next one on
+    errors, and reads that outlive the endpoint's p95 latency are hedged
+    with a second request to the runner-up. Identical reads already in
+    flight from other threads are not resent: callers share the one
+    upstream reply (see singleflight.py). With a scheduler, every request
+    first takes a slot from its endpoint's rate budget (see rate_limiter.py).
+    """
+
+    def __init__(self, chain_key, config, timeout=10, hedge=True, coalesce=True, scheduler=None):
+        self.chain_key = chain_key
+        self.config = config
+        self.timeout = timeout
+        self.hedge = hedge
+        self.coalesce = coalesce
+        self.scheduler = scheduler
+        self.flights = SingleFlight()
+        self.router = EndpointRouter(chain_endpoints(config))
+        self.healthy = True
+        self.last_checked = 0.0
+        self._ids = itertools.count(1)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+        self._hedge_pool = ThreadPoolExecutor(max_workers=POOL_MAXSIZE, thread_name_prefix=f"hedge-{chain_key}")
+
+        self.w3 = Web3(ChainProvider(self))
+
+    def next_id(self):
+        return next(self._ids)
+
+    @property
+    def endpoint(self):
+        """URL of the currently preferred endpoint"""
+        return self.router.ranked()[0].url
+
+    def post(self, payload):
+        """POST a JSON-RPC payload (single call or batch) and decode the reply"""
+        read_only = is_read_only(payload)
+        if not (self.coalesce and read_only):
+            return self._post(payload, read_only)
+
+        key, ids = coalesce_key(payload)
+        (response, leader_ids), shared = self.flights.do(
+            key, lambda: (self._post(payload, read_only), ids), coalesce_label(payload)
+        )
+        return reply_with_ids(response, leader_ids, ids) if shared else response
+
+    def _post(self, payload, read_only):
+        body = FriendlyJsonSerde().json_encode(payload, Web3JsonEncoder)
+        label = coalesce_label(payload)
+        calls = payload if isinstance(payload, list) else [payload]
+        for method, count in Counter(call.get("method") for call in calls).items():
+            metrics.inc(RPC_CALLS, {"chain": self.chain_key, "method": method}, count)
+        candidates = self.router.ranked()
+        hedge = self.hedge and read_only
+        last_error = None
+        tried = []
+
+        while candidates:
+            endpoint = self._admit(candidates)
+            tried.append(endpoint)
+            others = [c for c in candidates if c is not endpoint]
+            try:
+                if hedge and others:
+                    result = self._send_hedged(endpoint, others, body, label, tried)
+                else:
+                    result = self._send(endpoint, body, label)
+            except (requests.RequestException, ValueError) as e:
+                last_error = e
+                candidates = [c for c in candidates if c not in tried]
+                if candidates:
+                    self.router.failovers += 1
+                continue
+            self.healthy = True
+            return result
+
+        self.healthy = False
+        raise last_error
+
+    def _admit(self, candidates):
+        """First candidate with rate budget (waits, or raises RateLimited); the best one without a scheduler"""
+        if self.scheduler is None:
+            return candidates[0]
+        with span("rpc_queue", chain=self.chain_key):
+            url = self.scheduler.acquire(self.chain_key, [c.url for c in candidates])
+        return next(c for c in candidates if c.url == url)
+
+    def _send(self, endpoint, body, label):
+        """POST to an endpoint admitted by _admit(); gives its slot back when done"""
+        started = time.monotonic()
+        outcome = "ok"
+        try:
+            with span("rpc", chain=self.chain_key, method=label, endpoint=endpoint_label(endpoint.url)):
+                response = self.session.post(endpoint.url, data=body, timeout=self.timeout)
+            response.raise_for_status()
+            result = response.json()
+        except (requests.RequestException, ValueError) as e:
+            outcome = "timeout" if isinstance(e, requests.Timeout) else "error"
+            endpoint.record(time.monotonic() - started, ok=False)
+            raise
+        finally:
+            elapsed = time.monotonic() - started
+            if self.scheduler is not None:
+                self.scheduler.release(self.chain_key, endpoint.url)
+            labels = {"chain": self.chain_key, "endpoint": endpoint_label(endpoint.url), "method": label}
+            metrics.observe(RPC_DURATION, elapsed, labels)
+            metrics.inc(RPC_REQUESTS, dict(labels, outcome=outcome))
+        endpoint.record(elapsed, ok=True)
+        return result
+
+    def _send_hedged(self, primary, others, body, label, tried):
+        # A primary that fails fast raises straight to post(), which fails over
+        first = self._hedge_pool.submit(bind(self._send), primary, body, label)
+        try:
+            return first.result(timeout=primary.hedge_delay(self.timeout))
+        except TimeoutError:
+            pass
+
+        # Primary is slower than its p95: race the runner-up, if one has budget to spare
+        if self.scheduler is None:
+            secondary = others[0]
+        else:
+            url = self.scheduler.try_acquire(self.chain_key, [c.url for c in others])
+            secondary = next((c for c in others if c.url == url), None)
+        if secondary is None:
+            return first.result()
+        tried.append(secondary)
+        self.router.hedges += 1
+        second = self._hedge_pool.submit(bind(self._send), secondary, body, label)
+        last_error = None
+        for future in as_completed([first, second]):
+            try:
+                return future.result()
+            except (requests.RequestException, ValueError) as e:
+                last_error = e
+        raise last_error
+
+    def request(self, method, params):
+        """Send a single JSON-RPC call"""
+        return self.post({
+            "jsonrpc": "2.0",
+            "method": method,
+            "params": params or [],
+            "id": self.next_id()
+        })
+
+    def check_health(self):
+        """Probe the endpoint with eth_blockNumber"""
+        try:
+            response = self.request("eth_blockNumber", [])
+            self.healthy = "result" in response
+        except RateLimited:
+            pass  # Busy is not down
+        except Exception as e:
+            logger.debug("Health check failed for %s: %s", self.chain_key, e)
+            self.healthy = False
+        self.last_checked = time.time()
+        return self.healthy
+
+
+class ChainProvider(JSONBaseProvider):
+    """Web3 provider that sends everything through a shared ChainClient"""
+
+    def __init__(self, client):
+        self.client = client
+        super().__init__()
+
+    def make_request(self, method, params):
+        return self.client.request(method, params)
+
+    def is_connected(self, show_traceback=False):
+        return self.client.healthy
+
+
+class ClientRegistry:
+    """Process-wide registry of lazily created chain clients"""
+
+    def __init__(self, chains, timeout=10, health_interval=HEALTH_INTERVAL, scheduler=None):
+        self.chains = chains
+        self.timeout = timeout
+        self.health_interval = health_interval
+        self.scheduler = scheduler or RateScheduler()
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._health_thread = None
+
+    def get(self, chain_key):
+        """Get (or create) the client for a chain"""
+        client = self._clients.get(chain_key)
+        if client is not None:
+            return client
+
+        with self._lock:
+            client = self._clients.get(chain_key)
+            if client is None:
+                client = ChainClient(chain_key, self.chains[chain_key], self.timeout, scheduler=self.scheduler)
+                self._clients[chain_key] = client
+            self._start_health_thread()
+        return client
+
+    def web3(self, chain_key):
+        """Get Web3 for chain, or None if the last health check failed"""
+        client = self.get(chain_key)
+        return client.w3 if client.healthy else None
+
+    def clients(self):
+        return list(self._clients.values())
+
+    def status(self):
+        """Per-chain endpoint ranking, read coalescing and admission stats"""
+        return client_status(self.clients(), self.scheduler)
+
+    def metric_samples(self):
+        """Counters kept by the routers, coalescers and scheduler, for metrics.collector()"""
+        return client_metric_samples(self.clients(), self.scheduler)
+
+    def _start_health_thread(self):
+        # Called with self._lock held; the thread starts after fork, on first use
+        if self._health_thread is None or not self._health_thread.is_alive():
+            self._health_thread = threading.Thread(
+                target=self._health_loop, name="rpc-health", daemon=True
+            )
+            self._health_thread.start()
+
+    def _health_loop(self):
+        with rpc_priority(PRIORITY_BACKGROUND):
+            while True:
+                time.sleep(self.health_interval)
+                for client in self.clients():
+                    client.check_health()
@@ -0,0 +1,119 @@
+"""
+Multi-endpoint RPC routing
+Ranks a chain's endpoints by rolling latency and error rate, ejects ones
+that keep failing, and decides when a slow read deserves a hedged retry
+"""
+
+import threading
+import time
+from collections import deque
+
+WINDOW = 50                # Samples kept per endpoint
+MIN_SAMPLES = 5            # Below this the hedge delay falls back to HEDGE_DEFAULT_DELAY
+DEFAULT_LATENCY = 0.5      # Assumed latency for endpoints with no samples yet
+ERROR_PENALTY = 10         # Score multiplier per unit of error rate
+EJECT_AFTER = 3            # Consecutive failures before ejection
+EJECT_SECONDS = 30
+HEDGE_DEFAULT_DELAY = 1.0
+HEDGE_MIN_DELAY = 0.05
+
+# Never hedge or retry calls with side effects
+WRITE_METHODS = frozenset(["eth_sendRawTransaction", "eth_sendTransaction"])
+
+
+def is_read_only(payload):
+    """True if a JSON-RPC payload (single or batch) has no write calls"""
+    calls = payload if isinstance(payload, list) else [payload]
+    return all(call.get("method") not in WRITE_METHODS for call in calls)
+
+
+def chain_endpoints(config):
+    """Endpoint URLs for a chain config ("rpcs" list, or a single "rpc")"""
+    return list(config.get("rpcs") or [config["rpc"]])
+
+
+class Endpoint:
+    """Rolling latency/error stats for one RPC URL"""
+
+    def __init__(self, url):
+        self.url = url
+        self.latencies = deque(maxlen=WINDOW)
+        self.outcomes = deque(maxlen=WINDOW)  # 1 = error, 0 = ok
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.ejections = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency, ok):
+        with self._lock:
+            self.outcomes.append(0 if ok else 1)
+            if ok:
+                self.latencies.append(latency)
+                self.consecutive_failures = 0
+            else:
+                self.consecutive_failures += 1
+                if self.consecutive_failures >= EJECT_AFTER:
+                    self.ejected_until = time.time() + EJECT_SECONDS
+                    self.ejections += 1
+                    self.consecutive_failures = 0
+
+    def error_rate(self):
+        return sum(self.outcomes) / len(self.outcomes) if self.outcomes else 0.0
+
+    def latency(self):
+        """Mean of recent successful latencies"""
+        samples = list(self.latencies)
+        return sum(samples) / len(samples) if samples else DEFAULT_LATENCY
+
+    def p95(self):
+        samples = sorted(self.latencies)
+        if len(samples) < MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+    def score(self):
+        """Lower is better"""
+        return self.latency() * (1 + ERROR_PENALTY * self.error_rate())
+
+    def available(self, now=None):
+        return (now or time.time()) >= self.ejected_until
+
+    def hedge_delay(self, timeout):
+        p95 = self.p95()
+        delay = p95 if p95 is not None else HEDGE_DEFAULT_DELAY
+        return min(max(delay, HEDGE_MIN_DELAY), timeout)
+
+    def snapshot(self):
+        return {
+            "url": self.url,
+            "latency_ms": round(self.latency() * 1000, 1),
+            "p95_ms": round(self.p95() * 1000, 1) if self.p95() is not None else None,
+            "error_rate": round(self.error_rate(), 3),
+            "ejected": not self.available(),
+            "ejections": self.ejections
+        }
+
+
+class EndpointRouter:
+    """Orders a chain's endpoints best-first"""
+
+    def __init__(self, urls):
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.hedges = 0
+        self.failovers = 0
+
+    def ranked(self):
+        """Available endpoints by score; ejected ones last, soonest-back first"""
+        now = time.time()
+        available = [e for e in self.endpoints if e.available(now)]
+        ejected = [e for e in self.endpoints if not e.available(now)]
+        available.sort(key=lambda e: e.score())
+        ejected.sort(key=lambda e: e.ejected_until)
+        return available + ejected
+
+    def snapshot(self):
+        return {
+            "endpoints": [e.snapshot() for e in self.endpoints],
+            "hedges": self.hedges,
+            "failovers": self.failovers
+        }
@@ -12,11 +12,27 @@ env | grep -E '^(PORT|RAILWAY|PYTHON)' | sort || echo 'No railway/env vars found
 echo "PORT=${PORT:-8080}"
 echo "============================="
 
+# Worker count; RPC rate budgets (rate_limiter.py) are split between the workers
+export WEB_CONCURRENCY=${WEB_CONCURRENCY:-2}
+
 # Start gunicorn with fallback for PORT
+# SERVER_MODE=async serves the scan endpoints from one event loop (async_app.py)
+if [ "${SERVER_MODE:-sync}" = "async" ]; then
+  exec gunicorn \
+    --bind 0.0.0.0:${PORT:-8080} \
+    --timeout 120 \
+    --workers ${WEB_CONCURRENCY} \
+    --worker-class aiohttp.GunicornWebWorker \
+    --log-level info \
+    --access-logfile - \
+    --error-logfile - \
+    async_app:app
+fi
+
 exec gunicorn \
   --bind 0.0.0.0:${PORT:-8080} \
   --timeout 120 \
-  --workers 2 \
+  --workers ${WEB_CONCURRENCY} \
   --threads 4 \
   --log-level info \
   --access-logfile - \
@@ -0,0 +1,120 @@
+"""
+Scan session snapshots
+Block-pinned balances and fee quotes from /api/balances, reused by the
+estimate and execute steps instead of re-reading every chain
+"""
+
+import json
+import logging
+import os
+import secrets
+import sqlite3
+import tempfile
+import time
+
+from sqlite_local import LocalSQLite
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.environ.get(
+    "SCAN_SESSION_PATH", os.path.join(tempfile.gettempdir(), "dustzip_scan_sessions.sqlite3")
+)
+DEFAULT_TTL = float(os.environ.get("SCAN_SESSION_TTL", "120"))
+PURGE_EVERY = 50  # creates between purges of expired sessions
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    token TEXT PRIMARY KEY,
+    address TEXT NOT NULL,
+    snapshot TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires);
+"""
+
+
+class SessionStore:
+    """Scan snapshots keyed by an opaque token, shared across workers
+
+    A snapshot maps chain_key -> {"balance_wei", "block_number", "fees"}
+    under "chains", and keeps the USD prices of the last estimate under
+    "prices", so execute charges the fee the user was shown.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, ttl=DEFAULT_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._db = LocalSQLite(path, SCHEMA)
+        self._creates = 0
+
+    def create(self, address, chains):
+        """Store a snapshot; returns (token, expires_at) or (None, None) on failure"""
+        token = secrets.token_urlsafe(16)
+        expires = time.time() + self.ttl
+        snapshot = {"address": address.lower(), "chains": chains}
+        try:
+            conn = self._db.conn()
+            with conn:
+                conn.execute(
+                    "INSERT INTO sessions (token, address, snapshot, expires) VALUES (?, ?, ?, ?)",
+                    (token, address.lower(), json.dumps(snapshot), expires)
+                )
+            self._creates += 1
+            if self._creates % PURGE_EVERY == 0:
+                self.purge()
+        except sqlite3.Error as e:
+            logger.warning("Scan session write failed: %s", e)
+            return None, None
+        return token, expires
+
+    def get(self, token, address=None):
+        """Snapshot for token, or None if unknown, expired or for another address"""
+        if not token:
+            return None
+        try:
+            row = self._db.conn().execute(
+                "SELECT address, snapshot, expires FROM sessions WHERE token = ?", (token,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("Scan session read failed: %s", e)
+            return None
+        if row is None or row[2] <= time.time():
+            return None
+        if address and row[0] != address.lower():
+            return None
+        snapshot = json.loads(row[1])
+        snapshot["expires"] = row[2]
+        return snapshot
+
+    def pin_prices(self, token, prices):
+        """Store {symbol: usd} used by an estimate in a live session, over earlier ones"""
+        if not token or not prices:
+            return
+        try:
+            conn = self._db.conn()
+            with conn:
+                conn.execute(
+                    "UPDATE sessions SET snapshot = json_patch(snapshot, ?) WHERE token = ? AND expires > ?",
+                    (json.dumps({"prices": prices}), token, time.time())
+                )
+        except sqlite3.Error as e:
+            logger.warning("Scan session write failed: %s", e)
+
+    def purge(self):
+        conn = self._db.conn()
+        with conn:
+            conn.execute("DELETE FROM sessions WHERE expires <= ?", (time.time(),))
+
+
+def pinned_prices(snapshot):
+    """USD prices pinned by the session's last estimate, or {}"""
+    if not snapshot:
+        return {}
+    return snapshot.get("prices") or {}
+
+
+def pinned_chain(snapshot, chain_key):
+    """Snapshot entry for one chain, or None"""
+    if not snapshot:
+        return None
+    return snapshot["chains"].get(chain_key)
@@ -0,0 +1,89 @@
+"""
+Request coalescing (singleflight)
+Concurrent identical calls share one execution and all get its result
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """Runs fn once per key at a time; callers that arrive meanwhile wait for that run
+
+    Nothing is cached: once the leading call returns, the next caller with
+    the same key starts a fresh one.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._counts = {}  # label -> [leaders, coalesced]
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, label=None):
+        """(result, shared): fn()'s result, and whether it came from another caller's run"""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            self._counts.setdefault(label, [0, 0])[0 if leader else 1] += 1
+
+        if not leader:
+            return future.result(), True
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def in_flight(self):
+        return len(self._calls)
+
+    def stats(self):
+        """{label: {"requests", "coalesced"}}; requests counts upstream calls actually made"""
+        with self._lock:
+            return {
+                label: {"requests": leaders, "coalesced": coalesced}
+                for label, (leaders, coalesced) in self._counts.items()
+            }
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines on one event loop"""
+
+    def __init__(self):
+        self._calls = {}
+        self._counts = {}  # label -> [leaders, coalesced]
+
+    async def do(self, key, fn, label=None):
+        """(result, shared), like SingleFlight.do(); fn is a coroutine function"""
+        task = self._calls.get(key)
+        leader = task is None
+        if leader:
+            task = self._calls[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda done: self._finished(key, done))
+        self._counts.setdefault(label, [0, 0])[0 if leader else 1] += 1
+        # Shielded: a caller that times out does not cancel the call for the others
+        return await asyncio.shield(task), not leader
+
+    def in_flight(self):
+        return len(self._calls)
+
+    def stats(self):
+        return {
+            label: {"requests": leaders, "coalesced": coalesced}
+            for label, (leaders, coalesced) in self._counts.items()
+        }
+
+    def _finished(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # Retrieved, so a failure nobody awaited is not logged as unhandled
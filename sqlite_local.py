@@ -0,0 +1,27 @@
+"""
+Per-thread SQLite connections
+Used by the stores that must be shared across gunicorn workers
+"""
+
+import sqlite3
+import threading
+
+
+class LocalSQLite:
+    """Lazily opened, per-thread connections to one WAL-mode database file"""
+
+    def __init__(self, path, schema):
+        self.path = path
+        self.schema = schema
+        self._local = threading.local()
+
+    def conn(self):
+        # Created on first use in each thread, so connections never cross a fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self.schema)
+            self._local.conn = conn
+        return conn
@@ -10,8 +10,13 @@
     let selectedChains = new Set();
     let scannedBalances = [];
     let currentEstimates = [];
+    let scanSession = null;
     let isInitialized = false;
 
+    // Sweep status polling (a request per interval, not a held connection)
+    const SWEEP_POLL_MS = 3000;
+    const SWEEP_FOLLOW_TIMEOUT_MS = 10 * 60 * 1000;
+
     // Safe ethereum access
     function getEthereum() {
         try {
@@ -355,8 +360,13 @@
         showLoading('Scanning balances across chains...');
         if (el.resultsSection) el.resultsSection.classList.add('hidden');
 
+        scannedBalances = [];
+        scanSession = null;
+        let resultsShown = false;
+        const failedChains = [];
+
         try {
-            const response = await fetch('/api/balances', {
+            const response = await fetch('/api/balances/stream', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({
@@ -365,25 +375,52 @@
                 })
             });
 
-            const data = await response.json();
-            console.log('📊 Scan response:', data);
-            
-            if (data.error) {
-                throw new Error(data.error);
+            if (!response.ok) {
+                const data = await response.json();
+                throw new Error(data.error || `HTTP ${response.status}`);
             }
 
-            scannedBalances = (data.balances || []).filter(b => b.balance > 0);
+            // Render each chain's card as soon as its line arrives
+            await readNdjson(response, (line) => {
+                if (line.done) {
+                    // Server-side snapshot reused by estimate/sweep
+                    scanSession = line.session || null;
+                    return;
+                }
+
+                if (line.status !== 'ok') {
+                    console.warn(`⚠️ ${line.chain}: ${line.status}`, line.error || '');
+                    failedChains.push(line.chain);
+                    return;
+                }
+
+                const bal = line.balance;
+                if (!bal || !(bal.balance > 0)) return;
+
+                scannedBalances.push(bal);
+                if (!resultsShown) {
+                    resultsShown = true;
+                    hideLoading();
+                    showResultsSection();
+                }
+                appendBalanceCard(bal);
+                updateChainCount();
+            });
+
             console.log('✅ Valid balances found:', scannedBalances.length);
-            
+            if (failedChains.length > 0) {
+                console.warn('⚠️ Chains without result:', failedChains);
+            }
+
+            hideLoading();
+
             if (scannedBalances.length === 0) {
-                hideLoading();
                 showInfo('No balances found across selected chains. Try selecting more chains.');
                 return;
             }
 
-            displayResults(data);
-            hideLoading();
-            
+            estimateCosts();
+
         } catch (error) {
             console.error('❌ Scan error:', error);
             hideLoading();
@@ -391,47 +428,66 @@
         }
     }
 
-    // Display results
-    function displayResults(data) {
+    // Read an NDJSON response line by line
+    async function readNdjson(response, onLine) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+
+            buffer += decoder.decode(value, { stream: true });
+            let newline;
+            while ((newline = buffer.indexOf('\n')) >= 0) {
+                const text = buffer.slice(0, newline).trim();
+                buffer = buffer.slice(newline + 1);
+                if (text) onLine(JSON.parse(text));
+            }
+        }
+
+        if (buffer.trim()) onLine(JSON.parse(buffer));
+    }
+
+    // Show an empty results section
+    function showResultsSection() {
         const el = getElements();
         if (el.resultsSection) el.resultsSection.classList.remove('hidden');
         if (el.txStatusSection) el.txStatusSection.classList.add('hidden');
-        
-        // Update totals
-        const totalUsdEl = document.getElementById('totalUSD');
-        if (totalUsdEl) totalUsdEl.textContent = `$${(data.total_usd || 0).toFixed(2)}`;
-        
+
+        const balancesList = document.querySelector('.balances-list');
+        if (balancesList) balancesList.innerHTML = '';
+    }
+
+    function updateChainCount() {
         const chainCountEl = document.getElementById('chainCount');
         if (chainCountEl) chainCountEl.textContent = `${scannedBalances.length} chain(s) with balance`;
-        
-        // Display balances list
-        const balancesList = document.querySelector('.balances-list');
-        if (balancesList) {
-            balancesList.innerHTML = '';
-            
-            scannedBalances.forEach(bal => {
-                const balanceEl = document.createElement('div');
-                balanceEl.className = 'balance-card';
-                balanceEl.innerHTML = `
-                    <div class="balance-header">
-                        <div class="chain-info">
-                            <span class="chain-icon" style="background: ${bal.color}"></span>
-                            <span class="chain-name">${bal.name}</span>
-                        </div>
-                        <span class="balance-amount">${(bal.balance || 0).toFixed(4)} ${bal.symbol}</span>
-                    </div>
-                    <div class="balance-footer">
-                        <span class="balance-usd">≈ $${(bal.balance_usd || 0).toFixed(2)}</span>
-                        <span class="checkbox-wrapper">
-                            <input type="checkbox" class="balance-checkbox" data-chain="${bal.chain}" checked>
-                        </span>
-                    </div>
-                `;
-                balancesList.appendChild(balanceEl);
-            });
-        }
+    }
 
-        estimateCosts();
+    // Append one balance card
+    function appendBalanceCard(bal) {
+        const balancesList = document.querySelector('.balances-list');
+        if (!balancesList) return;
+
+        const balanceEl = document.createElement('div');
+        balanceEl.className = 'balance-card';
+        balanceEl.innerHTML = `
+            <div class="balance-header">
+                <div class="chain-info">
+                    <span class="chain-icon" style="background: ${bal.color}"></span>
+                    <span class="chain-name">${bal.name}</span>
+                </div>
+                <span class="balance-amount">${(bal.balance || 0).toFixed(4)} ${bal.symbol}</span>
+            </div>
+            <div class="balance-footer">
+                <span class="balance-usd">≈ $${(bal.balance_usd || 0).toFixed(2)}</span>
+                <span class="checkbox-wrapper">
+                    <input type="checkbox" class="balance-checkbox" data-chain="${bal.chain}" checked>
+                </span>
+            </div>
+        `;
+        balancesList.appendChild(balanceEl);
     }
 
     // Estimate costs
@@ -454,10 +510,10 @@
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({
-                    from_address: currentAccount,
-                    to_address: currentAccount,
+                    address: currentAccount,
+                    chains: selectedBalances.map(b => b.chain),
                     destination_chain: destinationChain,
-                    balances: selectedBalances
+                    session: scanSession
                 })
             });
 
@@ -496,7 +552,9 @@
         if (netReceiveEl) netReceiveEl.textContent = `$${netReceive.toFixed(2)}`;
     }
 
-    // Execute sponsored sweep
+    // Execute sweep: the wallet signs and sends the fee and user txs
+    // from /api/execute. Sponsored /api/sweep needs EIP-7702 authorization
+    // signatures, which browser wallets do not let dapps request.
     async function executeSweep() {
         console.log('💨 Starting sweep...');
         console.log('📊 Current estimates:', currentEstimates.length);
@@ -508,26 +566,24 @@
             return;
         }
 
-        if (!currentAccount) {
+        const eth = getEthereum();
+        if (!currentAccount || !eth) {
             console.error('❌ No account connected');
             showError('Please connect wallet first');
             return;
         }
 
-        const destChainSelect = document.getElementById('destinationChain');
-        const destinationChain = destChainSelect ? destChainSelect.value : 'ethereum';
-
-        showLoading('Preparing EIP-7702 sponsored sweep...');
+        showLoading('Preparing sweep transactions...');
 
         try {
-            const response = await fetch('/api/sweep', {
+            const response = await fetch('/api/execute', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({
-                    from_address: currentAccount,
+                    address: currentAccount,
                     to_address: currentAccount,
-                    estimates: currentEstimates,
-                    signature: '0x'
+                    chains: currentEstimates.map(e => e.chain),
+                    session: scanSession
                 })
             });
 
@@ -537,9 +593,43 @@
                 throw new Error(data.error);
             }
 
+            const sent = [];
+            for (const prepared of data.transactions || []) {
+                showLoading(`Confirm the ${prepared.name} transactions in your wallet...`);
+                await eth.request({
+                    method: 'wallet_switchEthereumChain',
+                    params: [{ chainId: prepared.user_tx.chainId }]
+                });
+                for (const tx of [prepared.fee_tx, prepared.user_tx]) {
+                    const txHash = await eth.request({
+                        method: 'eth_sendTransaction',
+                        params: [Object.assign({ from: currentAccount }, tx)]
+                    });
+                    sent.push({
+                        chain: prepared.chain,
+                        chain_name: prepared.name,
+                        tx_hash: txHash,
+                        value: parseInt(tx.value, 16),
+                        from: currentAccount
+                    });
+                }
+            }
+
             hideLoading();
-            displayTransactionStatus(data.transactions);
-            showSuccess('EIP-7702 sponsored sweep initiated! Sponsor is processing transactions...');
+            if (sent.length === 0) {
+                showError('Nothing to sweep on the selected chains');
+                return;
+            }
+            displayTransactionStatus(sent);
+            showSuccess('Sweep transactions sent!');
+
+            const tracked = await fetch('/api/sweeps', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ transactions: sent })
+            });
+            const tracking = await tracked.json();
+            if (tracking.sweep_id) followSweep(tracking.sweep_id);
 
         } catch (error) {
             console.error('❌ Sweep error:', error);
@@ -559,6 +649,8 @@
             (transactions || []).forEach((tx, index) => {
                 const txEl = document.createElement('div');
                 txEl.className = 'tx-card';
+                txEl.dataset.chain = tx.chain || '';
+                txEl.dataset.txHash = (tx.tx_hash || '').toLowerCase();
                 txEl.innerHTML = `
                     <div class="tx-header">
                         <span class="tx-chain">${tx.chain_name}</span>
@@ -570,11 +662,7 @@
                             <span>${((parseFloat(tx.value) || 0) / 1e18).toFixed(6)} ETH</span>
                         </div>
                         <div class="tx-row">
-                            <span>Type:</span>
-                            <span>EIP-7702 Sponsored</span>
-                        </div>
-                        <div class="tx-row">
-                            <span>Sponsor:</span>
+                            <span>From:</span>
                             <span>${(tx.from || '').slice(0, 8)}...</span>
                         </div>
                     </div>
@@ -584,6 +672,33 @@
         }
     }
 
+    // Follow receipt status for a sweep (server batches the lookups per block)
+    async function followSweep(sweepId) {
+        const deadline = Date.now() + SWEEP_FOLLOW_TIMEOUT_MS;
+        while (Date.now() < deadline) {
+            try {
+                const response = await fetch(`/api/sweeps/${encodeURIComponent(sweepId)}`);
+                if (!response.ok) return;
+                const status = await response.json();
+                (status.transactions || []).forEach(updateTransactionStatus);
+                if (status.done) return;
+            } catch (error) {
+                console.warn('⚠️ Sweep status check failed:', error);
+            }
+            await new Promise((resolve) => setTimeout(resolve, SWEEP_POLL_MS));
+        }
+    }
+
+    function updateTransactionStatus(tx) {
+        document.querySelectorAll('#txList .tx-card').forEach((card) => {
+            if (card.dataset.chain !== tx.chain || card.dataset.txHash !== tx.tx_hash) return;
+            const badge = card.querySelector('.tx-status');
+            if (!badge) return;
+            badge.className = `tx-status ${tx.status}`;
+            badge.textContent = tx.status.charAt(0).toUpperCase() + tx.status.slice(1);
+        });
+    }
+
     // Utility functions
     function isValidAddress(address) {
         return /^0x[a-fA-F0-9]{40}$/.test(address);
@@ -0,0 +1,300 @@
+"""
+Sponsored sweep batching
+Collects users' signed EIP-7702 authorizations for a short window and sends
+them as one type 4 transaction per chain through the sponsor relayer
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from eth_abi import decode, encode
+from eth_keys import keys
+from eth_utils import keccak, to_checksum_address
+from hexbytes import HexBytes
+
+from eip7702 import SET_CODE_TX_TYPE, authorization_params, normalize_authorization, recover_authority
+from multicall import MULTICALL3_ADDRESS, decode_aggregate3, encode_aggregate3
+from rpc_batch import RpcError, to_int
+
+logger = logging.getLogger(__name__)
+
+BATCH_WINDOW = float(os.environ.get("SWEEP_BATCH_WINDOW", "3"))  # Seconds to collect authorizations
+MAX_AUTHORIZATIONS = int(os.environ.get("SWEEP_BATCH_MAX", "50"))  # Flush early at this many
+DELEGATES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "contract_addresses.json")
+
+# Gas budget for a batch
+BASE_GAS = 50000            # Intrinsic tx cost plus Multicall3 overhead
+AUTHORIZATION_GAS = 25000   # PER_EMPTY_ACCOUNT_COST, charged per authorization
+SWEEP_CALL_GAS = 90000      # One sweep call (signature check, replay slot, fee + user transfer)
+
+SWEEP_SELECTOR = keccak(text="sweep(address,uint256,uint8,bytes32,bytes32)")[:4]
+SWEEP_TYPEHASH = keccak(text="Sweep(address to,uint256 deadline)")
+ERROR_SELECTOR = keccak(text="Error(string)")[:4]
+INTENT_MIN_TTL = 120        # Seconds a sweep intent must stay valid after its batch is sent
+
+
+def load_delegates(path=DELEGATES_PATH):
+    """Deployed DustAggregator address per chain; undeployed (zero) entries are skipped"""
+    try:
+        with open(path) as f:
+            addresses = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning("Could not load delegate addresses from %s: %s", path, e)
+        return {}
+    return {
+        chain_key: to_checksum_address(address)
+        for chain_key, address in addresses.items()
+        if int(address, 16) != 0
+    }
+
+
+def sweep_intent_hash(chain_id, account, to_address, deadline):
+    """Digest the account signs to let a sponsor call sweep(to, deadline) on it
+
+    Ethereum signed message of keccak(abi.encode(SWEEP_TYPEHASH, chainid,
+    account, to, deadline)), as checked by DustAggregator.sweep.
+    """
+    struct_hash = keccak(encode(
+        ["bytes32", "uint256", "address", "address", "uint256"],
+        [SWEEP_TYPEHASH, chain_id, to_checksum_address(account), to_checksum_address(to_address), deadline]
+    ))
+    return keccak(b"\x19Ethereum Signed Message:\n32" + struct_hash)
+
+
+def sign_sweep_intent(private_key, chain_id, to_address, deadline):
+    """Signed sweep intent {"deadline", "v", "r", "s"} for the key's account"""
+    key = keys.PrivateKey(HexBytes(private_key))
+    digest = sweep_intent_hash(chain_id, key.public_key.to_checksum_address(), to_address, deadline)
+    signature = key.sign_msg_hash(digest)
+    return {"deadline": deadline, "v": signature.v + 27, "r": signature.r, "s": signature.s}
+
+
+def normalize_intent(intent):
+    """Intent with int fields and v as 27/28; accepts hex or int values"""
+    v = to_int(intent["v"])
+    return {
+        "deadline": to_int(intent["deadline"]),
+        "v": v + 27 if v in (0, 1) else v,
+        "r": to_int(intent["r"]),
+        "s": to_int(intent["s"]),
+    }
+
+
+def recover_intent_signer(chain_id, account, to_address, intent):
+    """Address that signed a sweep intent; raises ValueError if the signature is invalid"""
+    intent = normalize_intent(intent)
+    try:
+        signature = keys.Signature(vrs=(intent["v"] - 27, intent["r"], intent["s"]))
+        public_key = signature.recover_public_key_from_msg_hash(
+            sweep_intent_hash(chain_id, account, to_address, intent["deadline"])
+        )
+    except Exception as e:
+        raise ValueError(f"Invalid sweep signature: {e}") from e
+    return public_key.to_checksum_address()
+
+
+def encode_sweep(to_address, intent):
+    return SWEEP_SELECTOR + encode(
+        ["address", "uint256", "uint8", "bytes32", "bytes32"],
+        [to_checksum_address(to_address), intent["deadline"], intent["v"],
+         intent["r"].to_bytes(32, "big"), intent["s"].to_bytes(32, "big")]
+    )
+
+
+def revert_reason(data):
+    """Error(string) message from revert data, or a generic description"""
+    if data[:4] == ERROR_SELECTOR:
+        try:
+            return decode(["string"], data[4:])[0]
+        except Exception:
+            pass
+    return "reverted" if not data else f"reverted (0x{data.hex()})"
+
+
+def batch_gas(count):
+    return BASE_GAS + count * (AUTHORIZATION_GAS + SWEEP_CALL_GAS)
+
+
+class SweepBatcher:
+    """Per-chain batches of signed authorizations, flushed every `window` seconds
+
+    Each flush first simulates the batch with eth_call: Multicall3 aggregate3
+    calls sweep() on every authority with failures allowed, under the batch's
+    authorization list. Sweeps that would revert are resolved as errors, and
+    the rest go out in one type 4 tx with failures not allowed, so the
+    receipt status is the status of every sweep in it.
+    """
+
+    def __init__(self, relayer, chains, delegates, window=BATCH_WINDOW, max_authorizations=MAX_AUTHORIZATIONS):
+        self.relayer = relayer
+        self.chains = chains
+        self.delegates = delegates
+        self.window = window
+        self.max_authorizations = max_authorizations
+        self.batches = 0
+        self.authorizations = 0
+        self.rejected = 0
+        self._pending = {}  # chain_key -> [(authorization, authority, to_address, intent, future)]
+        self._timers = {}
+        self._lock = threading.Lock()
+
+    def supports(self, chain_key):
+        return chain_key in self.chains and chain_key in self.delegates
+
+    def add(self, chain_key, authorization, to_address, intent, expected_authority=None):
+        """Queue one user's signed authorization and sweep intent; returns a Future for its sweep
+
+        Raises ValueError for unsupported chains, authorizations that do not
+        delegate to our contract on this chain, bad signatures (or ones not
+        from `expected_authority`), intents not signed by the authority or
+        about to expire, and accounts that already have a sweep waiting in
+        the batch.
+        """
+        if not self.supports(chain_key):
+            raise ValueError(f"Sponsored sweeps are not available on {chain_key}")
+        chain_id = self.chains[chain_key]["chain_id"]
+        auth = normalize_authorization(authorization)
+        if auth["chainId"] not in (0, chain_id):
+            raise ValueError("Authorization is for another chain")
+        if auth["address"] != self.delegates[chain_key]:
+            raise ValueError("Authorization does not delegate to the DustAggregator contract")
+        authority = recover_authority(auth)
+        if expected_authority and authority.lower() != expected_authority.lower():
+            raise ValueError("Authorization was not signed by the sweeping account")
+        to_address = to_checksum_address(to_address)
+        if not intent:
+            raise ValueError("Sweep intent required")
+        intent = normalize_intent(intent)
+        if recover_intent_signer(chain_id, authority, to_address, intent) != authority:
+            raise ValueError("Sweep intent was not signed by the sweeping account")
+        if intent["deadline"] < time.time() + self.window + INTENT_MIN_TTL:
+            raise ValueError("Sweep intent expires too soon")
+
+        future = Future()
+        flush = False
+        with self._lock:
+            pending = self._pending.setdefault(chain_key, [])
+            if any(entry[1] == authority for entry in pending):
+                raise ValueError("A sweep for this account is already pending")
+            pending.append((auth, authority, to_address, intent, future))
+            if len(pending) >= self.max_authorizations:
+                flush = True
+            elif chain_key not in self._timers:
+                timer = threading.Timer(self.window, self._flush, args=(chain_key,))
+                timer.daemon = True
+                self._timers[chain_key] = timer
+                timer.start()
+        if flush:
+            self._flush(chain_key)
+        return future
+
+    def stats(self):
+        return {
+            "pending": {chain_key: len(entries) for chain_key, entries in self._pending.items() if entries},
+            "batches": self.batches,
+            "authorizations": self.authorizations,
+            "rejected": self.rejected,
+            "window": self.window,
+        }
+
+    def sweep_calls(self, entries):
+        return [(authority, encode_sweep(to_address, intent)) for _, authority, to_address, intent, _ in entries]
+
+    def build_transaction(self, chain_key, entries):
+        """Type 4 tx delegating every authority in `entries` and sweeping each one
+
+        Failures are not allowed: one reverting sweep reverts the whole tx,
+        so simulate() must have dropped those first.
+        """
+        chain = self.chains[chain_key]
+        return {
+            "type": SET_CODE_TX_TYPE,
+            "to": chain.get("multicall3", MULTICALL3_ADDRESS),
+            "value": 0,
+            "data": encode_aggregate3(self.sweep_calls(entries), allow_failure=False),
+            "gas": batch_gas(len(entries)),
+            "authorizationList": [entry[0] for entry in entries],
+        }
+
+    def simulate(self, chain_key, entries):
+        """[(success, reason)] per entry, from an eth_call of the batch under its authorizations"""
+        client = self.relayer.registry.get(chain_key)
+        call = {
+            "to": self.chains[chain_key].get("multicall3", MULTICALL3_ADDRESS),
+            "data": encode_aggregate3(self.sweep_calls(entries)),
+            "authorizationList": [authorization_params(entry[0]) for entry in entries],
+        }
+        reply = client.request("eth_call", [call, "latest"])
+        if "result" not in reply:
+            raise RpcError("eth_call", reply.get("error"))
+
+        outcomes = []
+        for success, data in decode_aggregate3(reply["result"]):
+            if not success:
+                outcomes.append((False, revert_reason(data)))
+            elif len(data) < 32:
+                # No code ran: the node ignored the authorization list
+                outcomes.append((False, "sweep did not run (authorization not applied)"))
+            else:
+                outcomes.append((True, None))
+        return outcomes
+
+    def _flush(self, chain_key):
+        with self._lock:
+            entries = self._pending.pop(chain_key, [])
+            timer = self._timers.pop(chain_key, None)
+        if timer is not None:
+            timer.cancel()
+        if not entries:
+            return
+
+        self.batches += 1
+        self.authorizations += len(entries)
+        try:
+            outcomes = self.simulate(chain_key, entries)
+        except Exception as e:
+            logger.warning("Sweep simulation failed on %s: %s", chain_key, e)
+            for entry in entries:
+                entry[-1].set_exception(e)
+            return
+
+        valid = []
+        for entry, (success, reason) in zip(entries, outcomes):
+            if success:
+                valid.append(entry)
+                continue
+            self.rejected += 1
+            _, authority, to_address, _, future = entry
+            future.set_result({
+                "status": "error",
+                "error": f"Sweep would revert: {reason}",
+                "chain": chain_key,
+                "authority": authority,
+                "to": to_address,
+                "batch_size": len(entries),
+            })
+        if not valid:
+            return
+
+        logger.info("Sending %d sponsored sweeps on %s in one tx", len(valid), chain_key)
+        try:
+            submitted = self.relayer.submit(chain_key, [self.build_transaction(chain_key, valid)])
+        except Exception as e:
+            for entry in valid:
+                entry[-1].set_exception(e)
+            return
+        submitted.add_done_callback(lambda done: self._settle(chain_key, valid, done))
+
+    def _settle(self, chain_key, entries, done):
+        error = done.exception()
+        if error is not None:
+            for entry in entries:
+                entry[-1].set_exception(error)
+            return
+        (sent,) = done.result()
+        for _, authority, to_address, _, future in entries:
+            future.set_result(dict(sent, chain=chain_key, authority=authority, to=to_address, batch_size=len(entries)))
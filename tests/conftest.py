@@ -0,0 +1,73 @@
+"""
+Shared test setup
+Repo modules importable from tests/, SQLite stores kept in a temp dir, and
+mock JSON-RPC fleets (mock_rpc.py) stopped after each test
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Module-level store paths are read at import time
+STATE_DIR = tempfile.mkdtemp(prefix="dustzip-tests-")
+for name in ("METRICS_PATH", "RELAYER_STATE_PATH", "BALANCE_CACHE_PATH", "SWEEP_STATUS_PATH"):
+    os.environ.setdefault(name, os.path.join(STATE_DIR, name.lower() + ".sqlite3"))
+
+import pytest  # noqa: E402
+
+import relayer  # noqa: E402
+from mock_rpc import MockFleet  # noqa: E402
+from relayer import Relayer  # noqa: E402
+from rpc_clients import ClientRegistry  # noqa: E402
+
+SPONSOR_KEYS = ["0x" + f"{i:02x}" * 32 for i in range(1, 4)]
+MAX_FEE = 10 * 10**9
+
+
+class FixedFees:
+    """Fee oracle stand-in with a constant quote"""
+
+    def quote(self, chain_key):
+        return {"max_fee": MAX_FEE, "priority_fee": 10**9, "gas_price": MAX_FEE}
+
+
+def make_relayer(chains, keys, **kwargs):
+    return Relayer(ClientRegistry(chains), keys, FixedFees(), **kwargs)
+
+
+def wait_for(predicate, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return
+        time.sleep(0.05)
+    raise AssertionError("condition not met in time")
+
+
+@pytest.fixture
+def mock_fleet():
+    """make(chains, **MockFleet kwargs) -> started fleet with `chains` pointed at it"""
+    fleets = []
+
+    def make(chains, **kwargs):
+        fleet = MockFleet(chains, **kwargs).start()
+        fleets.append(fleet)
+        fleet.configure(chains)
+        return fleet
+
+    yield make
+    for fleet in fleets:
+        fleet.stop()
+
+
+@pytest.fixture
+def dev_chain(mock_fleet, monkeypatch):
+    """(chains config, MockChain) for one fast chain; relayer lanes poll it every 50 ms"""
+    monkeypatch.setattr(relayer, "POLL_INTERVAL", 0.05)
+    chains = {"dev": {"chain_id": 1337, "block_time": 0.2, "name": "Dev", "symbol": "ETH"}}
+    fleet = mock_fleet(chains)
+    return chains, fleet.nodes["dev"][0].chain
@@ -0,0 +1,55 @@
+import pytest
+
+import app
+from rpc_clients import ClientRegistry
+
+FUNDED = "0x" + "11" * 20
+EMPTY = "0x" + "22" * 20
+
+
+@pytest.fixture
+def bulk(mock_fleet, monkeypatch):
+    """(Flask test client, MockChain) with the app scanning one mock chain"""
+    chains = {"dev": {"chain_id": 1337, "block_time": 1, "name": "Dev", "symbol": "ETH", "color": "#627EEA",
+                      "explorer": "https://example.invalid/tx/"}}
+    mock_chain = mock_fleet(chains).nodes["dev"][0].chain
+    mock_chain.fund(FUNDED, 5 * 10**15)
+    mock_chain.fund(EMPTY, 0)
+    monkeypatch.setattr(app, "CHAINS", chains)
+    monkeypatch.setattr(app, "rpc_registry", ClientRegistry(chains))
+    return app.app.test_client(), mock_chain
+
+
+def scan(client):
+    response = client.post("/api/balances/bulk", json={"addresses": [FUNDED, EMPTY], "chains": ["dev"]})
+    assert response.status_code == 200
+    return response.json, {item["address"]: item for item in response.json["results"]}
+
+
+def test_reports_dust_when_every_read_succeeds(bulk):
+    client, _ = bulk
+    body, results = scan(client)
+
+    assert body["failed_chains"] == []
+    assert [entry["chain"] for entry in results[FUNDED]["balances"]] == ["dev"]
+    assert results[FUNDED]["balances"][0]["balance"] == pytest.approx(0.005)
+    assert results[EMPTY]["balances"] == []
+    assert results[FUNDED]["errors"] == results[EMPTY]["errors"] == []
+
+
+def test_failed_read_is_an_error_not_a_zero(bulk, monkeypatch):
+    client, mock_chain = bulk
+    balance = mock_chain.balance
+
+    def failing_balance(address, state=None):
+        if address.lower() == FUNDED:
+            raise ValueError("header not found")
+        return balance(address, state)
+
+    monkeypatch.setattr(mock_chain, "balance", failing_balance)
+    body, results = scan(client)
+
+    assert body["failed_chains"] == []
+    assert results[FUNDED]["balances"] == []
+    assert [error["chain"] for error in results[FUNDED]["errors"]] == ["dev"]
+    assert results[EMPTY]["errors"] == []
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+from eth_abi import decode
+
+import mock_rpc
+from async_rpc import AsyncChainClient
+from multicall import MULTICALL3_ADDRESS, async_get_eth_balances, get_eth_balances, split_balances
+from rpc_batch import RpcError
+from rpc_clients import ChainClient
+
+FUNDED = "0x" + "11" * 20
+EMPTY = "0x" + "22" * 20
+BROKEN = "0x" + "33" * 20
+
+
+@pytest.fixture
+def chain(mock_fleet, monkeypatch):
+    """(chains config, MockChain) where every balance read of BROKEN fails"""
+    chains = {"dev": {"chain_id": 1337, "block_time": 1}}
+    mock_chain = mock_fleet(chains).nodes["dev"][0].chain
+    mock_chain.fund(FUNDED, 5 * 10**15)
+    mock_chain.fund(EMPTY, 0)
+    call, balance = mock_chain.call, mock_chain.balance
+
+    def failing_call(to, data, state=None):
+        if data[:4] == mock_rpc.GET_ETH_BALANCE_SELECTOR and decode(["address"], data[4:])[0].lower() == BROKEN:
+            return False, b""
+        return call(to, data, state)
+
+    def failing_balance(address, state=None):
+        if address.lower() == BROKEN:
+            raise ValueError("header not found")
+        return balance(address, state)
+
+    monkeypatch.setattr(mock_chain, "call", failing_call)
+    monkeypatch.setattr(mock_chain, "balance", failing_balance)
+    return chains, mock_chain
+
+
+def check_balances(balances):
+    assert list(balances) == [FUNDED, EMPTY, BROKEN]
+    read, failed = split_balances(balances)
+    # A failed read is reported, never mistaken for a zero balance
+    assert read == {FUNDED: 5 * 10**15, EMPTY: 0}
+    assert isinstance(failed[BROKEN], RpcError)
+
+
+@pytest.mark.parametrize("multicall_address", [MULTICALL3_ADDRESS, None])
+def test_failed_reads_are_errors(chain, multicall_address):
+    chains, _ = chain
+    client = ChainClient("dev", chains["dev"], coalesce=False)
+    check_balances(get_eth_balances(client, [FUNDED, EMPTY, BROKEN], multicall_address))
+
+
+@pytest.mark.parametrize("multicall_address", [MULTICALL3_ADDRESS, None])
+def test_async_failed_reads_are_errors(chain, multicall_address):
+    chains, _ = chain
+
+    async def read():
+        client = AsyncChainClient("dev", chains["dev"])
+        try:
+            return await async_get_eth_balances(client, [FUNDED, EMPTY, BROKEN], multicall_address)
+        finally:
+            await client.close()
+
+    check_balances(asyncio.run(read()))
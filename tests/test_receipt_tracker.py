@@ -0,0 +1,29 @@
+from receipt_tracker import TX_CONFIRMED, ReceiptTracker, SweepStatusStore
+from rpc_clients import ClientRegistry
+
+TX_HASH = "0x" + "ab" * 32
+
+
+def test_looks_up_receipts_once_per_block(mock_fleet, tmp_path):
+    chains = {"dev": {"chain_id": 1337, "block_time": 60}}
+    fleet = mock_fleet(chains)
+    node = fleet.nodes["dev"][0]
+    tracker = ReceiptTracker(ClientRegistry(chains), SweepStatusStore(str(tmp_path / "status.sqlite3")))
+    sweep_id = tracker.track([{"chain": "dev", "tx_hash": TX_HASH}])
+
+    tracker.poll("dev")
+    tracker.poll("dev")
+    # Same head: the second poll only reads eth_blockNumber
+    assert node.stats()["methods"].get("eth_getTransactionReceipt") == 1
+
+    # A hash tracked at the same head is still looked up right away
+    tracker.track([{"chain": "dev", "tx_hash": "0x" + "cd" * 32}])
+    tracker.poll("dev")
+    assert node.stats()["methods"].get("eth_getTransactionReceipt") == 2
+
+    node.chain.sent[TX_HASH] = node.chain.block_number() + 1
+    node.chain.started -= 60
+    tracker.poll("dev")
+    assert node.stats()["methods"].get("eth_getTransactionReceipt") == 4
+    assert tracker.status(sweep_id)["transactions"][0]["status"] == TX_CONFIRMED
+    assert tracker.stats()["pending"] == {"dev": 1}
@@ -0,0 +1,131 @@
+import time
+from collections import Counter
+
+from eth_account import Account
+
+import relayer
+from conftest import MAX_FEE, SPONSOR_KEYS as KEYS, make_relayer, wait_for
+from nonce_manager import SharedNonceManager
+
+RECIPIENT = "0x" + "22" * 20
+
+
+def transfer(value=1):
+    return [{"to": RECIPIENT, "value": value, "gas": 21000}]
+
+
+def test_spreads_jobs_over_the_least_loaded_lanes(dev_chain):
+    chains, chain = dev_chain
+    chain.mining = False
+    sponsor_relayer = make_relayer(chains, KEYS)
+
+    futures = [sponsor_relayer.submit("dev", transfer()) for _ in range(6)]
+    results = [future.result(timeout=10)[0] for future in futures]
+
+    assert all(result["status"] == "sent" for result in results)
+    assert Counter(result["sponsor"] for result in results) == {
+        Account.from_key(key).address: 2 for key in KEYS
+    }
+
+
+def test_nonces_are_sequential_per_sponsor_and_mined(dev_chain):
+    chains, chain = dev_chain
+    sponsor_relayer = make_relayer(chains, KEYS[:2])
+
+    futures = [sponsor_relayer.submit("dev", transfer() * 2) for _ in range(10)]
+    results = [result for future in futures for result in future.result(timeout=10)]
+
+    by_sponsor = {}
+    for result in results:
+        assert result["status"] == "sent"
+        by_sponsor.setdefault(result["sponsor"], []).append(result["nonce"])
+    for sponsor, nonces in by_sponsor.items():
+        assert sorted(nonces) == list(range(len(nonces)))
+        wait_for(lambda: chain.nonces[sponsor.lower()] == len(nonces))
+    wait_for(lambda: all(chain.receipt(r["tx_hash"]) for r in results))
+    assert all(chain.receipt(r["tx_hash"])["status"] == "0x1" for r in results)
+
+
+def test_workers_sharing_a_key_never_reuse_a_nonce(dev_chain, tmp_path):
+    chains, chain = dev_chain
+    path = str(tmp_path / "relayer.sqlite3")
+    workers = [make_relayer(chains, KEYS[:1], nonce_manager=SharedNonceManager(path)) for _ in range(2)]
+
+    futures = [worker.submit("dev", transfer()) for _ in range(10) for worker in workers]
+    results = [future.result(timeout=10)[0] for future in futures]
+
+    assert all(result["status"] == "sent" for result in results)
+    assert sorted(result["nonce"] for result in results) == list(range(20))
+    wait_for(lambda: chain.nonces[Account.from_key(KEYS[0]).address.lower()] == 20)
+
+
+def test_resyncs_nonces_after_a_dropped_tx(dev_chain):
+    chains, chain = dev_chain
+    chain.mining = False
+    sponsor_relayer = make_relayer(chains, KEYS[:1])
+    sponsor = Account.from_key(KEYS[0]).address
+
+    results = sponsor_relayer.submit("dev", transfer() * 3).result(timeout=10)
+    assert [result["nonce"] for result in results] == [0, 1, 2]
+    assert chain.drop(sponsor) == 3
+
+    lane = sponsor_relayer.lanes("dev")[0]
+    wait_for(lambda: lane.dropped == 3)
+    assert lane.in_flight == {}
+    assert sponsor_relayer.nonce_manager.resyncs == 1
+
+    chain.mining = True
+    (result,) = sponsor_relayer.submit("dev", transfer()).result(timeout=10)
+    assert (result["status"], result["nonce"]) == ("sent", 0)
+    wait_for(lambda: chain.receipt(result["tx_hash"]) is not None)
+
+
+def test_a_lagging_endpoint_does_not_fake_a_drop(dev_chain, monkeypatch):
+    chains, chain = dev_chain
+    chain.mining = False
+    sponsor_relayer = make_relayer(chains, KEYS[:1])
+    results = sponsor_relayer.submit("dev", transfer() * 2).result(timeout=10)
+    lane = sponsor_relayer.lanes("dev")[0]
+    pending_nonce, lagged = chain.pending_nonce, []
+
+    def lagging_pending_nonce(sender):
+        # Answered by an endpoint that has not seen the pooled txs yet
+        if len(lagged) < relayer.DROP_AFTER - 1:
+            lagged.append(sender)
+            return chain.nonces[sender.lower()]
+        return pending_nonce(sender)
+
+    monkeypatch.setattr(chain, "pending_nonce", lagging_pending_nonce)
+    wait_for(lambda: len(lagged) == relayer.DROP_AFTER - 1)
+    time.sleep(0.3)
+    assert lane.dropped == 0
+    assert sorted(lane.in_flight) == [0, 1]
+    assert sponsor_relayer.nonce_manager.resyncs == 0
+
+    chain.mining = True
+    wait_for(lambda: lane.in_flight == {})
+    assert all(chain.receipt(result["tx_hash"]) is not None for result in results)
+
+
+def test_tops_up_a_lane_running_low_from_the_richest(dev_chain):
+    chains, chain = dev_chain
+    chain.mining = False
+    low, rich = (Account.from_key(key).address for key in KEYS[:2])
+    chain.fund(low, 0)
+    chain.fund(rich, 10**18)
+    sponsor_relayer = make_relayer(chains, KEYS[:2], lane_min_gas=100000)
+    min_balance = MAX_FEE * 100000
+
+    sponsor_relayer.submit("dev", transfer(0))
+    sponsor_relayer.submit("dev", transfer(0))
+    low_lane, rich_lane = sponsor_relayer.lanes("dev")
+    # The rich lane sends its own job plus the top-up
+    wait_for(lambda: rich_lane.sent == 2)
+    assert low_lane.sent == 1
+
+    chain.mining = True
+    wait_for(lambda: chain.balance(low) == 2 * min_balance)
+    assert chain.balance(rich) == 10**18 - 2 * min_balance
+    # Cooldown: one top-up only
+    time.sleep(0.5)
+    assert rich_lane.sent == 2
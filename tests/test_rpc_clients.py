@@ -0,0 +1,109 @@
+import asyncio
+import time
+
+import pytest
+import requests
+
+import rpc_router
+from async_rpc import AsyncChainClient
+from mock_rpc import LatencyModel
+from rate_limiter import RateLimited
+from rpc_clients import ChainClient
+
+
+def make_client(mock_fleet, hedge=True, timeout=5):
+    chains = {"dev": {"chain_id": 1337, "block_time": 1}}
+    fleet = mock_fleet(chains, endpoints=2)
+    primary, secondary = fleet.nodes["dev"]
+    return ChainClient("dev", chains["dev"], timeout=timeout, hedge=hedge, coalesce=False), primary, secondary
+
+
+def test_fails_over_to_the_next_endpoint(mock_fleet):
+    client, primary, secondary = make_client(mock_fleet, hedge=False)
+    primary.error_rate = 1.0
+
+    assert "result" in client.request("eth_blockNumber", [])
+    assert primary.stats()["http_errors"] == 1
+    assert secondary.stats()["posts"] == 1
+    assert client.router.failovers == 1
+    # The failing endpoint now ranks last
+    assert client.endpoint == secondary.url
+
+
+def test_raises_when_every_endpoint_fails(mock_fleet):
+    client, primary, secondary = make_client(mock_fleet, hedge=False)
+    primary.error_rate = secondary.error_rate = 1.0
+
+    with pytest.raises(requests.RequestException):
+        client.request("eth_blockNumber", [])
+    assert not client.healthy
+
+
+def test_ejects_an_endpoint_after_repeated_failures(mock_fleet):
+    client, primary, secondary = make_client(mock_fleet, hedge=False)
+    primary.error_rate = secondary.error_rate = 1.0
+
+    for _ in range(rpc_router.EJECT_AFTER):
+        with pytest.raises(requests.RequestException):
+            client.request("eth_blockNumber", [])
+    assert all(not endpoint.available() for endpoint in client.router.endpoints)
+    assert all(endpoint.ejections == 1 for endpoint in client.router.endpoints)
+
+    # Ejected endpoints are still tried as a last resort, soonest-back first
+    secondary.error_rate = 0.0
+    assert "result" in client.request("eth_blockNumber", [])
+
+
+def test_ejected_endpoint_is_skipped_while_another_is_up(mock_fleet):
+    client, primary, secondary = make_client(mock_fleet, hedge=False)
+    for _ in range(rpc_router.EJECT_AFTER):
+        client.router.endpoints[0].record(0.01, ok=False)
+    assert not client.router.endpoints[0].available()
+
+    for _ in range(5):
+        assert "result" in client.request("eth_blockNumber", [])
+    assert primary.stats()["posts"] == 0
+    assert secondary.stats()["posts"] == 5
+
+
+def test_hedges_slow_reads_to_the_runner_up(mock_fleet, monkeypatch):
+    monkeypatch.setattr(rpc_router, "HEDGE_DEFAULT_DELAY", 0.1)
+    client, primary, secondary = make_client(mock_fleet)
+    primary.latency = LatencyModel("fixed", 1.0)
+
+    started = time.monotonic()
+    assert "result" in client.request("eth_blockNumber", [])
+    assert time.monotonic() - started < 0.8
+    assert client.router.hedges == 1
+    assert secondary.stats()["posts"] == 1
+
+
+def test_never_hedges_writes(mock_fleet, monkeypatch):
+    monkeypatch.setattr(rpc_router, "HEDGE_DEFAULT_DELAY", 0.1)
+    client, primary, secondary = make_client(mock_fleet)
+    primary.latency = LatencyModel("fixed", 0.5)
+
+    client.request("eth_sendRawTransaction", ["0x00"])
+    assert client.router.hedges == 0
+    assert primary.stats()["methods"] == {"eth_sendRawTransaction": 1}
+    assert secondary.stats()["posts"] == 0
+
+
+def test_shed_health_check_keeps_the_chain_up(monkeypatch):
+    config = {"chain_id": 1337, "rpcs": ["http://127.0.0.1:9"]}
+
+    def shed(*args):
+        raise RateLimited("dev: RPC request queue is full")
+
+    async def async_shed(*args):
+        shed()
+
+    client = ChainClient("dev", config)
+    monkeypatch.setattr(client, "request", shed)
+    assert client.check_health()
+    assert client.last_checked > 0
+
+    async_client = AsyncChainClient("dev", config)
+    monkeypatch.setattr(async_client, "request", async_shed)
+    assert asyncio.run(async_client.check_health())
+    assert async_client.last_checked > 0
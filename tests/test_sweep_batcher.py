@@ -0,0 +1,84 @@
+import time
+
+import pytest
+from eth_account import Account
+from eth_utils import to_checksum_address
+
+from conftest import SPONSOR_KEYS, make_relayer, wait_for
+from eip7702 import sign_authorization
+from sweep_batcher import SweepBatcher, sign_sweep_intent
+
+DELEGATE = to_checksum_address("0x" + "d1" * 20)
+DESTINATION = "0x" + "22" * 20
+USER_KEYS = ["0x" + f"{i:02x}" * 32 for i in range(0xa1, 0xa4)]
+
+
+@pytest.fixture
+def batcher(dev_chain):
+    chains, chain = dev_chain
+    chain.fund(DESTINATION, 0)
+    chain.fund(DELEGATE, 0)
+    chain.fund(Account.from_key(SPONSOR_KEYS[0]).address, 10**18)
+    return SweepBatcher(make_relayer(chains, SPONSOR_KEYS[:1]), chains, {"dev": DELEGATE}, window=0.1)
+
+
+def add_sweep(batcher, chain, key, auth_nonce=None, to=DESTINATION):
+    address = Account.from_key(key).address
+    nonce = chain.nonces[address.lower()] if auth_nonce is None else auth_nonce
+    authorization = sign_authorization(key, chain.chain_id, DELEGATE, nonce)
+    intent = sign_sweep_intent(key, chain.chain_id, to, int(time.time()) + 600)
+    return batcher.add("dev", authorization, DESTINATION, intent, address)
+
+
+def test_reverting_sweeps_are_not_reported_as_sent(batcher, dev_chain):
+    _, chain = dev_chain
+    funded, empty = (Account.from_key(key).address for key in USER_KEYS[:2])
+    chain.fund(funded, 10**16)
+    chain.fund(empty, 0)
+
+    sent = add_sweep(batcher, chain, USER_KEYS[0]).result(timeout=10)
+    failed = add_sweep(batcher, chain, USER_KEYS[1]).result(timeout=10)
+
+    assert failed["status"] == "error"
+    assert "No dust to aggregate" in failed["error"]
+    assert sent["status"] == "sent"
+    assert sent["batch_size"] == 1
+    # Only the sweep that can succeed goes out, with its authorization
+    _, tx = chain.transactions[sent["tx_hash"]]
+    assert [auth["address"] for auth in tx["authorizationList"]] == [DELEGATE]
+
+    wait_for(lambda: chain.receipt(sent["tx_hash"]) is not None)
+    assert chain.receipt(sent["tx_hash"])["status"] == "0x1"
+    assert chain.balance(funded) == 0
+    assert chain.balance(DESTINATION) == 10**16 * 95 // 100
+    assert chain.balance(DELEGATE) == 10**16 * 5 // 100
+    assert batcher.stats()["rejected"] == 1
+
+
+def test_nothing_is_sent_when_every_sweep_would_revert(batcher, dev_chain):
+    _, chain = dev_chain
+    for key in USER_KEYS:
+        chain.fund(Account.from_key(key).address, 0)
+
+    futures = [add_sweep(batcher, chain, key) for key in USER_KEYS]
+    results = [future.result(timeout=10) for future in futures]
+
+    assert all(result["status"] == "error" for result in results)
+    assert batcher.relayer.lanes("dev")[0].sent == 0
+
+
+def test_sweep_without_an_applied_authorization_is_an_error(batcher, dev_chain):
+    _, chain = dev_chain
+    chain.fund(Account.from_key(USER_KEYS[0]).address, 10**16)
+
+    # A stale authorization nonce is skipped by the node: the sweep reaches a plain EOA
+    result = add_sweep(batcher, chain, USER_KEYS[0], auth_nonce=5).result(timeout=10)
+
+    assert result["status"] == "error"
+    assert "authorization not applied" in result["error"]
+
+
+def test_rejects_an_intent_for_another_destination(batcher, dev_chain):
+    _, chain = dev_chain
+    with pytest.raises(ValueError, match="not signed by the sweeping account"):
+        add_sweep(batcher, chain, USER_KEYS[0], to="0x" + "33" * 20)
@@ -0,0 +1,223 @@
+"""
+ERC-20 dust discovery
+balanceOf for every token in a per-chain index, packed into chunked
+Multicall3 calls, with token metadata cached for good
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+
+from eth_abi import decode, encode
+from web3 import Web3
+
+from multicall import DEFAULT_CHUNK_SIZE, MULTICALL3_ADDRESS, async_call_many, call_many
+from sqlite_local import LocalSQLite
+
+logger = logging.getLogger(__name__)
+
+INDEX_DIR = os.environ.get(
+    "TOKEN_INDEX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "tokens")
+)
+METADATA_PATH = os.environ.get(
+    "TOKEN_METADATA_PATH", os.path.join(tempfile.gettempdir(), "dustzip_token_metadata.sqlite3")
+)
+
+BALANCE_OF_SELECTOR = bytes.fromhex("70a08231")  # balanceOf(address)
+DECIMALS_SELECTOR = bytes.fromhex("313ce567")    # decimals()
+SYMBOL_SELECTOR = bytes.fromhex("95d89b41")      # symbol()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS token_metadata (
+    chain TEXT NOT NULL,
+    token TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    decimals INTEGER NOT NULL,
+    PRIMARY KEY (chain, token)
+);
+"""
+
+
+def load_token_index(chain_key, directory=INDEX_DIR):
+    """Tokens listed in <directory>/<chain_key>.json; [] if the chain has no index"""
+    path = os.path.join(directory, f"{chain_key}.json")
+    try:
+        with open(path) as f:
+            entries = json.load(f)
+    except FileNotFoundError:
+        return []
+    except (OSError, ValueError) as e:
+        logger.warning("Could not load token index %s: %s", path, e)
+        return []
+    return [dict(entry, address=Web3.to_checksum_address(entry["address"])) for entry in entries]
+
+
+def decode_symbol(data):
+    """symbol() return data; handles both string and bytes32 (e.g. MKR) tokens"""
+    try:
+        return decode(["string"], data)[0]
+    except Exception:
+        return data[:32].rstrip(b"\x00").decode("utf-8", errors="replace")
+
+
+class TokenMetadataCache:
+    """Token symbol and decimals, cached permanently (they never change)
+
+    Kept in memory and in a SQLite file shared by every worker.
+    """
+
+    def __init__(self, path=METADATA_PATH):
+        self.path = path
+        self._db = LocalSQLite(path, SCHEMA)
+        self._memory = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, chain_key, tokens):
+        """{token: (symbol, decimals)} for the tokens we already know"""
+        found = {t: self._memory[(chain_key, t)] for t in tokens if (chain_key, t) in self._memory}
+        missing = [t for t in tokens if t not in found]
+        if missing:
+            try:
+                placeholders = ",".join("?" * len(missing))
+                rows = self._db.conn().execute(
+                    f"SELECT token, symbol, decimals FROM token_metadata WHERE chain = ? AND token IN ({placeholders})",
+                    [chain_key] + missing
+                ).fetchall()
+            except sqlite3.Error as e:
+                logger.warning("Token metadata read failed: %s", e)
+                rows = []
+            with self._lock:
+                for token, symbol, decimals in rows:
+                    self._memory[(chain_key, token)] = found[token] = (symbol, decimals)
+        return found
+
+    def set_many(self, chain_key, metadata):
+        """Store {token: (symbol, decimals)}"""
+        if not metadata:
+            return
+        with self._lock:
+            for token, value in metadata.items():
+                self._memory[(chain_key, token)] = value
+        try:
+            conn = self._db.conn()
+            with conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO token_metadata (chain, token, symbol, decimals) VALUES (?, ?, ?, ?)",
+                    [(chain_key, token, symbol, decimals) for token, (symbol, decimals) in metadata.items()]
+                )
+        except sqlite3.Error as e:
+            logger.warning("Token metadata write failed: %s", e)
+
+
+class TokenScanner:
+    """Non-zero ERC-20 balances of an address across a chain's token index"""
+
+    def __init__(self, metadata=None, index_dir=INDEX_DIR, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.metadata = metadata or TokenMetadataCache()
+        self.index_dir = index_dir
+        self.chunk_size = chunk_size
+        self._indexes = {}
+
+    def index(self, chain_key):
+        tokens = self._indexes.get(chain_key)
+        if tokens is None:
+            tokens = load_token_index(chain_key, self.index_dir)
+            # Symbols/decimals listed in the index seed the metadata cache
+            self.metadata.set_many(chain_key, {
+                t["address"]: (t["symbol"], t["decimals"])
+                for t in tokens if "symbol" in t and "decimals" in t
+            })
+            self._indexes[chain_key] = tokens
+        return tokens
+
+    def scan(self, client, address, block="latest"):
+        """[{"token", "symbol", "decimals", "balance_raw", "balance"}] for non-zero holdings"""
+        tokens, calls, multicall_address = self._balance_calls(client, address)
+        if not tokens:
+            return []
+        held = self._held(tokens, call_many(client, calls, multicall_address, self.chunk_size, block))
+        if not held:
+            return []
+
+        known = self.metadata.get_many(client.chain_key, list(held))
+        missing = [t for t in held if t not in known]
+        if missing:
+            results = call_many(client, self._metadata_calls(missing), multicall_address, self.chunk_size)
+            known = self._store_metadata(client.chain_key, known, missing, results)
+        return self._balances(held, known)
+
+    async def scan_async(self, client, address, block="latest"):
+        """scan() over an AsyncChainClient; metadata cache reads and writes run in a thread"""
+        tokens, calls, multicall_address = await asyncio.to_thread(self._balance_calls, client, address)
+        if not tokens:
+            return []
+        held = self._held(tokens, await async_call_many(client, calls, multicall_address, self.chunk_size, block))
+        if not held:
+            return []
+
+        known = await asyncio.to_thread(self.metadata.get_many, client.chain_key, list(held))
+        missing = [t for t in held if t not in known]
+        if missing:
+            results = await async_call_many(client, self._metadata_calls(missing), multicall_address, self.chunk_size)
+            known = await asyncio.to_thread(self._store_metadata, client.chain_key, known, missing, results)
+        return self._balances(held, known)
+
+    def _balance_calls(self, client, address):
+        """(tokens, balanceOf calls, multicall address) for the chain's token index"""
+        tokens = [t["address"] for t in self.index(client.chain_key)]
+        owner = Web3.to_checksum_address(address)
+        calldata = BALANCE_OF_SELECTOR + encode(["address"], [owner])
+        multicall_address = client.config.get("multicall3", MULTICALL3_ADDRESS)
+        return tokens, [(token, calldata) for token in tokens], multicall_address
+
+    @staticmethod
+    def _held(tokens, results):
+        held = {}
+        for token, (success, data) in zip(tokens, results):
+            if success and len(data) >= 32:
+                raw = int.from_bytes(data[:32], "big")
+                if raw > 0:
+                    held[token] = raw
+        return held
+
+    @staticmethod
+    def _balances(held, metadata):
+        balances = []
+        for token, raw in held.items():
+            if token not in metadata:
+                continue
+            symbol, decimals = metadata[token]
+            balances.append({
+                "token": token,
+                "symbol": symbol,
+                "decimals": decimals,
+                "balance_raw": str(raw),
+                "balance": raw / 10 ** decimals
+            })
+        return balances
+
+    @staticmethod
+    def _metadata_calls(tokens):
+        calls = []
+        for token in tokens:
+            calls.append((token, DECIMALS_SELECTOR))
+            calls.append((token, SYMBOL_SELECTOR))
+        return calls
+
+    def _store_metadata(self, chain_key, known, missing, results):
+        """Decode decimals()/symbol() results for the tokens never seen before, and cache them"""
+        fetched = {}
+        for i, token in enumerate(missing):
+            (decimals_ok, decimals_data), (symbol_ok, symbol_data) = results[2 * i], results[2 * i + 1]
+            if not decimals_ok or len(decimals_data) < 32:
+                logger.debug("No decimals() for %s on %s", token, chain_key)
+                continue
+            symbol = decode_symbol(symbol_data) if symbol_ok and symbol_data else "?"
+            fetched[token] = (symbol, int.from_bytes(decimals_data[:32], "big"))
+
+        self.metadata.set_many(chain_key, fetched)
+        return dict(known, **fetched)
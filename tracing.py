@@ -0,0 +1,326 @@
+"""
+Request tracing
+Named spans per request, summarized in a Server-Timing header or returned
+as a JSON trace, plus an opt-in sampling profiler writing folded stacks
+"""
+
+import inspect
+import logging
+import os
+import secrets
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from sqlite_local import LocalSQLite
+
+logger = logging.getLogger(__name__)
+
+MAX_SPANS = 2000  # Per trace; later spans are only counted
+PROFILE_PATH = os.environ.get(
+    "PROFILE_PATH", os.path.join(tempfile.gettempdir(), "dustzip_profiles.sqlite3")
+)
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "dustzip_profiles"))
+PROFILE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL", "0.005"))  # Seconds between stack samples
+PROFILE_MAX_REQUESTS = 1000
+ARMED_CHECK_INTERVAL = 1.0  # Seconds between checks of the shared profiling toggle
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS profile_sessions (
+    id TEXT PRIMARY KEY,
+    requested INTEGER NOT NULL,
+    remaining INTEGER NOT NULL,
+    filter TEXT,
+    created REAL NOT NULL
+);
+"""
+
+_current = ContextVar("dustzip_trace", default=None)
+
+
+class Trace:
+    """Spans recorded by one request (or CLI run), from any thread it fans out to"""
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.spans = []
+        self.dropped = 0
+        self.threads = Counter()  # thread ident -> tasks currently running for this trace
+        self._lock = threading.Lock()
+
+    def add(self, name, started, duration, attrs):
+        with self._lock:
+            if len(self.spans) < MAX_SPANS:
+                self.spans.append((name, started - self.started, duration, attrs))
+            else:
+                self.dropped += 1
+
+    def enter_thread(self):
+        with self._lock:
+            self.threads[threading.get_ident()] += 1
+
+    def exit_thread(self):
+        ident = threading.get_ident()
+        with self._lock:
+            self.threads[ident] -= 1
+            if self.threads[ident] <= 0:
+                del self.threads[ident]
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def totals(self):
+        """{span name: (total seconds, count)} in order of first appearance"""
+        totals = {}
+        with self._lock:
+            for name, _, duration, _ in self.spans:
+                total, count = totals.get(name, (0.0, 0))
+                totals[name] = (total + duration, count + 1)
+        return totals
+
+    def server_timing(self):
+        """Server-Timing header value; spans of the same name (e.g. one per chain) are summed"""
+        parts = [
+            f'{name};dur={total * 1000:.1f};desc="{count}x"' if count > 1 else f"{name};dur={total * 1000:.1f}"
+            for name, (total, count) in self.totals().items()
+        ]
+        parts.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(parts)
+
+    def to_dict(self):
+        with self._lock:
+            spans = list(self.spans)
+        return {
+            "name": self.name,
+            "duration_ms": round(self.elapsed() * 1000, 2),
+            "dropped_spans": self.dropped,
+            "spans": [
+                dict(attrs, name=name, start_ms=round(start * 1000, 2), duration_ms=round(duration * 1000, 2))
+                for name, start, duration, attrs in sorted(spans, key=lambda s: s[1])
+            ],
+        }
+
+
+def current_trace():
+    return _current.get()
+
+
+@contextmanager
+def start_trace(name):
+    """Record spans from this context (and tasks bound with bind()) into a new Trace"""
+    trace = Trace(name)
+    token = _current.set(trace)
+    trace.enter_thread()
+    try:
+        yield trace
+    finally:
+        trace.exit_thread()
+        _current.reset(token)
+
+
+def activate(trace):
+    """Make `trace` current in this context without a with-block; pass the token to deactivate()"""
+    trace.enter_thread()
+    return _current.set(trace)
+
+
+def deactivate(trace, token):
+    trace.exit_thread()
+    _current.reset(token)
+
+
+@contextmanager
+def span(name, **attrs):
+    """Time the block as `name` in the current trace; a no-op outside one"""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, started, time.perf_counter() - started, attrs)
+
+
+def traced(name):
+    """Decorator: run the function (sync or async) inside span(name)"""
+    def decorate(fn):
+        if inspect.iscoroutinefunction(fn):
+            @wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def bind(fn):
+    """fn, carrying the caller's trace into whichever pool thread runs it"""
+    trace = _current.get()
+    if trace is None:
+        return fn
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        token = activate(trace)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            deactivate(trace, token)
+    return wrapper
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapse(frame):
+    """Stack of `frame` in folded format, root first"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class SamplingProfiler:
+    """Statistical profiler for the next N requests, armed for all workers at once
+
+    arm() records a session in a SQLite file every worker checks (at most
+    once a second). Each worker claims requests from the session's budget;
+    while a claimed request runs, a daemon thread samples the stacks of
+    every thread working for it. Finished requests append their stacks,
+    in the folded format flamegraph.pl and speedscope read, to
+    PROFILE_DIR/<session>.folded.
+    """
+
+    def __init__(self, path=PROFILE_PATH, out_dir=PROFILE_DIR, interval=PROFILE_INTERVAL):
+        self.path = path
+        self.out_dir = out_dir
+        self.interval = interval
+        self._db = LocalSQLite(path, SCHEMA)
+        self._active = {}  # Trace -> (session, Counter of folded stacks)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._armed = False
+        self._next_check = 0.0
+
+    def arm(self, requests, filter=None):
+        """Profile the next `requests` requests (whose path starts with `filter`, if given)"""
+        requests = max(1, min(int(requests), PROFILE_MAX_REQUESTS))
+        session = f"{time.strftime('%Y%m%d-%H%M%S')}-{secrets.token_hex(3)}"
+        conn = self._db.conn()
+        with conn:
+            conn.execute(
+                "INSERT INTO profile_sessions (id, requested, remaining, filter, created) VALUES (?, ?, ?, ?, ?)",
+                (session, requests, requests, filter, time.time())
+            )
+        self._next_check = 0.0
+        return session
+
+    def disarm(self):
+        """Stop claiming requests for every open session; returns how many were open"""
+        conn = self._db.conn()
+        with conn:
+            cursor = conn.execute("UPDATE profile_sessions SET remaining = 0 WHERE remaining > 0")
+        self._next_check = 0.0
+        return cursor.rowcount
+
+    def claim(self, path):
+        """Session id if this request should be profiled, else None; cheap when disarmed"""
+        now = time.monotonic()
+        if not self._armed and now < self._next_check:
+            return None
+        try:
+            conn = self._db.conn()
+            rows = conn.execute(
+                "SELECT id, filter FROM profile_sessions WHERE remaining > 0 ORDER BY created"
+            ).fetchall()
+            self._armed = bool(rows)
+            self._next_check = now + ARMED_CHECK_INTERVAL
+            for session, prefix in rows:
+                if prefix and not path.startswith(prefix):
+                    continue
+                with conn:
+                    claimed = conn.execute(
+                        "UPDATE profile_sessions SET remaining = remaining - 1 WHERE id = ? AND remaining > 0",
+                        (session,)
+                    ).rowcount
+                if claimed:
+                    return session
+        except sqlite3.Error as e:
+            logger.warning("Profiler toggle check failed: %s", e)
+        return None
+
+    def start(self, trace, session):
+        with self._lock:
+            self._active[trace] = (session, Counter())
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+                self._thread.start()
+
+    def finish(self, trace):
+        """Stop sampling `trace` and append its stacks to the session's file"""
+        with self._lock:
+            session, stacks = self._active.pop(trace, (None, None))
+        if not stacks:
+            return
+        lines = "".join(f"{stack} {count}\n" for stack, count in stacks.items())
+        try:
+            os.makedirs(self.out_dir, exist_ok=True)
+            # One append per request, so concurrent workers never interleave lines
+            with open(self.output(session), "a") as f:
+                f.write(lines)
+        except OSError as e:
+            logger.warning("Could not write profile %s: %s", session, e)
+
+    def output(self, session):
+        return os.path.join(self.out_dir, f"{os.path.basename(session)}.folded")
+
+    def status(self):
+        rows = self._db.conn().execute(
+            "SELECT id, requested, remaining, filter, created FROM profile_sessions ORDER BY created DESC"
+        ).fetchall()
+        return [
+            {
+                "session": session,
+                "requested": requested,
+                "remaining": remaining,
+                "filter": prefix,
+                "created": created,
+                "output": self.output(session) if os.path.exists(self.output(session)) else None,
+            }
+            for session, requested, remaining, prefix, created in rows
+        ]
+
+    def _sample_loop(self):
+        # Exits once no profiled request is running; start() brings it back
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                for trace, (_, stacks) in self._active.items():
+                    with trace._lock:
+                        threads = list(trace.threads)
+                    for ident in threads:
+                        frame = frames.get(ident)
+                        if frame is not None:
+                            stacks[collapse(frame)] += 1
@@ -0,0 +1,306 @@
+"""
+Dust watchlist
+Follows new blocks per chain, re-reads only the watched addresses a block
+touched, and reports threshold crossings as JSONL events or webhooks
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import aiohttp
+from web3 import Web3
+
+from async_rpc import AsyncChainClient
+from multicall import MULTICALL3_ADDRESS, async_get_eth_balances, split_balances
+from rpc_batch import RpcError, to_int
+from sqlite_local import LocalSQLite
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.environ.get(
+    "WATCHLIST_PATH", os.path.join(tempfile.gettempdir(), "dustzip_watchlist.sqlite3")
+)
+MAX_BLOCKS_PER_POLL = int(os.environ.get("WATCH_MAX_BLOCKS", "20"))  # Blocks read per batch while catching up
+MAX_GAP = int(os.environ.get("WATCH_MAX_GAP", "1000"))  # Further behind than this, re-read every address
+RESYNC_INTERVAL = float(os.environ.get("WATCH_RESYNC_INTERVAL", "3600"))  # Seconds between full re-reads
+MIN_POLL_INTERVAL = 1.0
+WEBHOOK_TIMEOUT = 10
+
+EVENT_ABOVE = "above_threshold"
+EVENT_BELOW = "below_threshold"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS watched_balances (
+    chain TEXT NOT NULL,
+    address TEXT NOT NULL,
+    balance TEXT NOT NULL,
+    block INTEGER NOT NULL,
+    PRIMARY KEY (chain, address)
+);
+CREATE TABLE IF NOT EXISTS watermarks (
+    chain TEXT PRIMARY KEY,
+    block INTEGER NOT NULL,
+    resynced REAL NOT NULL
+);
+"""
+
+
+def read_addresses(path):
+    """Checksum addresses from a file ("-" for stdin), one per line; blank lines and # comments are skipped"""
+    f = sys.stdin if path == "-" else open(path)
+    addresses = []
+    try:
+        for number, line in enumerate(f, 1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            if not Web3.is_address(line):
+                raise ValueError(f"{path}:{number}: not an address: {line}")
+            addresses.append(Web3.to_checksum_address(line))
+    finally:
+        if f is not sys.stdin:
+            f.close()
+    return list(dict.fromkeys(addresses))
+
+
+def touched_addresses(block):
+    """Lowercase addresses a block's transactions and withdrawals sent value from or to"""
+    touched = set()
+    for tx in block.get("transactions") or []:
+        if isinstance(tx, dict):
+            touched.update(address.lower() for address in (tx.get("from"), tx.get("to")) if address)
+    for withdrawal in block.get("withdrawals") or []:
+        touched.add(withdrawal["address"].lower())
+    return touched
+
+
+class WatchlistStore:
+    """Last-known balance per (chain, address) and the last block processed per chain"""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._db = LocalSQLite(path, SCHEMA)
+
+    def balances(self, chain_key):
+        """{address: balance in wei} as last saved for the chain"""
+        rows = self._db.conn().execute(
+            "SELECT address, balance FROM watched_balances WHERE chain = ?", (chain_key,)
+        ).fetchall()
+        return {address: int(balance) for address, balance in rows}
+
+    def save(self, chain_key, balances, block):
+        conn = self._db.conn()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO watched_balances (chain, address, balance, block) VALUES (?, ?, ?, ?)",
+                [(chain_key, address, str(balance), block) for address, balance in balances.items()]
+            )
+
+    def watermark(self, chain_key):
+        """(last processed block, time of the last full re-read), or (None, 0.0)"""
+        row = self._db.conn().execute(
+            "SELECT block, resynced FROM watermarks WHERE chain = ?", (chain_key,)
+        ).fetchone()
+        return row if row else (None, 0.0)
+
+    def set_watermark(self, chain_key, block, resynced=None):
+        conn = self._db.conn()
+        with conn:
+            if resynced is None:
+                conn.execute("UPDATE watermarks SET block = ? WHERE chain = ?", (block, chain_key))
+            else:
+                conn.execute(
+                    "INSERT OR REPLACE INTO watermarks (chain, block, resynced) VALUES (?, ?, ?)",
+                    (chain_key, block, resynced)
+                )
+
+
+class EventSink:
+    """Writes events as JSON lines to a file ("-" for stdout) and optionally POSTs each to a webhook"""
+
+    def __init__(self, path="-", webhook=None):
+        self.webhook = webhook
+        self._out = sys.stdout if path == "-" else open(path, "a")
+        self._session = None
+
+    async def emit(self, event):
+        self._out.write(json.dumps(event) + "\n")
+        self._out.flush()
+        if not self.webhook:
+            return
+        if self._session is None:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=WEBHOOK_TIMEOUT))
+        try:
+            async with self._session.post(self.webhook, json=event) as response:
+                if response.status >= 400:
+                    logger.warning("Webhook answered %s for %s", response.status, event["address"])
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning("Webhook failed for %s: %s", event["address"], e)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+        if self._out is not sys.stdout:
+            self._out.close()
+
+
+class Watchlist:
+    """Native balances of many addresses on every chain, kept current block by block
+
+    Each chain follows its head once per block time. New blocks are read
+    with their transactions, and only the watched addresses that sent or
+    received one (or a withdrawal) are re-read, in one Multicall3 batch,
+    so steady-state cost follows chain activity rather than list size.
+    Value moved by internal calls leaves no trace in block data: every
+    address is re-read every RESYNC_INTERVAL seconds, on first start and
+    whenever a chain falls more than MAX_GAP blocks behind.
+    """
+
+    def __init__(self, chains, addresses, threshold_wei, sink, store=None, timeout=10):
+        self.chains = chains
+        self.addresses = list(addresses)
+        self.threshold_wei = threshold_wei
+        self.sink = sink
+        self.store = store or WatchlistStore()
+        self.clients = {
+            chain_key: AsyncChainClient(chain_key, config, timeout=timeout)
+            for chain_key, config in chains.items()
+        }
+        self._watched = {address.lower(): address for address in self.addresses}
+        self._balances = {}  # chain_key -> {address: wei}, loaded from the store on first poll
+        self._unread = {}  # chain_key -> addresses whose last read failed, retried next poll
+        self.blocks_read = 0
+        self.addresses_read = 0
+        self.read_errors = 0
+        self.events = 0
+
+    async def run(self):
+        await asyncio.gather(*(self.follow(chain_key) for chain_key in self.clients))
+
+    async def follow(self, chain_key):
+        interval = max(self.chains[chain_key].get("block_time", 2), MIN_POLL_INTERVAL)
+        while True:
+            try:
+                await self.poll(chain_key)
+            except Exception as e:
+                logger.warning("Watch poll failed for %s: %s", chain_key, e)
+            await asyncio.sleep(interval)
+
+    async def poll(self, chain_key):
+        """Process the chain's new blocks (at most MAX_BLOCKS_PER_POLL of them)"""
+        client = self.clients[chain_key]
+        (head,) = await client.batch([("eth_blockNumber", [])])
+        if isinstance(head, RpcError):
+            raise head
+        head = to_int(head)
+
+        watermark, resynced = self.store.watermark(chain_key)
+        if chain_key not in self._balances:
+            # Restarted: crossings are judged against the balances saved last time
+            self._balances[chain_key] = self.store.balances(chain_key)
+        if watermark is None or head - watermark > MAX_GAP or time.time() - resynced > RESYNC_INTERVAL:
+            await self.refresh(chain_key, self.addresses, head)
+            self.store.set_watermark(chain_key, head, resynced=time.time())
+            return
+        unread = self._unread.get(chain_key, set())
+        added = [
+            address for address in self.addresses
+            if address not in self._balances[chain_key] or address in unread
+        ]
+        if added:
+            # Added to the list since the last run, or whose last read failed
+            await self.refresh(chain_key, added, watermark)
+        if head <= watermark:
+            return
+
+        last = min(head, watermark + MAX_BLOCKS_PER_POLL)
+        blocks = await client.batch([
+            ("eth_getBlockByNumber", [hex(number), True]) for number in range(watermark + 1, last + 1)
+        ])
+        touched = set()
+        for block in blocks:
+            # Never move the watermark past a block we could not read
+            if isinstance(block, RpcError) or block is None:
+                raise block or RpcError("eth_getBlockByNumber", {"message": "block not available"})
+            touched |= touched_addresses(block)
+        self.blocks_read += len(blocks)
+
+        addresses = [self._watched[address] for address in touched if address in self._watched]
+        if addresses:
+            await self.refresh(chain_key, addresses, last)
+        self.store.set_watermark(chain_key, last)
+
+    async def refresh(self, chain_key, addresses, block):
+        """Re-read `addresses` at `block` and report every threshold they crossed"""
+        multicall_address = self.chains[chain_key].get("multicall3", MULTICALL3_ADDRESS)
+        balances, failed = split_balances(
+            await async_get_eth_balances(self.clients[chain_key], addresses, multicall_address, block=hex(block))
+        )
+        self.addresses_read += len(balances)
+        self.read_errors += len(failed)
+        unread = self._unread.setdefault(chain_key, set())
+        unread.difference_update(balances)
+        unread.update(failed)
+        if failed:
+            logger.warning("Balance read failed on %s for %d addresses", chain_key, len(failed))
+        known = self._balances[chain_key]
+        for address, balance in balances.items():
+            previous = known.get(address)
+            known[address] = balance
+            event = self._crossing(previous, balance)
+            if event:
+                self.events += 1
+                await self.sink.emit(self._event(event, chain_key, address, balance, previous, block))
+        self.store.save(chain_key, balances, block)
+
+    def _crossing(self, previous, balance):
+        above = balance >= self.threshold_wei
+        if previous is None:
+            # First sighting: only worth reporting if there is already dust to sweep
+            return EVENT_ABOVE if above else None
+        if above != (previous >= self.threshold_wei):
+            return EVENT_ABOVE if above else EVENT_BELOW
+        return None
+
+    def _event(self, event, chain_key, address, balance, previous, block):
+        return {
+            "event": event,
+            "chain": chain_key,
+            "address": address,
+            "balance_wei": balance,
+            "balance": float(Web3.from_wei(balance, "ether")),
+            "previous_wei": previous,
+            "threshold_wei": self.threshold_wei,
+            "block": block,
+            "time": time.time()
+        }
+
+    def stats(self):
+        return {
+            "addresses": len(self.addresses),
+            "blocks_read": self.blocks_read,
+            "addresses_read": self.addresses_read,
+            "read_errors": self.read_errors,
+            "events": self.events
+        }
+
+    async def close(self):
+        await asyncio.gather(*(client.close() for client in self.clients.values()))
+
+
+async def watch(chains, addresses, min_balance, events="-", webhook=None, store=None):
+    """Follow `addresses` until cancelled, reporting crossings of `min_balance` (native units)"""
+    sink = EventSink(events, webhook)
+    watchlist = Watchlist(chains, addresses, Web3.to_wei(min_balance, "ether"), sink, store)
+    print(f"Watching {len(watchlist.addresses)} addresses on {len(chains)} chains", file=sys.stderr)
+    try:
+        await watchlist.run()
+    finally:
+        await watchlist.close()
+        await sink.close()
+        print(f"Watchlist stopped: {json.dumps(watchlist.stats())}", file=sys.stderr)